@@ -4,6 +4,9 @@ from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 import os
 from .api import api
+from .human_ids import allocator as human_id_allocator
+from .hashing import password_hasher
+from .db_pool import engine_options, load_pool_config
 
 migrate = Migrate()
 bcrypt = Bcrypt()
@@ -11,18 +14,94 @@ bcrypt = Bcrypt()
 def create_app(database_uri=None):
     app = Flask(__name__)
     # Register custom CLI commands after app is created
-    from .commands import create_roles_command
+    from .commands import (
+        create_roles_command, import_rota_command, check_compliance_command, verify_compliance_state_command,
+        export_command, rebuild_rollups_command, scan_alerts_command, solve_rota_command,
+        check_overlaps_command, db_pool_command,
+    )
     app.cli.add_command(create_roles_command)
+    app.cli.add_command(import_rota_command)
+    app.cli.add_command(check_compliance_command)
+    app.cli.add_command(verify_compliance_state_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(scan_alerts_command)
+    app.cli.add_command(solve_rota_command)
+    app.cli.add_command(check_overlaps_command)
+    app.cli.add_command(db_pool_command)
     app.config['SECRET_KEY'] = 'a-very-secret-key' # Change this in production
     if database_uri is not None:
         app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
     else:
         app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection pool and statement timeout (see db_pool.py)
+    load_pool_config(app.config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    # Number of human_ids each process reserves per round trip
+    app.config['HUMAN_ID_BLOCK_SIZE'] = int(os.environ.get('HUMAN_ID_BLOCK_SIZE', 50))
+    # Per-process cache of incremental compliance state (employees, seconds)
+    app.config['COMPLIANCE_CACHE_SIZE'] = int(os.environ.get('COMPLIANCE_CACHE_SIZE', 2000))
+    app.config['COMPLIANCE_CACHE_TTL'] = float(os.environ.get('COMPLIANCE_CACHE_TTL', 300))
+    # Password hashing: bcrypt cost, pool processes per web worker (0 = inline, default 2), max queued + running
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    if 'PASSWORD_HASH_WORKERS' in os.environ:
+        app.config['PASSWORD_HASH_WORKERS'] = int(os.environ['PASSWORD_HASH_WORKERS'])
+    if 'PASSWORD_HASH_QUEUE_SIZE' in os.environ:
+        app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.environ['PASSWORD_HASH_QUEUE_SIZE'])
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 2))
+    # Per-process cache of decoded tokens and principals (entries, seconds)
+    app.config['AUTH_CACHE_SIZE'] = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+    app.config['AUTH_CACHE_TTL'] = float(os.environ.get('AUTH_CACHE_TTL', 300))
+    # Conditional-GET response cache; set RESPONSE_CACHE_URL=redis://... to share it between processes
+    app.config['RESPONSE_CACHE_URL'] = os.environ.get('RESPONSE_CACHE_URL')
+    app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+    app.config['RESPONSE_CACHE_TTL'] = float(os.environ.get('RESPONSE_CACHE_TTL', 60))
+    # Clock punch write-behind queue: max queued events, events per INSERT, seconds between flushes
+    app.config['CLOCK_QUEUE_SIZE'] = int(os.environ.get('CLOCK_QUEUE_SIZE', 10000))
+    app.config['CLOCK_BATCH_SIZE'] = int(os.environ.get('CLOCK_BATCH_SIZE', 500))
+    app.config['CLOCK_FLUSH_INTERVAL'] = float(os.environ.get('CLOCK_FLUSH_INTERVAL', 0.2))
+    app.config['CLOCK_MAX_ATTEMPTS'] = int(os.environ.get('CLOCK_MAX_ATTEMPTS', 5))
+    app.config['CLOCK_RETRY_BACKOFF'] = float(os.environ.get('CLOCK_RETRY_BACKOFF', 1.0))
+    # 17-week average weekly hours at which the alert scanner warns (breach is above 48)
+    app.config['ALERT_WARNING_HOURS'] = float(os.environ.get('ALERT_WARNING_HOURS', 44))
+    # Per-process "who can cover" indexes (teams, seconds)
+    app.config['AVAILABILITY_INDEX_SIZE'] = int(os.environ.get('AVAILABILITY_INDEX_SIZE', 200))
+    app.config['AVAILABILITY_INDEX_TTL'] = float(os.environ.get('AVAILABILITY_INDEX_TTL', 60))
+    # Rota solver: restart processes per request, default and max search seconds. 0 searches in the
+    # request itself; anything more starts a pool for every request, so parallel runs belong to `flask solve-rota`
+    app.config['ROTA_SOLVER_WORKERS'] = int(os.environ.get('ROTA_SOLVER_WORKERS', 0))
+    app.config['ROTA_SOLVER_BUDGET'] = float(os.environ.get('ROTA_SOLVER_BUDGET', 10))
+    app.config['ROTA_SOLVER_MAX_BUDGET'] = float(os.environ.get('ROTA_SOLVER_MAX_BUDGET', 30))
+    # Request/SQL metrics on /metrics; N+1 = one statement shape run this often in a request
+    app.config['INSTRUMENTATION_ENABLED'] = os.environ.get('INSTRUMENTATION_ENABLED', '1') not in ('0', 'false')
+    app.config['N1_THRESHOLD'] = int(os.environ.get('N1_THRESHOLD', 5))
+    app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '0') not in ('0', 'false')
+    # Directory where each worker writes its metrics for /metrics to sum (unset: per process), seconds between writes
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+    # Seconds a dashboard request waits for its concurrent queries on the async read path
+    app.config['DASHBOARD_TIMEOUT'] = float(os.environ.get('DASHBOARD_TIMEOUT', 10))
 
     db.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    from .auth import principal_cache
+    principal_cache.init_app(app)
+    from .response_cache import response_cache
+    response_cache.init_app(app)
+    human_id_allocator.init_app(app)
+    from .compliance_state import compliance_cache
+    compliance_cache.init_app(app)
+    from .clock_ingest import ingestor as clock_ingestor
+    clock_ingestor.init_app(app)
+    from .availability import availability_index
+    availability_index.init_app(app)
+    from .instrumentation import instrumentation
+    instrumentation.init_app(app)
+    from .dashboard import async_reader
+    async_reader.init_app(app)
     api.init_app(app)
 
     # Import and register namespaces inside the factory
@@ -31,10 +110,30 @@ def create_app(database_uri=None):
     from .roles_api import ns as roles_ns
     from .users_api import api as users_ns
     from .teams_api import ns as teams_ns
+    from .shifts_api import ns as shifts_ns
+    from .compliance_api import ns as compliance_ns
+    from .exports_api import ns as exports_ns
+    from .clock_api import ns as clock_ns
+    from .reports_api import ns as reports_ns
+    from .alerts_api import ns as alerts_ns
+    from .availability_api import ns as availability_ns
+    from .rota_api import ns as rota_ns
+    from .system_api import ns as system_ns
+    from .dashboard_api import ns as dashboard_ns
     api.add_namespace(auth_ns, path='/auth')
     api.add_namespace(roles_ns, path='/roles')
     api.add_namespace(users_ns, path='/users')
     api.add_namespace(teams_ns, path='/teams')
+    api.add_namespace(shifts_ns, path='/shifts')
+    api.add_namespace(compliance_ns, path='/compliance')
+    api.add_namespace(exports_ns, path='/exports')
+    api.add_namespace(clock_ns, path='/clock')
+    api.add_namespace(reports_ns, path='/reports')
+    api.add_namespace(alerts_ns, path='/alerts')
+    api.add_namespace(availability_ns, path='/availability')
+    api.add_namespace(rota_ns, path='/rota')
+    api.add_namespace(system_ns, path='/system')
+    api.add_namespace(dashboard_ns, path='/dashboard')
 
 
     # Register main blueprint for HTML routes
@@ -0,0 +1,235 @@
+"""
+Background scanner for the 48-hour average weekly working time limit.
+
+Each scan evaluates every employee's average rostered hours over the
+17-week reference period ending with the current ISO week, read from the
+``hours_weekly`` rollups (one grouped query per batch of employees), and
+classifies it as ok, warning (at or above ALERT_WARNING_HOURS) or breach
+(above the 48-hour limit). Only changes of state are written: a row in
+``hours_alerts`` for the transition and the new state in
+``hours_alert_states``, where no row means ok.
+
+Work is sharded by team: an employee belongs to the shard of the lowest
+team id they are a member of, or to the 'unassigned' shard, so each is
+scanned once per pass. Shards run on a thread pool (the work is in the
+database) and walk their employees in id order, ``batch_size`` at a time.
+Each batch commits its alerts together with the shard's checkpoint, so a
+scanner restarted mid-pass resumes the unfinished scan from the last
+committed batch instead of starting over, and never records a transition
+twice.
+
+Shards are fixed when a scan opens, plus one for each team created before
+it resumes. Membership is read as each batch runs, so an employee whose
+lowest team changes mid-pass can land in a shard that is already done (or
+already past their id) and be skipped until the next pass; one that moves
+the other way may be scanned twice, which records nothing the second time
+because only changes of state are written.
+
+Run it as ``flask scan-alerts``. On PostgreSQL an advisory lock keeps a
+second scanner from running at the same time.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import exists, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from .compliance import MAX_AVERAGE_WEEKLY_HOURS, REFERENCE_WEEKS
+from .db import db
+from .human_ids import assign_human_ids
+from .models import (
+    AlertScan, AlertScanShard, HoursAlert, HoursAlertState, Team, TeamMembership, User, WeeklyHours,
+)
+from .rollups import week_start
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+WARNING = 'warning'
+BREACH = 'breach'
+
+DEFAULT_WARNING_HOURS = 44.0
+UNASSIGNED = 'unassigned'
+# Key of the PostgreSQL advisory lock held while a scanner runs
+SCANNER_LOCK_KEY = 0x48A1E57
+
+
+def classify(average_hours, warning_hours=DEFAULT_WARNING_HOURS, limit=MAX_AVERAGE_WEEKLY_HOURS):
+    if average_hours > limit:
+        return BREACH
+    if average_hours >= warning_hours:
+        return WARNING
+    return OK
+
+
+def reference_period(period_end):
+    """(first, last) Mondays of the reference period whose last week is ``period_end``'s."""
+    last = week_start(period_end)
+    return last - timedelta(weeks=REFERENCE_WEEKS - 1), last
+
+
+def weekly_averages(user_ids, period_end):
+    """Average rostered hours per week over the reference period, per employee."""
+    first, last = reference_period(period_end)
+    rows = db.session.execute(
+        select(WeeklyHours.user_id, func.sum(WeeklyHours.scheduled_seconds))
+        .where(WeeklyHours.user_id.in_(user_ids), WeeklyHours.week_start.between(first, last))
+        .group_by(WeeklyHours.user_id)
+    )
+    return {user_id: (total or 0) / 3600 / REFERENCE_WEEKS for user_id, total in rows}
+
+
+def shard_members(shard):
+    """Select of the user ids scanned in ``shard``."""
+    if shard == UNASSIGNED:
+        return select(User.id.label('user_id')).where(
+            ~exists().where(TeamMembership.user_id == User.id)
+        )
+    team_id = uuid.UUID(shard)
+    other = aliased(TeamMembership)
+    return select(TeamMembership.user_id).where(
+        TeamMembership.team_id == team_id,
+        # Employees in several teams are scanned with their lowest team id only
+        ~exists().where(other.user_id == TeamMembership.user_id, other.team_id < team_id),
+    )
+
+
+def record_transitions(user_ids, team_id, period_end, warning_hours=DEFAULT_WARNING_HOURS):
+    """
+    Classify ``user_ids`` and write alerts for those whose state changed.
+    Returns the alert rows written; the caller commits.
+    """
+    averages = weekly_averages(user_ids, period_end)
+    current = dict(db.session.execute(
+        select(HoursAlertState.user_id, HoursAlertState.state).where(HoursAlertState.user_id.in_(user_ids))
+    ).all())
+    first, last = reference_period(period_end)
+    now = datetime.utcnow()
+    alerts, states = [], []
+    for user_id in user_ids:
+        average = round(averages.get(user_id, 0.0), 2)
+        state = classify(average, warning_hours)
+        previous = current.get(user_id, OK)
+        if state == previous:
+            continue
+        alerts.append({
+            'user_id': user_id, 'team_id': team_id, 'previous_state': previous, 'state': state,
+            'average_hours': average, 'period_start': first, 'period_end': last,
+        })
+        states.append({'user_id': user_id, 'state': state, 'average_hours': average, 'changed_at': now})
+
+    if alerts:
+        assign_human_ids(HoursAlert, alerts)
+        db.session.execute(insert(HoursAlert), alerts)
+        statement = pg_insert(HoursAlertState)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={name: statement.excluded[name] for name in ('state', 'average_hours', 'changed_at')},
+        ), states)
+    return alerts
+
+
+class AlertScanner:
+    def __init__(self, app, workers=4, batch_size=500, warning_hours=DEFAULT_WARNING_HOURS):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.warning_hours = warning_hours
+
+    def run_once(self, today=None):
+        """
+        Finish the current scan (resuming it if a previous run stopped
+        part-way) and return a summary dict.
+        """
+        period_end = week_start(today or date.today())
+        scan_id, shards = self._open_scan(period_end)
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix='alert-scan') as pool:
+            results = list(pool.map(lambda shard: self._scan_shard(scan_id, shard, period_end), shards))
+        scan = db.session.get(AlertScan, scan_id)
+        scan.finished_at = datetime.utcnow()
+        db.session.commit()
+        return {
+            'scan_id': str(scan_id),
+            'period_end': period_end.isoformat(),
+            'shards': len(shards),
+            'scanned': sum(scanned for scanned, _ in results),
+            'alerts': sum(alerts for _, alerts in results),
+        }
+
+    def _open_scan(self, period_end):
+        scan = db.session.execute(
+            select(AlertScan).where(AlertScan.finished_at.is_(None)).order_by(AlertScan.created_at.desc()).limit(1)
+        ).scalar_one_or_none()
+        if scan is not None and scan.period_end != period_end:
+            # A new week changes every average: drop the stale pass and start again
+            logger.info('Abandoning unfinished alert scan %s for week %s', scan.id, scan.period_end)
+            scan.finished_at = datetime.utcnow()
+            scan = None
+        if scan is None:
+            scan = AlertScan(period_end=period_end)
+            team_ids = db.session.execute(select(Team.id).order_by(Team.id)).scalars()
+            scan.shards = [AlertScanShard(shard=str(team_id)) for team_id in team_ids]
+            scan.shards.append(AlertScanShard(shard=UNASSIGNED))
+            db.session.add(scan)
+        else:
+            logger.info('Resuming alert scan %s', scan.id)
+            # Teams created since the scan opened get shards of their own
+            known = {shard.shard for shard in scan.shards}
+            team_ids = db.session.execute(select(Team.id).order_by(Team.id)).scalars()
+            scan.shards.extend(AlertScanShard(shard=str(team_id)) for team_id in team_ids if str(team_id) not in known)
+        db.session.commit()
+        pending = db.session.execute(
+            select(AlertScanShard.shard).where(AlertScanShard.scan_id == scan.id, AlertScanShard.done.is_(False))
+        ).scalars().all()
+        return scan.id, pending
+
+    def _scan_shard(self, scan_id, shard, period_end):
+        """Scan one shard from its checkpoint; returns (employees scanned, alerts written)."""
+        scanned = alerts = 0
+        team_id = None if shard == UNASSIGNED else uuid.UUID(shard)
+        with self.app.app_context():
+            try:
+                checkpoint = db.session.get(AlertScanShard, (scan_id, shard))
+                members = shard_members(shard).subquery()
+                while True:
+                    query = select(members.c.user_id).order_by(members.c.user_id).limit(self.batch_size)
+                    if checkpoint.last_user_id is not None:
+                        query = query.where(members.c.user_id > checkpoint.last_user_id)
+                    user_ids = db.session.execute(query).scalars().all()
+                    if not user_ids:
+                        checkpoint.done = True
+                        db.session.commit()
+                        return scanned, alerts
+                    alerts += len(record_transitions(user_ids, team_id, period_end, self.warning_hours))
+                    checkpoint.last_user_id = user_ids[-1]
+                    checkpoint.scanned += len(user_ids)
+                    db.session.commit()
+                    scanned += len(user_ids)
+            except Exception:
+                db.session.rollback()
+                logger.exception('Alert scan of shard %s failed; it resumes from its checkpoint next run', shard)
+                raise
+            finally:
+                db.session.remove()
+
+
+@contextmanager
+def scanner_lock():
+    """
+    Hold the scanner's advisory lock for the duration of the block; yields
+    False if another scanner holds it. A no-op on other databases.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield True
+        return
+    with db.engine.connect() as connection:
+        acquired = connection.scalar(text('SELECT pg_try_advisory_lock(:key)'), {'key': SCANNER_LOCK_KEY})
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.scalar(text('SELECT pg_advisory_unlock(:key)'), {'key': SCANNER_LOCK_KEY})
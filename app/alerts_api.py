@@ -0,0 +1,54 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from .models import HoursAlert
+from .alerts import OK, WARNING, BREACH
+from .pagination import paginate, document_pagination
+from .serialization import serialize_list_with
+from . import db
+import uuid
+
+ns = Namespace('alerts', description='48-hour average weekly hours alerts')
+api.add_namespace(ns)
+
+STATES = (OK, WARNING, BREACH)
+
+hours_alert_model = ns.model('HoursAlert', {
+    'id': fields.String(readonly=True),
+    'human_id': fields.Integer(readonly=True),
+    'user_id': fields.String(description='Employee'),
+    'team_id': fields.String(description='Team the employee was scanned with'),
+    'previous_state': fields.String(enum=list(STATES)),
+    'state': fields.String(enum=list(STATES), description='ok, warning (approaching 48h) or breach'),
+    'average_hours': fields.Float(description='Average weekly hours over the reference period'),
+    'period_start': fields.Date(description='First week of the 17-week reference period'),
+    'period_end': fields.Date(description='Last week of the reference period'),
+    'created_at': fields.DateTime(dt_format='iso8601', description='When the change was detected'),
+})
+
+alert_list_parser = ns.parser()
+alert_list_parser.add_argument('user_id', type=uuid.UUID, location='args')
+alert_list_parser.add_argument('team_id', type=uuid.UUID, location='args')
+alert_list_parser.add_argument('state', choices=STATES, location='args', help='Only changes into this state')
+
+
+@ns.route('/')
+class AlertList(Resource):
+    @ns.expect(alert_list_parser)
+    @document_pagination(ns)
+    @serialize_list_with(ns, hours_alert_model)
+    def get(self):
+        """List alert state changes, oldest first"""
+        args = alert_list_parser.parse_args()
+        query = db.session.query(
+            HoursAlert.id, HoursAlert.human_id, HoursAlert.user_id, HoursAlert.team_id,
+            HoursAlert.previous_state, HoursAlert.state, HoursAlert.average_hours,
+            HoursAlert.period_start, HoursAlert.period_end, HoursAlert.created_at,
+        )
+        if args['user_id']:
+            query = query.filter(HoursAlert.user_id == args['user_id'])
+        if args['team_id']:
+            query = query.filter(HoursAlert.team_id == args['team_id'])
+        if args['state']:
+            query = query.filter(HoursAlert.state == args['state'])
+        alerts, headers = paginate(query, HoursAlert.human_id)
+        return alerts, 200, headers
@@ -5,5 +5,9 @@ api = Api(
     title='RotaGuard API',
     description='A comprehensive API for managing employee shifts and ensuring compliance with UK Working Time Regulations.',
     prefix='/api',
-    doc='/api/docs'  # Move Swagger UI to /api/docs
+    doc='/api/docs',  # Move Swagger UI to /api/docs
+    authorizations={
+        'Bearer': {'type': 'apiKey', 'in': 'header', 'name': 'Authorization',
+                   'description': "JWT from /api/auth/login, sent as 'Bearer <token>'"},
+    },
 )
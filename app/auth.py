@@ -0,0 +1,206 @@
+"""
+Bearer token authentication.
+
+``token_required`` verifies the HS256 JWT issued by LoginResource and puts
+the caller's Principal on ``flask.g.principal``. Decoded tokens and
+principals (user id, role names, managed team ids) are kept in a bounded
+per-process LRU with a TTL, so an authenticated request normally costs no
+auth queries at all. A session listener drops a user's principal whenever a
+commit changes their roles or the teams they manage; other processes see
+the change once the TTL runs out.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import wraps
+
+import jwt
+from flask import current_app, g, request
+from flask_restx import abort
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from .db import db
+from .models import Role, Team, User, UserRole
+
+TOKEN_ALGORITHM = 'HS256'
+TOKEN_LIFETIME = timedelta(hours=24)
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: str
+    email: str
+    role_names: frozenset
+    managed_team_ids: frozenset
+
+    def has_role(self, *names):
+        return bool(self.role_names.intersection(names))
+
+    def manages(self, team_id):
+        return str(team_id) in self.managed_team_ids
+
+
+def issue_token(user):
+    return jwt.encode({
+        'user_id': str(user.id),
+        'exp': datetime.utcnow() + TOKEN_LIFETIME
+    }, current_app.config['SECRET_KEY'], algorithm=TOKEN_ALGORITHM)
+
+
+def load_principal(user_id):
+    """Resolve a Principal from the database; None if the user no longer exists."""
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        return None
+    user = db.session.execute(select(User.id, User.email).where(User.id == user_id)).first()
+    if user is None:
+        return None
+    role_names = db.session.execute(
+        select(Role.name).join(UserRole, UserRole.role_id == Role.id).where(UserRole.user_id == user_id)
+    ).scalars()
+    team_ids = db.session.execute(select(Team.id).where(Team.manager_id == user_id)).scalars()
+    return Principal(
+        user_id=str(user.id),
+        email=user.email,
+        role_names=frozenset(role_names),
+        managed_team_ids=frozenset(str(team_id) for team_id in team_ids),
+    )
+
+
+class PrincipalCache:
+    """Per-process LRU of decoded tokens and principals, both with a TTL."""
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._tokens = OrderedDict()      # token -> (user_id, exp)
+        self._principals = OrderedDict()  # user_id -> (principal, loaded_at)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = int(app.config.get('AUTH_CACHE_SIZE', self.max_size))
+        self.ttl = float(app.config.get('AUTH_CACHE_TTL', self.ttl))
+
+    def decode(self, token):
+        """Return the token's user id, verifying it on first sight; raises jwt.InvalidTokenError."""
+        with self._lock:
+            cached = self._tokens.get(token)
+            if cached is not None:
+                self._tokens.move_to_end(token)
+        if cached is None:
+            claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=[TOKEN_ALGORITHM])
+            if 'user_id' not in claims:
+                raise jwt.InvalidTokenError('Token has no user_id')
+            cached = (claims['user_id'], claims.get('exp'))
+            self._put(self._tokens, token, cached)
+        user_id, exp = cached
+        if exp is not None and exp <= time.time():
+            with self._lock:
+                self._tokens.pop(token, None)
+            raise jwt.ExpiredSignatureError('Signature has expired')
+        return user_id
+
+    def principal(self, user_id):
+        with self._lock:
+            cached = self._principals.get(user_id)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                self._principals.move_to_end(user_id)
+                return cached[0]
+        principal = load_principal(user_id)
+        if principal is not None:
+            self._put(self._principals, user_id, (principal, time.monotonic()))
+        return principal
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._tokens.clear()
+                self._principals.clear()
+            else:
+                for user_id in user_ids:
+                    self._principals.pop(str(user_id), None)
+
+    def _put(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+
+
+principal_cache = PrincipalCache()
+
+
+def current_principal():
+    """Authenticate the current request and return its Principal, aborting with 401 if that fails."""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        abort(401, 'Missing bearer token')
+    try:
+        user_id = principal_cache.decode(token.strip())
+    except jwt.ExpiredSignatureError:
+        abort(401, 'Token has expired')
+    except jwt.InvalidTokenError:
+        abort(401, 'Invalid token')
+    principal = principal_cache.principal(user_id)
+    if principal is None:
+        abort(401, 'Invalid token')
+    g.principal = principal
+    return principal
+
+
+def token_required(func):
+    """Require a valid bearer token; the caller is available as ``g.principal``."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        current_principal()
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def roles_required(*role_names):
+    """Require a valid bearer token whose user holds at least one of ``role_names``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not current_principal().has_role(*role_names):
+                abort(403, 'Insufficient role')
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Invalidation ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_principal_changes(session, flush_context):
+    changed = session.info.setdefault('principal_changes', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, UserRole):
+            changed.add(obj.user_id)
+            for value in inspect(obj).attrs.user_id.history.deleted:
+                changed.add(value)
+        elif isinstance(obj, Team):
+            history = inspect(obj).attrs.manager_id.history
+            changed.update(history.added)
+            changed.update(history.deleted)
+            if obj in session.deleted or obj in session.new:
+                changed.add(obj.manager_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_principals(session):
+    changed = session.info.pop('principal_changes', None)
+    if changed:
+        principal_cache.invalidate(user_id for user_id in changed if user_id is not None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_principal_changes(session):
+    session.info.pop('principal_changes', None)
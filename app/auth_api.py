@@ -1,10 +1,10 @@
 from .api import api
 from flask_restx import Namespace, Resource, fields
 from .models import User
-from . import db, bcrypt
-import jwt
-from datetime import datetime, timedelta
-from flask import current_app, request
+from . import db
+from .hashing import password_hasher
+from .auth import issue_token, token_required
+from flask import g, request
 
 ns = Namespace('auth', description='Authentication operations')
 api.add_namespace(ns)
@@ -27,6 +27,13 @@ token_model = ns.model('Token', {
     'token': fields.String(description='Authentication token')
 })
 
+principal_model = ns.model('Principal', {
+    'user_id': fields.String(description='The authenticated user ID'),
+    'email': fields.String(description='The authenticated user\'s email address'),
+    'role_names': fields.List(fields.String, description='Roles held by the user'),
+    'managed_team_ids': fields.List(fields.String, description='Teams the user manages'),
+})
+
 message_model = ns.model('Message', {
     'message': fields.String(description='A message describing the result of the operation'),
     'id': fields.String(description='The ID of the newly created user')
@@ -53,7 +60,7 @@ class RegisterResource(Resource):
         if User.query.filter_by(email=data['email']).first():
             ns.abort(409, 'Email address already registered')
 
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        hashed_password = password_hasher.generate_password_hash(data['password'])
 
         new_user = User(
             email=data['email'],
@@ -83,12 +90,36 @@ class LoginResource(Resource):
         data = request.get_json()
         user = User.query.filter_by(email=data['email']).first()
 
-        if not user or not bcrypt.check_password_hash(user.password_hash, data['password']):
+        if not user or not password_hasher.check_password_hash(user.password_hash, data['password']):
             ns.abort(401, 'Invalid credentials')
 
-        token = jwt.encode({
-            'user_id': str(user.id),
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        # Upgrade hashes made with an older work factor while we have the password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.generate_password_hash(data['password'])
+            db.session.commit()
 
-        return {'token': token}
+        return {'token': issue_token(user)}
+
+
+@ns.route('/me')
+class MeResource(Resource):
+    @ns.doc(security='Bearer')
+    @ns.response(401, 'Missing, invalid or expired token')
+    @ns.marshal_with(principal_model)
+    @token_required
+    def get(self):
+        """Returns the user the bearer token belongs to."""
+        principal = g.principal
+        return {
+            'user_id': principal.user_id,
+            'email': principal.email,
+            'role_names': sorted(principal.role_names),
+            'managed_team_ids': sorted(principal.managed_team_ids),
+        }
+
+
+@ns.route('/hashing-stats')
+class HashingStatsResource(Resource):
+    def get(self):
+        """Password hashing queue depth and latency counters for this process."""
+        return password_hasher.stats()
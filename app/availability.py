@@ -0,0 +1,221 @@
+"""
+In-memory availability index answering "who can cover this slot".
+
+For each team an index holds, as NumPy arrays bucketed by UTC day:
+
+* blocking intervals per member: periods they said they cannot work, and
+  every shift they work in any team, widened by the 11-hour daily rest so a
+  slot too close to a shift counts as a rest conflict;
+* declared availability windows.
+
+An interval is stored in the bucket of every day it touches, so a query
+only looks at the buckets of the days its slot covers (usually one) and
+tests those entries with a couple of vectorised comparisons, instead of
+scanning every member's rows. Role eligibility is a precomputed boolean
+mask per role over the team's members.
+
+Indexes are built lazily from the database on the first query for a team
+and kept in a per-process LRU. Commits that touch availability, shifts,
+role assignments, team membership or users drop the affected indexes (see
+the session listeners below); a TTL bounds staleness from writes made by
+other processes.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from .compliance import DAILY_REST_HOURS, DAY, HOUR
+from .db import db
+from .models import Availability, Shift, Team, TeamMembership, User, UserRole
+
+EPOCH = datetime(1970, 1, 1)
+REST_SECONDS = DAILY_REST_HOURS * HOUR
+# How far back a cached index reaches; older slots get a one-off index
+LOOKBACK = timedelta(days=7)
+
+
+def to_epoch(value):
+    return int((value - EPOCH).total_seconds())
+
+
+@dataclass(frozen=True)
+class Candidate:
+    user_id: object
+    name: str
+    email: str
+    declared_available: bool  # inside a window the employee marked as available
+
+
+def _bucket_by_day(intervals):
+    """[(member, start, end)] epoch seconds -> {day: (members, starts, ends) arrays}."""
+    by_day = defaultdict(list)
+    for member, start, end in intervals:
+        for day in range(start // DAY, (end - 1) // DAY + 1):
+            by_day[day].append((member, start, end))
+    return {
+        day: tuple(np.array(column, dtype=np.int64) for column in zip(*rows))
+        for day, rows in by_day.items()
+    }
+
+
+class TeamAvailability:
+    """Availability of one team's members from ``since`` onwards."""
+
+    def __init__(self, team_id, members, member_roles, blocked, windows, since):
+        self.team_id = team_id
+        self.members = members  # [(user_id, name, email)]
+        self.user_ids = {member[0] for member in members}
+        self.since = since
+        position = {member[0]: i for i, member in enumerate(members)}
+        self.role_masks = {}
+        for user_id, role_id in member_roles:
+            mask = self.role_masks.setdefault(role_id, np.zeros(len(members), dtype=bool))
+            mask[position[user_id]] = True
+        self.blocked = _bucket_by_day((position[user_id], start, end) for user_id, start, end in blocked)
+        self.windows = _bucket_by_day((position[user_id], start, end) for user_id, start, end in windows)
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_db(cls, team_id, since):
+        members = db.session.execute(
+            select(User.id, User.name, User.email)
+            .join(TeamMembership, TeamMembership.user_id == User.id)
+            .where(TeamMembership.team_id == team_id)
+            .order_by(User.name, User.id)
+        ).tuples().all()
+        member_ids = [member[0] for member in members]
+        member_roles = db.session.execute(
+            select(UserRole.user_id, UserRole.role_id).where(UserRole.user_id.in_(member_ids))
+        ).tuples().all()
+        blocked, windows = [], []
+        periods = db.session.execute(
+            select(Availability.user_id, Availability.start_time, Availability.end_time, Availability.available)
+            .where(Availability.user_id.in_(member_ids), Availability.end_time > since)
+        )
+        for user_id, start, end, available in periods:
+            (windows if available else blocked).append((user_id, to_epoch(start), to_epoch(end)))
+        # Shifts in every team count: the same person cannot be in two places
+        shifts = db.session.execute(
+            select(Shift.user_id, Shift.start_time, Shift.end_time)
+            .where(Shift.user_id.in_(member_ids), Shift.end_time > since - timedelta(seconds=REST_SECONDS))
+        )
+        for user_id, start, end in shifts:
+            blocked.append((user_id, to_epoch(start) - REST_SECONDS, to_epoch(end) + REST_SECONDS))
+        return cls(team_id, members, member_roles, blocked, windows, since)
+
+    def who_can_cover(self, start, end, role_id=None, require_available=False):
+        """
+        Members (with ``role_id``, if given) free for the whole of [start, end)
+        with daily rest on both sides; those who declared themselves available
+        for it come first.
+        """
+        s, e = to_epoch(start), to_epoch(end)
+        if role_id is not None:
+            eligible = self.role_masks.get(role_id, np.zeros(len(self.members), dtype=bool)).copy()
+        else:
+            eligible = np.ones(len(self.members), dtype=bool)
+        for day in range(s // DAY, (e - 1) // DAY + 1):
+            bucket = self.blocked.get(day)
+            if bucket is not None:
+                members, starts, ends = bucket
+                eligible[members[(starts < e) & (ends > s)]] = False
+        declared = np.zeros(len(self.members), dtype=bool)
+        bucket = self.windows.get(s // DAY)
+        if bucket is not None:
+            members, starts, ends = bucket
+            declared[members[(starts <= s) & (ends >= e)]] = True
+        if require_available:
+            eligible &= declared
+        found = np.flatnonzero(eligible)
+        found = found[np.argsort(~declared[found], kind='stable')]
+        return [Candidate(*self.members[i], declared_available=bool(declared[i])) for i in found]
+
+
+class AvailabilityIndex:
+    """Per-process LRU of TeamAvailability, keyed by team id."""
+
+    def __init__(self, max_size=200, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._teams = OrderedDict()
+        self._generation = 0  # bumped by every invalidation
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = int(app.config.get('AVAILABILITY_INDEX_SIZE', self.max_size))
+        self.ttl = float(app.config.get('AVAILABILITY_INDEX_TTL', self.ttl))
+
+    def team(self, team_id):
+        """Return the index for ``team_id``, building it if missing or stale."""
+        with self._lock:
+            index = self._teams.get(team_id)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl:
+                self._teams.move_to_end(team_id)
+                return index
+            generation = self._generation
+        index = TeamAvailability.from_db(team_id, datetime.utcnow() - LOOKBACK)
+        with self._lock:
+            # Do not cache a build that an invalidation may have overtaken
+            if generation == self._generation:
+                self._teams[team_id] = index
+                self._teams.move_to_end(team_id)
+                while len(self._teams) > self.max_size:
+                    self._teams.popitem(last=False)
+        return index
+
+    def who_can_cover(self, team_id, start, end, role_id=None, require_available=False):
+        index = self.team(team_id)
+        if start < index.since:
+            index = TeamAvailability.from_db(team_id, start - timedelta(days=1))
+        return index.who_can_cover(start, end, role_id=role_id, require_available=require_available)
+
+    def invalidate(self, user_ids=(), team_ids=()):
+        user_ids, team_ids = set(user_ids), set(team_ids)
+        with self._lock:
+            self._generation += 1
+            for team_id, index in list(self._teams.items()):
+                if team_id in team_ids or not index.user_ids.isdisjoint(user_ids):
+                    del self._teams[team_id]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._teams.clear()
+
+
+availability_index = AvailabilityIndex()
+
+
+# --- Dropping indexes when their inputs change ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_availability_changes(session, flush_context):
+    users, teams = session.info.setdefault('availability_changes', (set(), set()))
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Availability, Shift, UserRole)):
+            users.add(obj.user_id)
+            users.update(inspect(obj).attrs.user_id.history.deleted)
+        elif isinstance(obj, TeamMembership):
+            teams.add(obj.team_id)
+            teams.update(inspect(obj).attrs.team_id.history.deleted)
+        elif isinstance(obj, (User, Team)):
+            (users if isinstance(obj, User) else teams).add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_availability(session):
+    changes = session.info.pop('availability_changes', None)
+    if changes and (changes[0] or changes[1]):
+        availability_index.invalidate(user_ids=changes[0], team_ids=changes[1])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_availability_changes(session):
+    session.info.pop('availability_changes', None)
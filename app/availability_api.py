@@ -0,0 +1,159 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields, inputs
+from flask import request
+from sqlalchemy import select
+from .models import Availability, Role, Team, User
+from .availability import availability_index
+from .rota_import import parse_timestamp
+from .pagination import paginate, document_pagination
+from .serialization import serialize_list_with
+from . import db
+import uuid
+
+ns = Namespace('availability', description='When team members can and cannot work')
+api.add_namespace(ns)
+
+availability_model = ns.model('Availability', {
+    'id': fields.String(readonly=True, description='The availability entry unique identifier'),
+    'human_id': fields.Integer(readonly=True),
+    'user_id': fields.String(required=True, description='Employee'),
+    'start_time': fields.DateTime(required=True, dt_format='iso8601', description='Start (UTC)'),
+    'end_time': fields.DateTime(required=True, dt_format='iso8601', description='End (UTC)'),
+    'available': fields.Boolean(default=False, description='True if they can work then, false if they cannot'),
+    'note': fields.String(description='Reason or comment'),
+})
+
+candidate_model = ns.model('CoverCandidate', {
+    'user_id': fields.String(description='Employee who can cover the slot'),
+    'name': fields.String,
+    'email': fields.String,
+    'declared_available': fields.Boolean(description='They marked themselves available for the whole slot'),
+})
+
+availability_list_parser = ns.parser()
+availability_list_parser.add_argument('user_id', type=uuid.UUID, location='args')
+availability_list_parser.add_argument('start', type=parse_timestamp, location='args', help='Only entries ending after this time')
+availability_list_parser.add_argument('end', type=parse_timestamp, location='args', help='Only entries starting before this time')
+
+cover_parser = ns.parser()
+cover_parser.add_argument('team_id', type=uuid.UUID, location='args', required=True)
+cover_parser.add_argument('start', type=parse_timestamp, location='args', required=True, help='Slot start (ISO 8601)')
+cover_parser.add_argument('end', type=parse_timestamp, location='args', required=True, help='Slot end (ISO 8601)')
+cover_parser.add_argument('role', location='args', help='Role name or id the cover must hold')
+cover_parser.add_argument('require_available', type=inputs.boolean, location='args', default=False,
+                          help='Only members who declared themselves available for the slot')
+
+
+def get_availability_or_404(id):
+    try:
+        availability_id = uuid.UUID(id)
+    except ValueError:
+        ns.abort(400, f"Invalid id format: '{id}' is not a valid UUID.")
+    availability = db.session.get(Availability, availability_id)
+    if availability is None:
+        ns.abort(404, f"Availability entry with id {id} not found")
+    return availability
+
+
+def apply_availability_payload(availability, data):
+    try:
+        user_id = uuid.UUID(str(data.get('user_id', availability.user_id)))
+        start = parse_timestamp(data['start_time']) if 'start_time' in data else availability.start_time
+        end = parse_timestamp(data['end_time']) if 'end_time' in data else availability.end_time
+    except (TypeError, ValueError):
+        ns.abort(400, 'user_id must be a UUID and start_time/end_time ISO 8601 timestamps')
+    if start is None or end is None or end <= start:
+        ns.abort(400, 'end_time must be after start_time')
+    if db.session.get(User, user_id) is None:
+        ns.abort(400, f"Unknown user '{user_id}'")
+    availability.user_id = user_id
+    availability.start_time = start
+    availability.end_time = end
+    availability.available = bool(data.get('available', availability.available))
+    availability.note = data.get('note', availability.note)
+
+
+def resolve_role_id(value):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        role_id = db.session.execute(select(Role.id).where(Role.name == value)).scalar()
+        if role_id is None:
+            ns.abort(404, f"Role '{value}' not found")
+        return role_id
+
+
+@ns.route('/')
+class AvailabilityList(Resource):
+    @ns.expect(availability_list_parser)
+    @document_pagination(ns)
+    @serialize_list_with(ns, availability_model)
+    def get(self):
+        """List availability entries"""
+        args = availability_list_parser.parse_args()
+        query = db.session.query(
+            Availability.id, Availability.human_id, Availability.user_id, Availability.start_time,
+            Availability.end_time, Availability.available, Availability.note,
+        )
+        if args['user_id']:
+            query = query.filter(Availability.user_id == args['user_id'])
+        if args['start']:
+            query = query.filter(Availability.end_time > args['start'])
+        if args['end']:
+            query = query.filter(Availability.start_time < args['end'])
+        entries, headers = paginate(query, Availability.start_time, Availability.id)
+        return entries, 200, headers
+
+    @ns.expect(availability_model)
+    @ns.marshal_with(availability_model, code=201)
+    def post(self):
+        """Record when an employee can or cannot work"""
+        availability = Availability(available=False)
+        apply_availability_payload(availability, request.get_json() or {})
+        db.session.add(availability)
+        db.session.commit()
+        return availability, 201
+
+
+@ns.route('/cover')
+class CoverQuery(Resource):
+    @ns.expect(cover_parser)
+    @ns.response(404, 'Team or role not found')
+    @serialize_list_with(ns, candidate_model)
+    def get(self):
+        """Team members free to cover a slot, with no clash and daily rest on both sides"""
+        args = cover_parser.parse_args()
+        if args['end'] <= args['start']:
+            ns.abort(400, 'end must be after start')
+        if db.session.get(Team, args['team_id']) is None:
+            ns.abort(404, f"Team with id {args['team_id']} not found")
+        role_id = resolve_role_id(args['role']) if args['role'] else None
+        return availability_index.who_can_cover(
+            args['team_id'], args['start'], args['end'], role_id=role_id,
+            require_available=args['require_available'],
+        )
+
+
+@ns.route('/<string:id>')
+@ns.response(404, 'Availability entry not found')
+@ns.param('id', 'The availability entry identifier')
+class AvailabilityResource(Resource):
+    @ns.marshal_with(availability_model)
+    def get(self, id):
+        """Fetch an availability entry by ID"""
+        return get_availability_or_404(id)
+
+    @ns.expect(availability_model)
+    @ns.marshal_with(availability_model)
+    def put(self, id):
+        """Update an availability entry"""
+        availability = get_availability_or_404(id)
+        apply_availability_payload(availability, request.get_json() or {})
+        db.session.commit()
+        return availability
+
+    def delete(self, id):
+        """Delete an availability entry"""
+        db.session.delete(get_availability_or_404(id))
+        db.session.commit()
+        return {'message': 'Availability entry deleted'}
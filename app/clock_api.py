@@ -0,0 +1,69 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from flask import request
+from .clock_ingest import ingestor
+
+ns = Namespace('clock', description='Clock-in/clock-out punches')
+api.add_namespace(ns)
+
+clock_event_model = ns.model('ClockEvent', {
+    'event_id': fields.String(required=True, description='Client-generated id; retries with the same id are stored once'),
+    'user_id': fields.String(required=True, description='Employee punching'),
+    'kind': fields.String(required=True, enum=['in', 'out'], description='Clock in or clock out'),
+    'occurred_at': fields.DateTime(required=True, dt_format='iso8601', description='When the punch happened (ISO 8601)'),
+})
+
+clock_batch_model = ns.model('ClockEventBatch', {
+    'events': fields.List(fields.Nested(clock_event_model), required=True),
+})
+
+clock_error_model = ns.model('ClockEventError', {
+    'index': fields.Integer(description='Position of the rejected event in the request'),
+    'errors': fields.List(fields.String),
+})
+
+clock_receipt_model = ns.model('ClockEventReceipt', {
+    'accepted': fields.Integer(description='Events queued for writing'),
+    'duplicates': fields.Integer(description='Events already received earlier'),
+    'errors': fields.List(fields.Nested(clock_error_model)),
+})
+
+clock_stats_model = ns.model('ClockIngestStats', {
+    'pending': fields.Integer(description='Events queued but not yet written'),
+    'accepted': fields.Integer,
+    'duplicates': fields.Integer,
+    'rejected': fields.Integer(description='Events refused because the queue was full'),
+    'written': fields.Integer,
+    'failed': fields.Integer(description='Events dropped because they could not be written'),
+    'batches': fields.Integer,
+})
+
+
+@ns.route('/events')
+class ClockEvents(Resource):
+    @ns.expect(clock_batch_model)
+    @ns.marshal_with(clock_receipt_model, code=202)
+    @ns.response(400, 'Malformed request')
+    @ns.response(503, 'Ingestion queue full, retry after the Retry-After delay')
+    def post(self):
+        """
+        Record one punch, a list of punches or {"events": [...]}.
+        Punches are acknowledged once queued and written in batches shortly after.
+        """
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict) and 'events' in payload:
+            payload = payload['events']
+        elif isinstance(payload, dict):
+            payload = [payload]
+        if not isinstance(payload, list) or not payload:
+            ns.abort(400, 'Expected a clock event, a list of events or {"events": [...]}')
+        accepted, duplicates, errors = ingestor.submit(payload)
+        return {'accepted': accepted, 'duplicates': duplicates, 'errors': errors}, 202
+
+
+@ns.route('/stats')
+class ClockIngestStats(Resource):
+    @ns.marshal_with(clock_stats_model)
+    def get(self):
+        """Counters of this process's ingestion queue"""
+        return dict(ingestor.stats, pending=ingestor.pending())
@@ -0,0 +1,315 @@
+"""
+Write-behind ingestion of clock-in/clock-out punches.
+
+At shift change a few hundred staff punch within the same minute, so the
+endpoint only validates punches and puts them on a bounded in-process
+queue; a single flusher thread drains the queue every ``flush_interval``
+seconds (or as soon as ``batch_size`` punches are waiting) and writes each
+batch with one multi-row INSERT ... ON CONFLICT (event_id) DO NOTHING,
+taking its human_ids from one block reservation. The hours rollups of the
+employees in the batch are refreshed in the same transaction.
+
+Punches are deduplicated by their client-supplied ``event_id``: retries
+seen recently by this process are dropped before they are queued, and the
+unique constraint silently absorbs the rest. There is one queue and one
+writer per process, so punches are written in the order they arrived and
+each employee's punches get increasing human_ids. When the queue is full
+callers get a 503 with Retry-After instead of waiting.
+
+A punch that cannot be written is put back with an exponential backoff
+(``retry_backoff`` seconds, doubling) and given up on after
+``max_attempts`` tries; only then is its event_id forgotten, so the
+client's own retry is accepted rather than answered as a duplicate.
+
+Queued punches live in memory until flushed; the queue is drained at
+interpreter exit, but a crashed worker loses what it had not written.
+"""
+import atexit
+import logging
+import math
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from jsonschema import Draft7Validator
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from werkzeug.exceptions import ServiceUnavailable
+
+from .db import db
+from .human_ids import assign_human_ids
+from .models import ClockEvent, User
+from .rollups import MAX_PUNCH_GAP, extend_span, refresh_rollups
+from .rota_import import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+EVENT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'event_id': {'type': 'string', 'minLength': 1, 'maxLength': 64},
+        'user_id': {'type': 'string'},
+        'kind': {'enum': ['in', 'out']},
+        'occurred_at': {'type': 'string', 'minLength': 10},
+    },
+    'required': ['event_id', 'user_id', 'kind', 'occurred_at'],
+}
+
+event_validator = Draft7Validator(EVENT_SCHEMA)
+
+
+class IngestQueueFull(ServiceUnavailable):
+    description = 'Too many clock events waiting to be written, please retry shortly.'
+
+    def __init__(self, retry_after=1):
+        super().__init__(retry_after=retry_after)
+
+
+class ClockIngestor:
+    def __init__(self, queue_size=10000, batch_size=500, flush_interval=0.2, dedupe_size=100000,
+                 max_attempts=5, retry_backoff=1.0):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_size = dedupe_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._app = None
+        self._queue = queue.Queue(queue_size)
+        self._retries = []  # (due, row), waiting out their backoff
+        self._attempts = {}  # event_id -> failed writes so far
+        self._recent = OrderedDict()  # event_id -> None, newest last
+        self._known_users = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+        self.stats = {'accepted': 0, 'duplicates': 0, 'rejected': 0, 'written': 0, 'retried': 0, 'failed': 0,
+                      'batches': 0}
+
+    def init_app(self, app):
+        self._app = app
+        self.queue_size = int(app.config.get('CLOCK_QUEUE_SIZE', self.queue_size))
+        self.batch_size = int(app.config.get('CLOCK_BATCH_SIZE', self.batch_size))
+        self.flush_interval = float(app.config.get('CLOCK_FLUSH_INTERVAL', self.flush_interval))
+        self.max_attempts = int(app.config.get('CLOCK_MAX_ATTEMPTS', self.max_attempts))
+        self.retry_backoff = float(app.config.get('CLOCK_RETRY_BACKOFF', self.retry_backoff))
+        with self._lock:
+            if self._queue.maxsize != self.queue_size and self._queue.empty():
+                self._queue = queue.Queue(self.queue_size)
+
+    # --- Accepting punches ---
+
+    def submit(self, events):
+        """
+        Validate ``events`` and queue the new ones. Returns (accepted,
+        duplicates, errors), where errors lists {index, errors} for rejected
+        punches. Raises IngestQueueFull if the queue cannot take them.
+        """
+        received_at = datetime.utcnow()
+        valid, errors = [], []
+        for index, event in enumerate(events):
+            problems = self._validate(event)
+            if problems:
+                errors.append({'index': index, 'errors': problems})
+            else:
+                valid.append((index, event))
+
+        unknown = self._unknown_users({event['user_id'] for _, event in valid})
+        rows, duplicates = [], 0
+        with self._lock:
+            for index, event in valid:
+                if event['user_id'] in unknown:
+                    errors.append({'index': index, 'errors': [f"Unknown user '{event['user_id']}'"]})
+                    continue
+                if event['event_id'] in self._recent:
+                    duplicates += 1
+                    continue
+                self._remember(self._recent, event['event_id'], self.dedupe_size)
+                rows.append({
+                    'event_id': event['event_id'],
+                    'user_id': event['user_id'],
+                    'kind': event['kind'],
+                    'occurred_at': event['occurred_at'],
+                    'received_at': received_at,
+                })
+            if self._queue.maxsize - self._queue.qsize() < len(rows):
+                for row in rows:  # let the client's retry through
+                    self._recent.pop(row['event_id'], None)
+                self.stats['rejected'] += len(rows)
+                raise IngestQueueFull(retry_after=max(1, round(self.flush_interval * 5)))
+            for row in rows:
+                self._queue.put_nowait(row)
+            self.stats['accepted'] += len(rows)
+            self.stats['duplicates'] += duplicates
+        self._ensure_flusher()
+        errors.sort(key=lambda error: error['index'])
+        return len(rows), duplicates, errors
+
+    def _validate(self, event):
+        if not isinstance(event, dict):
+            return ['Event must be an object']
+        problems = [error.message for error in event_validator.iter_errors(event)]
+        if problems:
+            return problems
+        try:
+            event['user_id'] = uuid.UUID(event['user_id'])
+            event['occurred_at'] = parse_timestamp(event['occurred_at'])
+        except ValueError:
+            return ['user_id must be a UUID and occurred_at an ISO 8601 timestamp']
+        return []
+
+    def _unknown_users(self, user_ids):
+        with self._lock:
+            missing = [user_id for user_id in user_ids if user_id not in self._known_users]
+        if not missing:
+            return set()
+        found = set(db.session.execute(select(User.id).where(User.id.in_(missing))).scalars())
+        with self._lock:
+            for user_id in found:
+                self._remember(self._known_users, user_id, self.dedupe_size)
+        return set(missing) - found
+
+    @staticmethod
+    def _remember(entries, key, limit):
+        entries[key] = None
+        entries.move_to_end(key)
+        if len(entries) > limit:
+            entries.popitem(last=False)
+
+    # --- Writing ---
+
+    def pending(self):
+        with self._lock:
+            return self._queue.qsize() + len(self._retries)
+
+    def flush(self):
+        """
+        Write everything queued so far, including punches waiting out a
+        retry backoff; returns the number of punches written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(block=False, retry_due=math.inf)
+                if not batch:
+                    return written
+                written += self._write(batch)
+
+    def _take(self, block=True, retry_due=None):
+        batch = self._due_retries(time.monotonic() if retry_due is None else retry_due)
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                if not block or time.monotonic() >= deadline:
+                    break
+                time.sleep(min(0.01, self.flush_interval))
+        return batch
+
+    def _write(self, batch):
+        with self._app.app_context():
+            try:
+                written, failed = self._insert(batch), []
+            except Exception:
+                logger.exception('Writing %d clock events failed', len(batch))
+                db.session.rollback()
+                written, failed = 0, batch
+                if len(batch) > 1:
+                    # One bad punch should not hold back the rest of its batch
+                    written, failed = self._insert_one_at_a_time(batch)
+                self._retry_later(failed)
+            finally:
+                db.session.remove()
+        with self._lock:
+            self.stats['written'] += written
+            self.stats['batches'] += 1
+            if self._attempts:
+                retrying = {row['event_id'] for row in failed}
+                for row in batch:
+                    if row['event_id'] not in retrying:
+                        self._attempts.pop(row['event_id'], None)
+        return written
+
+    def _insert_one_at_a_time(self, rows):
+        written, failed = 0, []
+        for row in rows:
+            try:
+                written += self._insert([row])
+            except Exception:
+                db.session.rollback()
+                failed.append(row)
+        return written, failed
+
+    def _retry_later(self, rows):
+        """Put failed rows back after a backoff, or drop them once out of attempts."""
+        now = time.monotonic()
+        with self._lock:
+            for row in rows:
+                attempts = self._attempts.get(row['event_id'], 0) + 1
+                if attempts >= self.max_attempts:
+                    logger.error('Dropping clock event %s after %d attempts', row['event_id'], attempts)
+                    self._attempts.pop(row['event_id'], None)
+                    self._recent.pop(row['event_id'], None)  # let the client's retry through
+                    self.stats['failed'] += 1
+                    continue
+                self._attempts[row['event_id']] = attempts
+                self._retries.append((now + self.retry_backoff * 2 ** (attempts - 1), row))
+                self.stats['retried'] += 1
+
+    def _due_retries(self, now):
+        with self._lock:
+            due = [row for when, row in self._retries if when <= now][:self.batch_size]
+            if due:
+                taken = {id(row) for row in due}
+                self._retries = [(when, row) for when, row in self._retries if id(row) not in taken]
+        return due
+
+    def _insert(self, rows):
+        rows = [dict(row, id=uuid.uuid4(), created_at=row['received_at'], updated_at=row['received_at']) for row in rows]
+        assign_human_ids(ClockEvent, rows)
+        statement = pg_insert(ClockEvent).values(rows).on_conflict_do_nothing(index_elements=['event_id'])
+        result = db.session.execute(statement)
+        spans = {}
+        for row in rows:
+            extend_span(spans, row['user_id'], row['occurred_at'] - MAX_PUNCH_GAP, row['occurred_at'] + MAX_PUNCH_GAP)
+        refresh_rollups(spans)
+        db.session.commit()
+        return result.rowcount
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: the parent's thread did not come along
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='clock-ingest-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Held while a batch is in hand, so flush() never returns early
+            with self._flush_lock:
+                batch = self._take(block=True)
+                if batch:
+                    self._write(batch)
+
+
+ingestor = ClockIngestor()
+
+
+@atexit.register
+def _drain_at_exit():
+    if ingestor._app is not None and ingestor.pending():
+        ingestor.flush()
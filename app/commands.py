@@ -1,6 +1,8 @@
 import click
+import uuid
 from flask.cli import with_appcontext
 from app.models import Role, db
+from app.exports import DATASETS, FORMATS
 
 @click.command('create-roles')
 @with_appcontext
@@ -16,3 +18,245 @@ def create_roles_command():
         click.echo(f"Created roles: {', '.join(created)}")
     else:
         click.echo("All roles already exist.")
+
+
+@click.command('import-rota')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--team', 'team_id', default=None, help='Team UUID the shifts belong to.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def import_rota_command(path, team_id, fmt, batch_size):
+    """Import a rota from a CSV or JSON file."""
+    from app.rota_import import import_rota, detect_format
+    if team_id:
+        try:
+            team_id = uuid.UUID(team_id)
+        except ValueError:
+            raise click.BadParameter(f"'{team_id}' is not a valid UUID.", param_hint='--team')
+    with open(path, 'rb') as stream:
+        report = import_rota(stream, fmt or detect_format(path), team_id=team_id, batch_size=batch_size)
+    click.echo(f"Imported {report['imported']} shift(s), {report['failed']} row(s) rejected.")
+    for error in report['errors']:
+        click.echo(f"  row {error['row']}: {'; '.join(error['errors'])}", err=True)
+    if report['errors_truncated']:
+        click.echo("  (further errors omitted)", err=True)
+
+
+@click.command('check-compliance')
+@click.option('--team', 'team_id', default=None, help='Only check members of this team (UUID).')
+@click.option('--start', default=None, help='Only report violations after this time (ISO 8601).')
+@click.option('--end', default=None, help='Only report violations before this time (ISO 8601).')
+@with_appcontext
+def check_compliance_command(team_id, start, end):
+    """Check all shifts against the Working Time Regulations."""
+    import time
+    from app.compliance import load_shift_columns, check_compliance
+    from app.rota_import import parse_timestamp
+    start = parse_timestamp(start) if start else None
+    end = parse_timestamp(end) if end else None
+    started = time.perf_counter()
+    columns = load_shift_columns(team_id=uuid.UUID(team_id) if team_id else None, start=start, end=end)
+    results = check_compliance(columns, start=start, end=end)
+    elapsed = time.perf_counter() - started
+    for user_id, violations in results.items():
+        click.echo(f"{user_id}: {len(violations)} violation(s)")
+        for violation in violations:
+            click.echo(f"  {violation.rule} {violation.start:%Y-%m-%d %H:%M} to {violation.end:%Y-%m-%d %H:%M}"
+                       f" ({violation.value:.1f} vs limit {violation.limit})")
+    click.echo(f"Checked {len(columns)} shift(s) for {len(columns.user_ids)} employee(s) in {elapsed:.2f}s; "
+               f"{len(results)} with violations.")
+
+
+@click.command('verify-compliance-state')
+@click.option('--limit', default=100, show_default=True, help='Number of employees to check.')
+@click.option('--seed', default=0, show_default=True)
+@with_appcontext
+def verify_compliance_state_command(limit, seed):
+    """Replay employees' shifts through the incremental checker and compare with a full recompute."""
+    from app.models import Shift
+    from app.compliance_state import replay_check
+    user_ids = db.session.execute(db.select(Shift.user_id).distinct().limit(limit)).scalars().all()
+    failures = 0
+    for user_id in user_ids:
+        rows = db.session.execute(
+            db.select(Shift.id, Shift.start_time, Shift.end_time, Shift.break_minutes).where(Shift.user_id == user_id)
+        ).all()
+        problems = replay_check(user_id, rows, seed=seed)
+        if problems:
+            failures += 1
+            click.echo(f"{user_id}:")
+            for problem in problems:
+                click.echo(f"  {problem}")
+    click.echo(f"Checked {len(user_ids)} employee(s); {failures} mismatch(es).")
+    if failures:
+        raise SystemExit(1)
+
+
+@click.command('export')
+@click.argument('dataset', type=click.Choice(list(DATASETS)))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson', show_default=True)
+@click.option('--since', default=None, help='Only rows at or after this time (ISO 8601).')
+@click.option('--until', default=None, help='Only rows before this time (ISO 8601).')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='File to write; defaults to stdout.')
+@click.option('--batch-size', default=2000, show_default=True)
+@with_appcontext
+def export_command(dataset, fmt, since, until, output, batch_size):
+    """Stream a whole dataset to a file as NDJSON or CSV."""
+    from app.exports import iter_export
+    from app.rota_import import parse_timestamp
+    since = parse_timestamp(since) if since else None
+    until = parse_timestamp(until) if until else None
+    for chunk in iter_export(DATASETS[dataset], fmt, since=since, until=until, batch_size=batch_size):
+        output.write(chunk)
+
+
+@click.command('rebuild-rollups')
+@click.option('--user', 'user_ids', multiple=True, help='Only rebuild this employee (UUID); repeatable.')
+@click.option('--since', default=None, help='Only rebuild weeks from this time on (ISO 8601).')
+@click.option('--until', default=None, help='Only rebuild weeks up to this time (ISO 8601).')
+@click.option('--batch-size', default=500, show_default=True, help='Employees per transaction.')
+@with_appcontext
+def rebuild_rollups_command(user_ids, since, until, batch_size):
+    """Backfill or repair the daily and weekly hours rollups from shifts and punches."""
+    import time
+    from app.rollups import rebuild_rollups
+    from app.rota_import import parse_timestamp
+    since = parse_timestamp(since) if since else None
+    until = parse_timestamp(until) if until else None
+    started = time.perf_counter()
+    done = rebuild_rollups(
+        user_ids=[uuid.UUID(user_id) for user_id in user_ids] or None, since=since, until=until,
+        batch_size=batch_size, progress=lambda done, total: click.echo(f"  {done}/{total} employee(s)", err=True),
+    )
+    click.echo(f"Rebuilt rollups for {done} employee(s) in {time.perf_counter() - started:.2f}s.")
+
+
+@click.command('scan-alerts')
+@click.option('--workers', default=4, show_default=True, help='Shards scanned in parallel.')
+@click.option('--batch-size', default=500, show_default=True, help='Employees per batch and checkpoint.')
+@click.option('--interval', default=900, show_default=True, help='Seconds between scans.')
+@click.option('--once', is_flag=True, help='Run a single scan and exit.')
+@with_appcontext
+def scan_alerts_command(workers, batch_size, interval, once):
+    """Scan every employee's 17-week average hours and record alert state changes."""
+    import time
+    from flask import current_app
+    from app.alerts import AlertScanner, scanner_lock
+    scanner = AlertScanner(
+        current_app._get_current_object(), workers=workers, batch_size=batch_size,
+        warning_hours=current_app.config['ALERT_WARNING_HOURS'],
+    )
+    with scanner_lock() as acquired:
+        if not acquired:
+            click.echo("Another alert scanner is running.", err=True)
+            raise SystemExit(1)
+        while True:
+            started = time.perf_counter()
+            summary = scanner.run_once()
+            click.echo(f"Scan {summary['scan_id']} (week of {summary['period_end']}): {summary['scanned']} employee(s) "
+                       f"in {summary['shards']} shard(s), {summary['alerts']} alert(s), "
+                       f"{time.perf_counter() - started:.2f}s.")
+            if once:
+                return
+            time.sleep(interval)
+
+
+@click.command('solve-rota')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--budget', default=10.0, show_default=True, help='Seconds to search for.')
+@click.option('--workers', default=None, type=int, help='Restart processes; defaults to the CPU count, 0 runs inline.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write; defaults to stdout.')
+@with_appcontext
+def solve_rota_command(path, budget, workers, seed, output):
+    """Propose assignments for the open shifts in a JSON file ({"team_id": ..., "shifts": [...]})."""
+    import json
+    from app.rota_solver import parse_open_shifts, propose_rota
+    with open(path) as stream:
+        payload = json.load(stream)
+    specs, errors = parse_open_shifts(payload if isinstance(payload, dict) else {'shifts': payload})
+    if errors:
+        for error in errors:
+            click.echo(f"  shift {error['index']}: {'; '.join(error['errors'])}", err=True)
+        raise SystemExit(1)
+    proposal = propose_rota(specs, time_budget=budget, workers=workers, seed=seed)
+    json.dump(proposal, output, default=str, indent=2)
+    output.write('\n')
+    stats = proposal['stats']
+    click.echo(f"Filled {stats['filled']}/{stats['shifts']} shift(s) from {stats['candidates']} candidate(s) "
+               f"in {stats['elapsed_seconds']:.2f}s.", err=True)
+
+
+@click.command('check-overlaps')
+@click.option('--team', 'team_id', default=None, help="Only check this team's members (UUID), in every team.")
+@click.option('--start', default=None, help='Only shifts ending after this time (ISO 8601).')
+@click.option('--end', default=None, help='Only shifts starting before this time (ISO 8601).')
+@click.option('--constraint', type=click.Choice(['enable', 'disable']), default=None,
+              help='Add or drop the Postgres exclusion constraint that rejects overlapping shifts.')
+@with_appcontext
+def check_overlaps_command(team_id, start, end, constraint):
+    """Report employees booked on overlapping shifts."""
+    import time
+    from app.overlaps import disable_exclusion_constraint, enable_exclusion_constraint, load_overlaps
+    from app.rota_import import parse_timestamp
+    if constraint == 'disable':
+        disable_exclusion_constraint()
+        click.echo("Dropped the overlap exclusion constraint.")
+        return
+    if constraint == 'enable':
+        found = enable_exclusion_constraint()
+        if not found:
+            click.echo("Postgres now rejects overlapping shifts for the same employee.")
+            return
+        click.echo("Cannot add the exclusion constraint while these overlaps exist:", err=True)
+    else:
+        started = time.perf_counter()
+        found = load_overlaps(
+            start=parse_timestamp(start) if start else None, end=parse_timestamp(end) if end else None,
+            team_id=uuid.UUID(team_id) if team_id else None,
+        )
+        click.echo(f"{len(found)} overlap(s) found in {time.perf_counter() - started:.2f}s.")
+    for overlap in found:
+        click.echo(f"  {overlap.user_id}: shifts {overlap.first} and {overlap.second} "
+                   f"overlap from {overlap.start.isoformat()} to {overlap.end.isoformat()}")
+    if found:
+        raise SystemExit(1)
+
+
+@click.command('db-pool')
+@click.option('--workers', type=int, default=None, help='Check that this many app processes fit in max_connections.')
+@with_appcontext
+def db_pool_command(workers):
+    """Show pool settings, Postgres connection usage and how many workers fit."""
+    from flask import current_app
+    from sqlalchemy import text
+    from app.db_pool import connections_per_process
+    config = current_app.config
+    per_process = connections_per_process(config)
+    click.echo(f"Pool per process: size {config['DB_POOL_SIZE']} + overflow {config['DB_MAX_OVERFLOW']}; "
+               f"timeout {config['DB_POOL_TIMEOUT']}s, "
+               f"recycle {config['DB_POOL_RECYCLE']}s, pre-ping {'on' if config['DB_POOL_PRE_PING'] else 'off'}, "
+               f"statement timeout {config['DB_STATEMENT_TIMEOUT']}ms "
+               f"({config['DB_CLI_STATEMENT_TIMEOUT']}ms for CLI commands).")
+    click.echo(f"Async read pool per process: size {config['ASYNC_DB_POOL_SIZE']} + overflow "
+               f"{config['ASYNC_DB_MAX_OVERFLOW']}; {per_process} connection(s) per process in all.")
+    max_connections = int(db.session.execute(text('SHOW max_connections')).scalar())
+    reserved = int(db.session.execute(text('SHOW superuser_reserved_connections')).scalar())
+    usage = db.session.execute(text(
+        "SELECT coalesce(nullif(application_name, ''), '(none)'), coalesce(state, '(background)'), count(*) "
+        "FROM pg_stat_activity WHERE datname IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2"
+    )).all()
+    click.echo(f"Postgres max_connections {max_connections}, {reserved} reserved for superusers. In use:")
+    for application, state, count in usage:
+        click.echo(f"  {application:<24}{state:<24}{count:>5}")
+    # Connections held by anything other than this app (this CLI's own one counts as the app's)
+    others = sum(count for application, _, count in usage if application != config['DB_APPLICATION_NAME'])
+    available = max_connections - reserved - others
+    fits = available // per_process if per_process else 0
+    click.echo(f"{available} connection(s) available to the app: room for {fits} process(es) at full pool.")
+    if workers is not None and workers > fits:
+        click.echo(f"{workers} worker(s) need up to {workers * per_process} connection(s); "
+                   f"lower the pool sizes or raise max_connections.", err=True)
+        raise SystemExit(1)
@@ -0,0 +1,446 @@
+"""
+UK Working Time Regulations compliance checks.
+
+Shifts are loaded into array-backed columns (one int64 seconds column per
+field) and every rule is evaluated with NumPy over all users at once: each
+user's timeline is shifted into its own slot on a common axis, far enough
+apart that no rolling window can reach a neighbour. Rolling hours come from
+prefix sums, rest periods from differences between consecutive shifts.
+
+Times are naive UTC, like the models. The night period is applied in UK
+local time (NIGHT_TIMEZONE) so that 23:00 means 23:00 on the wall clock.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func, select
+
+from .db import db
+from .models import Shift, TeamMembership
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+# 1970-01-01 was a Thursday; shifting by three days puts week boundaries on Mondays
+_WEEK_ALIGN = 3 * DAY
+
+REFERENCE_WEEKS = 17
+MAX_AVERAGE_WEEKLY_HOURS = 48
+DAILY_REST_HOURS = 11
+WEEKLY_REST_HOURS = 24
+FORTNIGHTLY_REST_HOURS = 48
+BREAK_AFTER_HOURS = 6
+MIN_BREAK_MINUTES = 20
+NIGHT_TIMEZONE = 'Europe/London'
+NIGHT_START_HOUR = 23
+NIGHT_LENGTH_HOURS = 7
+NIGHT_SHIFT_MIN_HOURS = 3
+NIGHT_WORKER_SHARE = 1 / 3
+MAX_NIGHT_AVERAGE_HOURS = 8
+
+AVERAGE_WEEKLY_HOURS = 'average_weekly_hours'
+DAILY_REST = 'daily_rest'
+WEEKLY_REST = 'weekly_rest'
+REST_BREAK = 'rest_break'
+NIGHT_WORK_AVERAGE = 'night_work_average'
+
+
+@dataclass(frozen=True)
+class Violation:
+    rule: str
+    start: datetime
+    end: datetime
+    value: float
+    limit: float
+
+    def as_dict(self):
+        return {
+            'rule': self.rule,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'value': round(self.value, 2),
+            'limit': self.limit,
+        }
+
+
+def to_seconds(values):
+    """Naive UTC datetimes (or epoch seconds) -> int64 seconds since the epoch."""
+    if len(values) and isinstance(values[0], datetime):
+        return np.array(values, dtype='datetime64[s]').astype(np.int64)
+    return np.fromiter(values, np.int64, len(values))
+
+
+def to_datetimes(seconds):
+    """int64 seconds since the epoch -> list of naive UTC datetimes."""
+    return np.asarray(seconds, dtype=np.int64).astype('datetime64[s]').tolist()
+
+
+class ShiftColumns:
+    """
+    Shift data as parallel arrays sorted by (user, start).
+
+    ``codes`` maps each shift to its position in ``user_ids``.
+    """
+
+    def __init__(self, user_ids, codes, starts, ends, breaks):
+        self.user_ids = list(user_ids)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.breaks = np.asarray(breaks, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build columns from (user_id, start_time, end_time, break_minutes)
+        tuples; times may be datetimes or epoch seconds.
+        """
+        rows = list(rows)
+        if not rows:
+            return cls([], [], [], [], [])
+        user_col, start_col, end_col, break_col = zip(*rows)
+        user_ids = {}
+        codes = np.fromiter((user_ids.setdefault(u, len(user_ids)) for u in user_col), np.int64, len(rows))
+        starts = to_seconds(start_col)
+        ends = to_seconds(end_col)
+        breaks = np.array(break_col, dtype=np.int64) * 60
+        order = np.lexsort((starts, codes))
+        return cls(user_ids, codes[order], starts[order], ends[order], breaks[order])
+
+
+def load_shift_columns(user_ids=None, team_id=None, start=None, end=None):
+    """Load shifts into ShiftColumns with one query; see ``shift_columns_query``."""
+    stmt = shift_columns_query(user_ids=user_ids, team_id=team_id, start=start, end=end)
+    return ShiftColumns.from_rows(db.session.execute(stmt).tuples())
+
+
+def shift_columns_query(user_ids=None, team_id=None, start=None, end=None):
+    """
+    The (user_id, start, end, break_minutes) query behind ShiftColumns.
+
+    When a date range is given, enough history before ``start`` (one
+    reference period) and after ``end`` (a fortnight) is included for the
+    rolling rules to be evaluated at the edges.
+    """
+    stmt = select(
+        Shift.user_id,
+        # Epoch seconds straight from Postgres avoid building datetime objects
+        cast(func.extract('epoch', Shift.start_time), BigInteger),
+        cast(func.extract('epoch', Shift.end_time), BigInteger),
+        Shift.break_minutes,
+    )
+    if user_ids is not None:
+        stmt = stmt.where(Shift.user_id.in_(list(user_ids)))
+    if team_id is not None:
+        members = select(TeamMembership.user_id).where(TeamMembership.team_id == team_id)
+        stmt = stmt.where(Shift.user_id.in_(members))
+    if start is not None:
+        stmt = stmt.where(Shift.end_time > start - timedelta(weeks=REFERENCE_WEEKS))
+    if end is not None:
+        stmt = stmt.where(Shift.start_time < end + timedelta(days=14))
+    return stmt.order_by(Shift.user_id, Shift.start_time)
+
+
+def check_compliance(columns, start=None, end=None):
+    """
+    Evaluate every rule over ``columns``.
+
+    Returns ``{user_id: [Violation, ...]}`` for users with at least one
+    violation overlapping [start, end] (both optional datetimes).
+    """
+    results = {}
+    if not len(columns):
+        return results
+    axis = Axis(columns.codes, columns.starts, columns.ends, columns.breaks, len(columns.user_ids))
+    found = find_violations(axis, compute_verdicts(axis))
+    for code, violation in filter_violations(found, start, end):
+        results.setdefault(columns.user_ids[code], []).append(violation)
+    return results
+
+
+def filter_violations(found, start=None, end=None):
+    """Keep (code, Violation) pairs overlapping [start, end], ordered by start."""
+    lo = start or datetime.min
+    hi = end or datetime.max
+    kept = [(code, v) for code, v in found if v.end >= lo and v.start <= hi]
+    kept.sort(key=lambda pair: (pair[1].start, pair[1].rule))
+    return kept
+
+
+class Axis:
+    """
+    Shift arrays with every user's times moved into a separate slot of one
+    axis. Axis position 0 is a Monday, one reference period before the
+    earliest shift, and each slot is a whole number of weeks.
+    """
+
+    def __init__(self, codes, starts, ends, breaks, n_users, origin=None, slot=None):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.n_users = n_users
+        if origin is None:
+            origin = week_floor(starts.min()) - REFERENCE_WEEKS * WEEK
+        if slot is None:
+            padding = (REFERENCE_WEEKS + 3) * WEEK
+            slot = -(-(ends.max() - origin + padding) // WEEK) * WEEK
+        self.origin = int(origin)
+        self.slot = int(slot)
+        offsets = self.codes * self.slot - self.origin
+        self.starts = starts + offsets
+        self.ends = ends + offsets
+        self.breaks = np.asarray(breaks, dtype=np.int64)
+        self.net = np.maximum(self.ends - self.starts - self.breaks, 0).astype(np.float64)
+
+    @property
+    def n_weeks(self):
+        return self.slot // WEEK * self.n_users
+
+    def real_times(self, positions, codes):
+        return np.asarray(positions) - (np.asarray(codes, dtype=np.int64) * self.slot - self.origin)
+
+    def violations(self, codes, rule, starts, ends, values, limit):
+        """Turn axis positions back into (code, Violation) pairs, converting in bulk."""
+        codes = np.asarray(codes, dtype=np.int64)
+        return [
+            (code, Violation(rule, start, end, value, limit))
+            for code, start, end, value in zip(
+                codes.tolist(),
+                to_datetimes(self.real_times(starts, codes)),
+                to_datetimes(self.real_times(ends, codes)),
+                np.asarray(values, dtype=np.float64).tolist(),
+            )
+        ]
+
+
+def week_floor(seconds):
+    """Start of the Monday-based week containing ``seconds``."""
+    return (seconds + _WEEK_ALIGN) // WEEK * WEEK - _WEEK_ALIGN
+
+
+class Verdicts:
+    """
+    Per-shift and per-week measurements every rule is decided from.
+
+    Each per-shift array is indexed like the axis; ``daily_rest``,
+    ``weekly_rest`` and ``fortnight_ok`` describe the windows opening at
+    that shift. ``week_hours`` holds net hours per axis week.
+    """
+
+    def __init__(self, short_break, night_shift, daily_rest, weekly_rest, fortnight_ok, week_hours):
+        self.short_break = short_break
+        self.night_shift = night_shift
+        self.daily_rest = daily_rest
+        self.weekly_rest = weekly_rest
+        self.fortnight_ok = fortnight_ok
+        self.week_hours = week_hours
+
+
+def compute_verdicts(axis, n_weeks=None):
+    starts, ends, breaks = axis.starts, axis.ends, axis.breaks
+    day_rest = WEEKLY_REST_HOURS * HOUR
+    daily_rest, _ = rest_in_windows(starts, ends, DAY, DAILY_REST_HOURS * HOUR)
+    weekly_rest, _ = rest_in_windows(starts, ends, WEEK, day_rest)
+    longest_fortnight, rests_fortnight = rest_in_windows(starts, ends, 2 * WEEK, day_rest)
+    return Verdicts(
+        short_break=short_breaks(starts, ends, breaks),
+        night_shift=night_shifts(axis.real_times(starts, axis.codes), axis.real_times(ends, axis.codes)),
+        daily_rest=daily_rest,
+        weekly_rest=weekly_rest,
+        fortnight_ok=(longest_fortnight >= FORTNIGHTLY_REST_HOURS * HOUR) | (rests_fortnight >= 2),
+        week_hours=weekly_hours(starts, ends, axis.net, axis.n_weeks if n_weeks is None else n_weeks),
+    )
+
+
+def short_breaks(starts, ends, breaks):
+    return (ends - starts > BREAK_AFTER_HOURS * HOUR) & (breaks < MIN_BREAK_MINUTES * 60)
+
+
+def night_shifts(starts, ends):
+    """Shifts with at least NIGHT_SHIFT_MIN_HOURS in the night period."""
+    if not len(starts):
+        return np.zeros(0, dtype=bool)
+    return night_hours(starts, ends) >= NIGHT_SHIFT_MIN_HOURS
+
+
+def find_violations(axis, verdicts):
+    """Derive (code, Violation) pairs from the verdict arrays."""
+    if not len(axis.starts):
+        return []
+    found = []
+
+    flagged = np.flatnonzero(verdicts.short_break)
+    found += axis.violations(
+        axis.codes[flagged], REST_BREAK, axis.starts[flagged], axis.ends[flagged],
+        axis.breaks[flagged] / 60, MIN_BREAK_MINUTES,
+    )
+
+    flagged = np.flatnonzero(verdicts.daily_rest < DAILY_REST_HOURS * HOUR)
+    found += _window_runs(axis, flagged, DAY, verdicts.daily_rest / HOUR, DAILY_REST, DAILY_REST_HOURS)
+
+    flagged = np.flatnonzero((verdicts.weekly_rest < WEEKLY_REST_HOURS * HOUR) & ~verdicts.fortnight_ok)
+    found += _window_runs(axis, flagged, WEEK, verdicts.weekly_rest / HOUR, WEEKLY_REST, WEEKLY_REST_HOURS)
+
+    weekly = verdicts.week_hours
+    rolling = rolling_sum(weekly, REFERENCE_WEEKS)
+    weeks_per_slot = axis.slot // WEEK
+    active = _active_weeks(axis, len(weekly))
+    average = rolling / REFERENCE_WEEKS
+    found += _week_runs(
+        axis, active & (average > MAX_AVERAGE_WEEKLY_HOURS), average,
+        weeks_per_slot, AVERAGE_WEEKLY_HOURS, MAX_AVERAGE_WEEKLY_HOURS,
+    )
+
+    share = (
+        np.bincount(axis.codes, weights=verdicts.night_shift, minlength=axis.n_users)
+        / np.maximum(np.bincount(axis.codes, minlength=axis.n_users), 1)
+    )
+    night_workers = share >= NIGHT_WORKER_SHARE
+    if night_workers.any():
+        # Reg. 6: average over the reference period less one weekly rest day per week
+        per_day = rolling / (REFERENCE_WEEKS * 6)
+        week_codes = np.arange(len(weekly)) // weeks_per_slot
+        flagged = active & night_workers[week_codes] & (per_day > MAX_NIGHT_AVERAGE_HOURS)
+        found += _week_runs(axis, flagged, per_day, weeks_per_slot, NIGHT_WORK_AVERAGE, MAX_NIGHT_AVERAGE_HOURS)
+    return found
+
+
+def rest_in_windows(starts, ends, window, min_rest):
+    """
+    For the window [start_i, start_i + window) opening at each shift, return
+    the longest uninterrupted rest inside it and how many rests of at least
+    ``min_rest`` it contains. ``starts`` must be sorted.
+    """
+    n = len(starts)
+    if not n:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    run_end = np.maximum.accumulate(ends)
+    gaps = np.empty(n, dtype=np.float64)
+    gaps[:-1] = np.maximum(starts[1:] - run_end[:-1], 0)
+    gaps[-1] = np.inf
+    window_end = starts + window
+    first = np.arange(n)
+    last = np.searchsorted(starts, window_end, side='left') - 1
+    # Rest after the last shift in the window, cut off at the window's end
+    tail = np.maximum(window_end - run_end[last], 0).astype(np.float64)
+    longest = np.maximum(range_max(gaps, first, last), tail)
+    long_rests = np.concatenate(([0], np.cumsum(gaps >= min_rest)))
+    count = long_rests[last] - long_rests[first] + (tail >= min_rest)
+    return longest, count
+
+
+def range_max(values, lo, hi):
+    """max(values[lo[i]:hi[i]]) for every i (-inf where the range is empty), via a sparse table."""
+    out = np.full(len(lo), -np.inf)
+    length = hi - lo
+    if not len(lo) or length.max() <= 0:
+        return out
+    top = int(np.log2(length.max()))
+    table = [values]
+    for k in range(1, top + 1):
+        prev, half = table[-1], 1 << (k - 1)
+        table.append(np.maximum(prev[:-half], prev[half:]))
+    nonempty = length > 0
+    level = np.zeros(len(lo), dtype=np.int64)
+    level[nonempty] = np.log2(length[nonempty]).astype(np.int64)
+    for k in range(top + 1):
+        mask = nonempty & (level == k)
+        if mask.any():
+            out[mask] = np.maximum(table[k][lo[mask]], table[k][hi[mask] - (1 << k)])
+    return out
+
+
+def weekly_hours(starts, ends, net, n_weeks):
+    """
+    Net hours worked in each week [k * WEEK, (k + 1) * WEEK) of the axis.
+
+    Uses the cumulative-hours function W(t) evaluated at week boundaries:
+    W(t) = hours of shifts finished by t, plus the worked part of the shift
+    in progress, read off a prefix sum of ``net``.
+    """
+    if not len(starts):
+        return np.zeros(n_weeks)
+    bounds = np.arange(n_weeks + 1, dtype=np.int64) * WEEK
+    prefix = np.concatenate(([0.0], np.cumsum(net)))
+    current = np.searchsorted(starts, bounds, side='right') - 1
+    safe = np.maximum(current, 0)
+    duration = np.maximum(ends[safe] - starts[safe], 1)
+    fraction = np.clip((bounds - starts[safe]) / duration, 0, 1)
+    worked = np.where(current >= 0, prefix[safe] + net[safe] * fraction, 0.0)
+    return np.diff(worked) / HOUR
+
+
+def rolling_sum(values, width):
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    out = cumulative[1:].copy()
+    out[width:] -= cumulative[1:-width]
+    return out
+
+
+def _active_weeks(axis, n_weeks):
+    """Weeks from each user's first shift to their last, where averages are reported."""
+    last_of_user = np.r_[np.flatnonzero(np.diff(axis.codes)), len(axis.codes) - 1]
+    first_of_user = np.r_[0, last_of_user[:-1] + 1]
+    first_week = axis.starts[first_of_user] // WEEK
+    last_week = (axis.ends[last_of_user] - 1) // WEEK
+    edges = np.zeros(n_weeks + 1, dtype=np.int64)
+    np.add.at(edges, first_week, 1)
+    np.add.at(edges, last_week + 1, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+def _week_runs(axis, flagged, values, weeks_per_slot, rule, limit):
+    weeks = np.flatnonzero(flagged)
+    if not len(weeks):
+        return []
+    breaks = np.flatnonzero(np.diff(weeks) != 1) + 1
+    heads = np.r_[0, breaks]
+    tails = np.r_[breaks - 1, len(weeks) - 1]
+    return axis.violations(
+        weeks[heads] // weeks_per_slot, rule,
+        (weeks[heads] - REFERENCE_WEEKS + 1) * WEEK, (weeks[tails] + 1) * WEEK,
+        np.maximum.reduceat(values[weeks], heads), limit,
+    )
+
+
+def _window_runs(axis, flagged, window, values, rule, limit):
+    """Merge overlapping flagged windows (never across users) into one violation each."""
+    if not len(flagged):
+        return []
+    starts = axis.starts[flagged]
+    ends = starts + window
+    reach = np.maximum.accumulate(ends)
+    heads = np.r_[0, np.flatnonzero(starts[1:] > reach[:-1]) + 1]
+    run_ends = np.maximum.reduceat(ends, heads)
+    run_values = np.minimum.reduceat(values[flagged], heads)
+    return axis.violations(axis.codes[flagged[heads]], rule, starts[heads], run_ends, run_values, limit)
+
+
+def night_hours(starts, ends):
+    """Hours of each shift falling in the night period, in NIGHT_TIMEZONE wall-clock time."""
+    local = starts + _utc_offsets(starts)
+    shift = local - starts
+    local_ends = ends + shift
+    day = local // DAY * DAY
+    total = np.zeros(len(starts), dtype=np.float64)
+    for k in (-1, 0, 1):
+        night_start = day + k * DAY + NIGHT_START_HOUR * HOUR
+        night_end = night_start + NIGHT_LENGTH_HOURS * HOUR
+        total += np.maximum(np.minimum(local_ends, night_end) - np.maximum(local, night_start), 0)
+    return total / HOUR
+
+
+def _utc_offsets(starts):
+    """UTC offset in seconds of NIGHT_TIMEZONE on the day of each timestamp."""
+    days = starts // DAY
+    first, last = int(days.min()), int(days.max())
+    zone = ZoneInfo(NIGHT_TIMEZONE)
+    origin = date(1970, 1, 1)
+    table = np.array([
+        (datetime.combine(origin + timedelta(days=d), datetime.min.time(), zone).utcoffset()).total_seconds()
+        for d in range(first, last + 1)
+    ], dtype=np.int64)
+    return table[days - first]
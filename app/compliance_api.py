@@ -0,0 +1,65 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from .models import User
+from . import db
+from .compliance import load_shift_columns, check_compliance
+from .compliance_state import compliance_cache
+from .rota_import import parse_timestamp
+import uuid
+
+ns = Namespace('compliance', description='Working Time Regulations compliance checks')
+api.add_namespace(ns)
+
+violation_model = ns.model('Violation', {
+    'rule': fields.String(description='Which regulation was breached'),
+    'start': fields.DateTime(dt_format='iso8601', description='Start of the offending period'),
+    'end': fields.DateTime(dt_format='iso8601', description='End of the offending period'),
+    'value': fields.Float(description='Measured value (hours, or minutes for rest breaks)'),
+    'limit': fields.Float(description='The limit set by the regulation'),
+})
+
+user_compliance_model = ns.model('UserCompliance', {
+    'user_id': fields.String(description='User ID'),
+    'violations': fields.List(fields.Nested(violation_model)),
+})
+
+range_parser = ns.parser()
+range_parser.add_argument('start', type=parse_timestamp, location='args', help='Only report violations after this time (ISO 8601)')
+range_parser.add_argument('end', type=parse_timestamp, location='args', help='Only report violations before this time (ISO 8601)')
+
+report_parser = range_parser.copy()
+report_parser.add_argument('team_id', type=uuid.UUID, location='args', help='Only check members of this team')
+
+
+@ns.route('/')
+class ComplianceReport(Resource):
+    @ns.expect(report_parser)
+    @ns.marshal_list_with(user_compliance_model)
+    def get(self):
+        """List Working Time Regulations violations for every employee"""
+        args = report_parser.parse_args()
+        columns = load_shift_columns(team_id=args['team_id'], start=args['start'], end=args['end'])
+        results = check_compliance(columns, start=args['start'], end=args['end'])
+        return [
+            {'user_id': str(user_id), 'violations': violations}
+            for user_id, violations in results.items()
+        ]
+
+
+@ns.route('/users/<string:user_id>')
+@ns.response(404, 'User not found')
+@ns.param('user_id', 'The user identifier')
+class UserComplianceResource(Resource):
+    @ns.expect(range_parser)
+    @ns.marshal_with(user_compliance_model)
+    def get(self, user_id):
+        """List Working Time Regulations violations for one employee"""
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            ns.abort(400, f"Invalid id format: '{user_id}' is not a valid UUID.")
+        if db.session.get(User, user_uuid) is None:
+            ns.abort(404, f"User with id {user_id} not found")
+        args = range_parser.parse_args()
+        state = compliance_cache.get(user_uuid)
+        return {'user_id': user_id, 'violations': state.violations_between(args['start'], args['end'])}
@@ -0,0 +1,317 @@
+"""
+Incremental compliance re-evaluation.
+
+A ComplianceState keeps one employee's shifts on a compliance Axis together
+with the Verdicts arrays derived from them (rest measured in the windows
+opening at each shift, net hours per week). A shift insert, update or
+delete only recomputes the verdicts whose windows can reach the changed
+interval: rest windows opening up to a fortnight before it, and the weeks
+it covers. Violations are then re-derived from the arrays, which is cheap
+for one employee, and diffed against the previous verdict.
+
+States live in a per-process LRU cache with a TTL, since other workers can
+change the same employee's shifts.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func, select
+
+from .db import db
+from .models import Shift
+from .compliance import (
+    Axis, ShiftColumns, check_compliance, compute_verdicts, filter_violations, find_violations, load_shift_columns,
+    night_shifts, rest_in_windows, short_breaks, to_seconds, week_floor, weekly_hours,
+    DAY, WEEK, DAILY_REST_HOURS, FORTNIGHTLY_REST_HOURS, HOUR, REFERENCE_WEEKS, WEEKLY_REST_HOURS,
+)
+
+# One employee per axis; the slot only has to outlast any realistic history
+STATE_SLOT = 52 * 100 * WEEK
+# Rest windows are at most a fortnight long
+_REST_REACH = 2 * WEEK
+
+
+def violation_key(violation):
+    return (violation.rule, violation.start, violation.end, round(violation.value, 6))
+
+
+class ComplianceState:
+    """Cached compliance picture of one employee, updated one shift at a time."""
+
+    def __init__(self, user_id, shift_ids=(), starts=(), ends=(), break_seconds=()):
+        self.user_id = user_id
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+        self._build(list(shift_ids), to_seconds(list(starts)), to_seconds(list(ends)),
+                    np.asarray(break_seconds, dtype=np.int64))
+
+    @classmethod
+    def from_db(cls, user_id):
+        rows = db.session.execute(
+            select(
+                Shift.id,
+                cast(func.extract('epoch', Shift.start_time), BigInteger),
+                cast(func.extract('epoch', Shift.end_time), BigInteger),
+                Shift.break_minutes * 60,
+            )
+            .where(Shift.user_id == user_id)
+            .order_by(Shift.start_time)
+        ).all()
+        if not rows:
+            return cls(user_id)
+        ids, starts, ends, breaks = zip(*rows)
+        return cls(user_id, ids, starts, ends, breaks)
+
+    def _build(self, ids, starts, ends, breaks):
+        order = np.argsort(starts, kind='stable')
+        self.ids = [ids[i] for i in order]
+        starts, ends, breaks = starts[order], ends[order], breaks[order]
+        if len(starts):
+            origin = week_floor(starts.min()) - REFERENCE_WEEKS * WEEK
+        else:
+            origin = week_floor(int(time.time())) - REFERENCE_WEEKS * WEEK
+        self.axis = Axis(np.zeros(len(starts)), starts, ends, breaks, 1, origin=origin, slot=STATE_SLOT)
+        self.verdicts = compute_verdicts(self.axis, n_weeks=self._weeks_needed())
+        self.violations = self._derive()
+
+    # --- Queries ---
+
+    def shifts(self):
+        """(ids, starts, ends, breaks) in epoch seconds, ordered by start."""
+        axis = self.axis
+        return list(self.ids), axis.real_times(axis.starts, axis.codes), axis.real_times(axis.ends, axis.codes), axis.breaks.copy()
+
+    def violations_between(self, start=None, end=None):
+        return [v for _, v in filter_violations([(0, v) for v in self.violations], start, end)]
+
+    # --- Updates ---
+
+    def insert(self, shift_id, start, end, break_minutes):
+        return self.apply(add=(shift_id, start, end, break_minutes))
+
+    def update(self, shift_id, start, end, break_minutes):
+        return self.apply(remove=shift_id, add=(shift_id, start, end, break_minutes))
+
+    def delete(self, shift_id):
+        return self.apply(remove=shift_id)
+
+    def apply(self, remove=None, add=None):
+        """
+        Remove the shift with id ``remove`` and/or add ``add`` =
+        (shift_id, start, end, break_minutes), re-checking only the affected
+        window. Returns (new_violations, resolved_violations).
+        """
+        with self.lock:
+            before = self.violations
+            lo, hi = None, None
+
+            if remove is not None and remove in self.ids:
+                i = self.ids.index(remove)
+                lo, hi = self.axis.starts[i], self.axis.ends[i]
+                self._delete_at(i)
+
+            inserted = None
+            if add is not None:
+                shift_id, start, end, break_minutes = add
+                real_start, real_end = to_seconds([start, end])
+                s = real_start - self.axis.origin
+                e = real_end - self.axis.origin
+                if s < REFERENCE_WEEKS * WEEK or not self.ids:
+                    # Earlier than the axis allows for (or nothing to extend): start over
+                    ids, starts, ends, breaks = self.shifts()
+                    self._build(ids + [shift_id], np.r_[starts, real_start], np.r_[ends, real_end],
+                                np.r_[breaks, break_minutes * 60])
+                    return self._diff(before)
+                inserted = self._insert(shift_id, s, e, break_minutes * 60)
+                lo = s if lo is None else min(lo, s)
+                hi = e if hi is None else max(hi, e)
+
+            if lo is None:
+                return [], []
+            if not self.ids:
+                self._build([], np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.int64))
+                return self._diff(before)
+            self._recheck(int(lo), int(hi), inserted)
+            self.violations = self._derive()
+            return self._diff(before)
+
+    def _delete_at(self, i):
+        axis, verdicts = self.axis, self.verdicts
+        del self.ids[i]
+        for name in ('codes', 'starts', 'ends', 'breaks', 'net'):
+            setattr(axis, name, np.delete(getattr(axis, name), i))
+        for name in ('short_break', 'night_shift', 'daily_rest', 'weekly_rest', 'fortnight_ok'):
+            setattr(verdicts, name, np.delete(getattr(verdicts, name), i))
+
+    def _insert(self, shift_id, s, e, break_seconds):
+        axis, verdicts = self.axis, self.verdicts
+        j = int(np.searchsorted(axis.starts, s, side='right'))
+        self.ids.insert(j, shift_id)
+        axis.codes = np.insert(axis.codes, j, 0)
+        axis.starts = np.insert(axis.starts, j, s)
+        axis.ends = np.insert(axis.ends, j, e)
+        axis.breaks = np.insert(axis.breaks, j, break_seconds)
+        axis.net = np.insert(axis.net, j, max(e - s - break_seconds, 0))
+        # Placeholders; the recheck fills in the windows that include j
+        for name in ('short_break', 'night_shift', 'daily_rest', 'weekly_rest', 'fortnight_ok'):
+            array = getattr(verdicts, name)
+            setattr(verdicts, name, np.insert(array, j, np.zeros(1, dtype=array.dtype)))
+        missing = self._weeks_needed() - len(verdicts.week_hours)
+        if missing > 0:
+            verdicts.week_hours = np.r_[verdicts.week_hours, np.zeros(missing)]
+        return j
+
+    def _recheck(self, lo, hi, inserted):
+        axis, verdicts = self.axis, self.verdicts
+        starts, ends = axis.starts, axis.ends
+
+        if inserted is not None:
+            j = slice(inserted, inserted + 1)
+            verdicts.short_break[j] = short_breaks(starts[j], ends[j], axis.breaks[j])
+            verdicts.night_shift[j] = night_shifts(axis.real_times(starts[j], 0), axis.real_times(ends[j], 0))
+
+        # Rest windows opening up to a fortnight before the change can include it
+        a = np.searchsorted(starts, lo - _REST_REACH, side='left')
+        b = np.searchsorted(starts, hi, side='right')
+        if a < b:
+            c0 = np.searchsorted(starts, lo - _REST_REACH - DAY, side='left')
+            c1 = min(np.searchsorted(starts, hi + _REST_REACH, side='right') + 1, len(starts))
+            s, e = starts[c0:c1], ends[c0:c1]
+            day_rest = WEEKLY_REST_HOURS * HOUR
+            daily, _ = rest_in_windows(s, e, DAY, DAILY_REST_HOURS * HOUR)
+            weekly, _ = rest_in_windows(s, e, WEEK, day_rest)
+            longest, count = rest_in_windows(s, e, 2 * WEEK, day_rest)
+            window = slice(a - c0, b - c0)
+            verdicts.daily_rest[a:b] = daily[window]
+            verdicts.weekly_rest[a:b] = weekly[window]
+            verdicts.fortnight_ok[a:b] = ((longest >= FORTNIGHTLY_REST_HOURS * HOUR) | (count >= 2))[window]
+
+        # Net hours of the weeks the change covers
+        w0, w1 = lo // WEEK, (hi - 1) // WEEK
+        k0 = np.searchsorted(starts, w0 * WEEK - DAY, side='left')
+        k1 = np.searchsorted(starts, (w1 + 1) * WEEK, side='left')
+        offset = w0 * WEEK
+        verdicts.week_hours[w0:w1 + 1] = weekly_hours(
+            starts[k0:k1] - offset, ends[k0:k1] - offset, axis.net[k0:k1], w1 - w0 + 1
+        )
+
+    def _weeks_needed(self):
+        if not len(self.axis.ends):
+            return 0
+        return int(self.axis.ends.max() // WEEK) + REFERENCE_WEEKS + 2
+
+    def _derive(self):
+        return [v for _, v in filter_violations(find_violations(self.axis, self.verdicts))]
+
+    def _diff(self, before):
+        old = {violation_key(v): v for v in before}
+        new = {violation_key(v): v for v in self.violations}
+        added = [v for key, v in new.items() if key not in old]
+        resolved = [v for key, v in old.items() if key not in new]
+        return added, resolved
+
+    # --- Consistency ---
+
+    def verify(self):
+        """
+        Compare the incrementally maintained violations with a full
+        recompute of the same shifts. Returns a list of mismatch messages.
+        """
+        ids, starts, ends, breaks = self.shifts()
+        rows = [(self.user_id, s, e, b // 60) for s, e, b in zip(starts.tolist(), ends.tolist(), breaks.tolist())]
+        expected = check_compliance(ShiftColumns.from_rows(rows)).get(self.user_id, [])
+        return compare_violations(self.violations, expected)
+
+
+def compare_violations(actual, expected, tolerance=1e-6):
+    problems = []
+    key = lambda v: (v.start, v.rule, v.end)
+    actual, expected = sorted(actual, key=key), sorted(expected, key=key)
+    for a, e in zip(actual, expected):
+        if (a.rule, a.start, a.end) != (e.rule, e.start, e.end) or abs(a.value - e.value) > tolerance:
+            problems.append(f"incremental {a} != full {e}")
+    if len(actual) != len(expected):
+        problems.append(f"incremental found {len(actual)} violation(s), full recompute {len(expected)}")
+    return problems
+
+
+def replay_check(user_id, rows, seed=0):
+    """
+    Rebuild a state for ``rows`` (shift_id, start, end, break_minutes) by
+    inserting them one at a time in random order, moving and deleting some
+    along the way, and compare the result with a full recompute.
+    """
+    rng = random.Random(seed)
+    rows = list(rows)
+    rng.shuffle(rows)
+    state = ComplianceState(user_id)
+    kept = []
+    for shift_id, start, end, break_minutes in rows:
+        state.insert(shift_id, start, end, break_minutes)
+        kept.append((shift_id, start, end, break_minutes))
+        roll = rng.random()
+        if roll < 0.05:
+            victim = kept.pop(rng.randrange(len(kept)))
+            state.delete(victim[0])
+        elif roll < 0.10:
+            index = rng.randrange(len(kept))
+            shift_id, start, end, break_minutes = kept[index]
+            kept[index] = (shift_id, start + (end - start) / 4, end, break_minutes)
+            state.update(*kept[index])
+    expected = check_compliance(ShiftColumns.from_rows([(user_id, *row[1:]) for row in kept]))
+    return compare_violations(state.violations, expected.get(user_id, []))
+
+
+class ComplianceCache:
+    """Per-process LRU of ComplianceState, keyed by user id."""
+
+    def __init__(self, max_size=2000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = int(app.config.get('COMPLIANCE_CACHE_SIZE', self.max_size))
+        self.ttl = float(app.config.get('COMPLIANCE_CACHE_TTL', self.ttl))
+
+    def get(self, user_id):
+        """Return the cached state for ``user_id``, loading it if missing or stale."""
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None and time.monotonic() - state.loaded_at < self.ttl:
+                self._states.move_to_end(user_id)
+                return state
+        state = ComplianceState.from_db(user_id)
+        with self._lock:
+            self._states[user_id] = state
+            self._states.move_to_end(user_id)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+        return state
+
+    def peek(self, user_id):
+        with self._lock:
+            return self._states.get(user_id)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._states.clear()
+            else:
+                for user_id in user_ids:
+                    self._states.pop(user_id, None)
+
+    def verify(self, user_id):
+        """Compare the cached state for ``user_id`` with a full recompute from the database."""
+        state = self.peek(user_id)
+        if state is None:
+            return []
+        expected = check_compliance(load_shift_columns(user_ids=[user_id])).get(user_id, [])
+        return compare_violations(state.violations, expected)
+
+
+compliance_cache = ComplianceCache()
@@ -0,0 +1,180 @@
+"""
+Async read path for the manager dashboard.
+
+A team's dashboard shows its roster, the members' roles, their
+availability and their compliance status. These come from five independent
+queries. ``load_dashboard`` runs them concurrently on SQLAlchemy's asyncio
+extension, each on its own connection, so a request waits for the slowest
+query instead of their sum. The statements are built from the same models,
+and the compliance rules run on the same ShiftColumns as the sync
+endpoints.
+
+flask-restx resources are synchronous. ``AsyncReader`` therefore keeps one
+event loop per process on a background thread, and the async engine and
+its pool (see ``async_engine_options``) live on that loop. A request thread
+submits a coroutine, waits for its result, and then does the CPU-bound
+part itself (the compliance check), off the loop. Waiting request threads
+hold no database connection. All dashboard queries in a process share one
+async pool, and the loop multiplexes them. The loop and engine start on
+first use, so a forked worker starts its own, like the clock flusher.
+
+The async driver is asyncpg for Postgres (aiosqlite for SQLite).
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from .compliance import ShiftColumns, check_compliance, shift_columns_query
+from .db_pool import async_engine_options
+from .models import Availability, Role, Team, TeamMembership, User, UserRole
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+DEFAULT_TIMEOUT = 10.0
+
+
+def async_database_uri(uri):
+    """``uri`` with its driver swapped for the asyncio one."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for '{backend}' databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncReader:
+    """This process's event loop thread and async engine, started on first use."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._uri = None
+        self._options = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._engine = None
+        self._sessions = None
+        self._pid = os.getpid()
+
+    def init_app(self, app):
+        self.timeout = float(app.config.get('DASHBOARD_TIMEOUT', self.timeout))
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+        options = async_engine_options(app.config)
+        if (uri, options) != (self._uri, self._options):
+            self.close()
+            self._uri, self._options = uri, options
+
+    def run(self, func, *args):
+        """Run ``func(sessions, *args)`` on the loop and return its result."""
+        sessions, loop = self._start()
+        future = asyncio.run_coroutine_threadsafe(func(sessions, *args), loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # The loop thread did not survive the fork, and the connections are the parent's
+                self._loop = self._thread = self._engine = self._sessions = None
+                self._pid = os.getpid()
+            if self._loop is None:
+                self._engine = create_async_engine(async_database_uri(self._uri), **self._options)
+                self._sessions = async_sessionmaker(self._engine, expire_on_commit=False)
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='dashboard-loop', daemon=True)
+                self._thread.start()
+            return self._sessions, self._loop
+
+    def close(self):
+        """Dispose of the engine and stop the loop; the next ``run`` starts them again."""
+        with self._lock:
+            loop, thread, engine = self._loop, self._thread, self._engine
+            self._loop = self._thread = self._engine = self._sessions = None
+            if loop is None or self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(engine.dispose(), loop).result(self.timeout)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(self.timeout)
+            loop.close()
+
+
+async_reader = AsyncReader()
+atexit.register(async_reader.close)
+
+
+# --- Queries ---
+
+async def _rows(sessions, stmt):
+    # One session, and so one connection, per query: an AsyncSession runs one statement at a time
+    async with sessions() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def load_dashboard(sessions, team_id, start, end):
+    """The team row, roster, member roles, availability and shift columns, queried concurrently."""
+    members = select(TeamMembership.user_id).where(TeamMembership.team_id == team_id)
+    return await asyncio.gather(
+        _rows(sessions, select(Team.id, Team.human_id, Team.name, Team.manager_id).where(Team.id == team_id)),
+        _rows(sessions, (
+            select(User.id, User.human_id, User.name, User.email, TeamMembership.summary)
+            .join(TeamMembership, TeamMembership.user_id == User.id)
+            .where(TeamMembership.team_id == team_id)
+            .order_by(User.name, User.id)
+        )),
+        _rows(sessions, (
+            select(UserRole.user_id, Role.name)
+            .join(Role, Role.id == UserRole.role_id)
+            .where(UserRole.user_id.in_(members))
+            .order_by(Role.name)
+        )),
+        _rows(sessions, (
+            select(
+                Availability.id, Availability.human_id, Availability.user_id, Availability.start_time,
+                Availability.end_time, Availability.available, Availability.note,
+            )
+            .where(Availability.user_id.in_(members), Availability.end_time > start, Availability.start_time < end)
+            .order_by(Availability.start_time, Availability.id)
+        )),
+        _rows(sessions, shift_columns_query(team_id=team_id, start=start, end=end)),
+    )
+
+
+def team_dashboard(team_id, start, end):
+    """The dashboard for ``team_id`` over [start, end), or None if there is no such team."""
+    team, roster, member_roles, availability, shifts = async_reader.run(load_dashboard, team_id, start, end)
+    if not team:
+        return None
+    roles = defaultdict(list)
+    for user_id, name in member_roles:
+        roles[user_id].append(name)
+    violations = check_compliance(ShiftColumns.from_rows(shifts), start=start, end=end)
+    team_id, human_id, name, manager_id = team[0]
+    return {
+        'id': team_id,
+        'human_id': human_id,
+        'name': name,
+        'manager_id': manager_id,
+        'start': start,
+        'end': end,
+        'members': [
+            {
+                'user_id': user_id, 'human_id': member_human_id, 'name': member_name, 'email': email,
+                'summary': summary, 'roles': roles[user_id], 'violations': len(violations.get(user_id, ())),
+            }
+            for user_id, member_human_id, member_name, email, summary in roster
+        ],
+        'availability': availability,
+        'compliance': [
+            {'user_id': user_id, 'violations': found}
+            for user_id, found in violations.items()
+        ],
+    }
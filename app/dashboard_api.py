@@ -0,0 +1,69 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from datetime import datetime, timedelta
+from .availability_api import availability_model
+from .compliance_api import user_compliance_model
+from .dashboard import async_reader, team_dashboard
+from .rota_import import parse_timestamp
+import concurrent.futures
+import uuid
+
+ns = Namespace('dashboard', description='Read-only manager dashboard, queried concurrently on the async read path')
+api.add_namespace(ns)
+
+DEFAULT_DAYS = 7
+
+dashboard_member_model = ns.model('DashboardMember', {
+    'user_id': fields.String,
+    'human_id': fields.Integer,
+    'name': fields.String,
+    'email': fields.String,
+    'summary': fields.String(description="The member's role or summary in the team"),
+    'roles': fields.List(fields.String, description='Names of the roles they hold'),
+    'violations': fields.Integer(description='Working Time Regulations violations in the period'),
+})
+
+team_dashboard_model = ns.model('TeamDashboard', {
+    'id': fields.String(description='The team identifier'),
+    'human_id': fields.Integer,
+    'name': fields.String,
+    'manager_id': fields.String,
+    'start': fields.DateTime(dt_format='iso8601', description='Start of the period shown'),
+    'end': fields.DateTime(dt_format='iso8601', description='End of the period shown'),
+    'members': fields.List(fields.Nested(dashboard_member_model)),
+    'availability': fields.List(fields.Nested(availability_model), description="Members' entries in the period"),
+    'compliance': fields.List(fields.Nested(user_compliance_model), description='Members with violations'),
+})
+
+dashboard_parser = ns.parser()
+dashboard_parser.add_argument('start', type=parse_timestamp, location='args',
+                              help='Period start (ISO 8601, default today 00:00 UTC)')
+dashboard_parser.add_argument('end', type=parse_timestamp, location='args',
+                              help=f'Period end (ISO 8601, default {DEFAULT_DAYS} days after start)')
+
+
+@ns.route('/teams/<string:team_id>')
+@ns.response(404, 'Team not found')
+@ns.response(503, 'The queries took longer than DASHBOARD_TIMEOUT seconds')
+@ns.param('team_id', 'The team identifier')
+class TeamDashboard(Resource):
+    @ns.expect(dashboard_parser)
+    @ns.marshal_with(team_dashboard_model)
+    def get(self, team_id):
+        """Roster, roles, availability and compliance for one team in a single round trip"""
+        try:
+            team_uuid = uuid.UUID(team_id)
+        except ValueError:
+            ns.abort(400, f"Invalid id format: '{team_id}' is not a valid UUID.")
+        args = dashboard_parser.parse_args()
+        start = args['start'] or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = args['end'] or start + timedelta(days=DEFAULT_DAYS)
+        if end <= start:
+            ns.abort(400, 'end must be after start')
+        try:
+            dashboard = team_dashboard(team_uuid, start, end)
+        except concurrent.futures.TimeoutError:
+            ns.abort(503, f'Dashboard queries took longer than {async_reader.timeout:g}s, please retry shortly.')
+        if dashboard is None:
+            ns.abort(404, f"Team with id {team_id} not found")
+        return dashboard
@@ -0,0 +1,253 @@
+"""
+Database connection pool settings and pool metrics.
+
+``engine_options`` turns the DB_* settings into SQLALCHEMY_ENGINE_OPTIONS
+for Postgres: a QueuePool of ``DB_POOL_SIZE`` connections that may grow by
+``DB_MAX_OVERFLOW`` under load, waits at most ``DB_POOL_TIMEOUT`` seconds
+for a free connection, recycles connections older than ``DB_POOL_RECYCLE``
+seconds, and pings each one on checkout so a Postgres restart costs a
+reconnect instead of a failed request. Every connection gets a default
+``statement_timeout`` and an ``application_name`` so its sessions can be
+told apart in pg_stat_activity.
+
+The pool class records how long each checkout took (waiting for a free
+connection, or opening a new one), timeouts, new connections and
+invalidations into the process-wide ``pool_metrics``; ``pool_status``
+combines those with the pool's live counts.
+
+A handler that legitimately runs long statements (a streaming export)
+lifts the timeout for its own transactions with ``@statement_timeout(0)``.
+Processes started by the ``flask`` CLI (migrations, ``flask export``,
+rollup rebuilds, index builds) have no request to decorate. Their
+connections get DB_CLI_STATEMENT_TIMEOUT instead, which defaults to none.
+
+The dashboard's async read path (dashboard.py) has a second, smaller pool
+per process, sized by ``ASYNC_DB_POOL_SIZE`` and ``ASYNC_DB_MAX_OVERFLOW``
+with the same timeouts; ``async_engine_options`` builds its settings.
+
+``processes_that_fit`` divides DB_MAX_CONNECTIONS, less
+DB_RESERVED_CONNECTIONS, by what one process can hold. gunicorn.conf.py
+uses it to cap the default worker count and to refuse one that does not
+fit. ``flask db-pool --workers N`` checks the same thing against the live
+server's settings and sessions.
+"""
+import bisect
+import os
+import threading
+import time
+from functools import wraps
+
+import click
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in seconds, of the checkout time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Thread-safe counters for one process's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait_seconds_total': round(self.wait_seconds, 6),
+                'wait_seconds_max': round(self.max_wait_seconds, 6),
+                'wait_seconds_avg': round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                'wait_buckets': dict(zip([*map(str, WAIT_BUCKETS), '+Inf'], self.wait_buckets)),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout into ``pool_metrics``."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _count_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def _count_invalidation(dbapi_connection, connection_record, exception):
+    pool_metrics.record_invalidation()
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def load_pool_config(config):
+    """Read the DB_* settings from the environment into ``config``."""
+    config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    config['DB_POOL_PRE_PING'] = _flag('DB_POOL_PRE_PING', '1')
+    # Milliseconds; 0 disables the default timeout
+    config['DB_STATEMENT_TIMEOUT'] = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+    config['DB_CLI_STATEMENT_TIMEOUT'] = int(os.environ.get('DB_CLI_STATEMENT_TIMEOUT', 0))
+    # Flask builds the app inside the command's click context when it runs `flask ...`
+    config['DB_STARTED_BY_CLI'] = click.get_current_context(silent=True) is not None
+    config['DB_APPLICATION_NAME'] = os.environ.get('DB_APPLICATION_NAME', 'rotaguard')
+    # The async read path runs a handful of queries at once per request
+    config['ASYNC_DB_POOL_SIZE'] = int(os.environ.get('ASYNC_DB_POOL_SIZE', 4))
+    config['ASYNC_DB_MAX_OVERFLOW'] = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 4))
+    # Postgres' max_connections, less what to keep free for superusers, the alert scanner, CLI and psql
+    config['DB_MAX_CONNECTIONS'] = int(os.environ.get('DB_MAX_CONNECTIONS', 100))
+    config['DB_RESERVED_CONNECTIONS'] = int(os.environ.get('DB_RESERVED_CONNECTIONS', 10))
+
+
+def connection_statement_timeout(config):
+    """The statement_timeout new connections get: the CLI's, or the one for web processes."""
+    return config['DB_CLI_STATEMENT_TIMEOUT'] if config.get('DB_STARTED_BY_CLI') else config['DB_STATEMENT_TIMEOUT']
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``config``; only Postgres gets the pool settings."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'connect_args': {
+            'options': f"-c statement_timeout={connection_statement_timeout(config)}",
+            'application_name': config['DB_APPLICATION_NAME'],
+        },
+    }
+
+
+def async_engine_options(config):
+    """create_async_engine options for ``config``; asyncpg takes server settings instead of options."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    return {
+        'pool_size': config['ASYNC_DB_POOL_SIZE'],
+        'max_overflow': config['ASYNC_DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'connect_args': {
+            'server_settings': {
+                'statement_timeout': str(connection_statement_timeout(config)),
+                'application_name': config['DB_APPLICATION_NAME'],
+            },
+        },
+    }
+
+
+def pool_status(engine):
+    """Live pool counts plus this process's checkout metrics."""
+    pool = engine.pool
+    status = {'pid': os.getpid(), 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            # QueuePool counts from -size until the pool is full
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    status.update(pool_metrics.snapshot())
+    return status
+
+
+def connections_per_process(config):
+    """Most connections one app process can hold: both pools plus their overflow."""
+    return (
+        config['DB_POOL_SIZE'] + max(config['DB_MAX_OVERFLOW'], 0)
+        + config['ASYNC_DB_POOL_SIZE'] + max(config['ASYNC_DB_MAX_OVERFLOW'], 0)
+    )
+
+
+def processes_that_fit(config):
+    """How many app processes fit in DB_MAX_CONNECTIONS less DB_RESERVED_CONNECTIONS at full pool."""
+    per_process = connections_per_process(config)
+    available = config['DB_MAX_CONNECTIONS'] - config['DB_RESERVED_CONNECTIONS']
+    return max(available, 0) // per_process if per_process else available
+
+
+# --- Per-request statement timeout ---
+
+def statement_timeout(milliseconds):
+    """
+    Run the decorated handler's transactions with ``statement_timeout``
+    set to ``milliseconds`` (0 for none) instead of the connection default.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            g.statement_timeout = milliseconds
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, 'after_begin')
+def _apply_statement_timeout(session, transaction, connection):
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+    milliseconds = g.get('statement_timeout')
+    if milliseconds is not None:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(milliseconds)}')
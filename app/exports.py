@@ -0,0 +1,141 @@
+"""
+Streaming exports of whole-organisation data.
+
+Each dataset is a Core select of plain columns executed with ``yield_per``,
+which on PostgreSQL opens a server-side cursor and fetches ``batch_size``
+rows at a time. Rows are encoded a batch at a time into NDJSON lines or CSV
+records, and the encoded chunks are yielded straight out, so memory stays
+flat no matter how many rows are exported. The same generator backs the
+/api/exports endpoints (as a streamed response) and the ``flask export``
+command (written to a file).
+"""
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .db import db
+from .models import ClockEvent, Role, Shift, Team, TeamMembership, User
+from .serialization import dumps
+
+DEFAULT_BATCH_SIZE = 2000
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+@dataclass(frozen=True, eq=False)
+class Dataset:
+    name: str
+    description: str
+    columns: tuple      # labelled column expressions, in output order
+    joins: tuple = ()   # (target, onclause) pairs, outer-joined in order
+    time_column: object = None  # what since/until filter on
+    order_by: tuple = ()
+
+    @property
+    def field_names(self):
+        return [column.key for column in self.columns]
+
+    def select(self, since=None, until=None):
+        query = select(*self.columns)
+        for target, onclause in self.joins:
+            query = query.outerjoin(target, onclause)
+        if since is not None:
+            query = query.where(self.time_column >= since)
+        if until is not None:
+            query = query.where(self.time_column < until)
+        return query.order_by(*self.order_by)
+
+
+DATASETS = {dataset.name: dataset for dataset in (
+    Dataset(
+        name='shifts',
+        description='Every shift with its employee, team and role; since/until filter on start time',
+        columns=(
+            Shift.id.label('shift_id'), Shift.human_id.label('shift_human_id'),
+            Shift.user_id, User.email.label('user_email'), User.name.label('user_name'),
+            Shift.team_id, Team.name.label('team_name'), Role.name.label('role_name'),
+            Shift.start_time, Shift.end_time, Shift.break_minutes,
+        ),
+        joins=((User, User.id == Shift.user_id), (Team, Team.id == Shift.team_id), (Role, Role.id == Shift.role_id)),
+        time_column=Shift.start_time,
+        order_by=(Shift.start_time, Shift.id),
+    ),
+    Dataset(
+        name='teams',
+        description='Team rosters, one row per membership; since/until filter on when the membership last changed',
+        columns=(
+            Team.id.label('team_id'), Team.name.label('team_name'), Team.manager_id,
+            TeamMembership.user_id, User.email.label('user_email'), User.name.label('user_name'),
+            TeamMembership.summary,
+        ),
+        joins=((TeamMembership, TeamMembership.team_id == Team.id), (User, User.id == TeamMembership.user_id)),
+        time_column=TeamMembership.updated_at,
+        order_by=(Team.human_id, TeamMembership.user_id),
+    ),
+    Dataset(
+        name='users',
+        description='Every user; since/until filter on when the user last changed',
+        columns=(
+            User.id.label('user_id'), User.human_id.label('user_human_id'), User.email, User.name,
+            User.manager_id, User.created_at, User.updated_at,
+        ),
+        time_column=User.updated_at,
+        order_by=(User.human_id,),
+    ),
+    Dataset(
+        name='timesheets',
+        description='Clock-in/clock-out punches per employee; since/until filter on when the punch happened',
+        columns=(
+            ClockEvent.event_id, ClockEvent.user_id, User.email.label('user_email'), User.name.label('user_name'),
+            ClockEvent.kind, ClockEvent.occurred_at, ClockEvent.received_at,
+        ),
+        joins=((User, User.id == ClockEvent.user_id),),
+        time_column=ClockEvent.occurred_at,
+        order_by=(ClockEvent.user_id, ClockEvent.occurred_at, ClockEvent.human_id),
+    ),
+)}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _ndjson_chunk(names, rows):
+    return b''.join(dumps(dict(zip(names, map(_value, row)))) + b'\n' for row in rows)
+
+
+def _csv_chunk(rows, buffer, writer):
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerows([['' if value is None else _value(value) for value in row] for row in rows])
+    return buffer.getvalue().encode('utf-8')
+
+
+def iter_export(dataset, fmt='ndjson', since=None, until=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the encoded export of ``dataset`` in chunks of ``batch_size`` rows."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown export format {fmt!r}')
+    names = dataset.field_names
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(names)
+        yield buffer.getvalue().encode('utf-8')
+
+    result = db.session.execute(
+        dataset.select(since, until).execution_options(yield_per=batch_size)
+    )
+    try:
+        for rows in result.partitions():
+            if fmt == 'csv':
+                yield _csv_chunk(rows, buffer, writer)
+            else:
+                yield _ndjson_chunk(names, rows)
+    finally:
+        result.close()
@@ -0,0 +1,36 @@
+from .api import api
+from flask_restx import Namespace, Resource
+from flask import Response, stream_with_context
+from .exports import DATASETS, FORMATS, iter_export
+from .rota_import import parse_timestamp
+from .db_pool import statement_timeout
+
+ns = Namespace('exports', description='Streaming bulk exports for payroll and record keeping')
+api.add_namespace(ns)
+
+export_parser = ns.parser()
+export_parser.add_argument('format', location='args', choices=tuple(FORMATS), default='ndjson',
+                           help='ndjson (one JSON object per line) or csv')
+export_parser.add_argument('since', type=parse_timestamp, location='args', help='Only rows at or after this time (ISO 8601)')
+export_parser.add_argument('until', type=parse_timestamp, location='args', help='Only rows before this time (ISO 8601)')
+
+
+@ns.route('/<string:dataset>')
+@ns.param('dataset', 'One of: ' + ', '.join(DATASETS))
+@ns.response(404, 'Unknown dataset')
+class ExportResource(Resource):
+    @ns.expect(export_parser)
+    @ns.produces(list(FORMATS.values()))
+    @statement_timeout(0)  # one cursor streams the whole dataset
+    def get(self, dataset):
+        """Stream a whole dataset as NDJSON or CSV"""
+        if dataset not in DATASETS:
+            ns.abort(404, f"Unknown dataset '{dataset}'. Available: {', '.join(DATASETS)}")
+        args = export_parser.parse_args()
+        fmt = args['format']
+        chunks = iter_export(DATASETS[dataset], fmt, since=args['since'], until=args['until'])
+        return Response(
+            stream_with_context(chunks),
+            mimetype=FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"'},
+        )
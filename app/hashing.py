@@ -0,0 +1,181 @@
+"""
+Password hashing off the request thread.
+
+bcrypt is deliberately slow, so hashing on the request worker means a burst
+of logins at shift change pins every worker on CPU and unrelated requests
+queue behind it. PasswordHasher runs bcrypt in a small process pool
+instead. The pool belongs to one web worker, and gunicorn runs several, so
+it defaults to DEFAULT_WORKERS processes; size PASSWORD_HASH_WORKERS so
+that web workers times hash workers stays near the core count. At most
+``queue_size`` operations may be queued or running at once; callers beyond
+that wait up to ``acquire_timeout`` seconds for a slot and then get a 503
+with Retry-After rather than piling up.
+
+Hashes are ordinary ``$2b$`` bcrypt strings, interchangeable with those
+Flask-Bcrypt produces. When BCRYPT_LOG_ROUNDS changes, existing hashes are
+upgraded on the next successful login (see ``needs_rehash``).
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+DEFAULT_LOG_ROUNDS = 12
+DEFAULT_WORKERS = 2
+
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Too many password operations in progress, please retry shortly.'
+
+    def __init__(self, retry_after=1):
+        super().__init__(retry_after=retry_after)
+
+
+def _hash(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds, prefix=b'2b'))
+    return hashed.decode('utf-8'), time.perf_counter() - started
+
+
+def _check(hashed, password):
+    started = time.perf_counter()
+    try:
+        ok = bcrypt.checkpw(password, hashed)
+    except ValueError:  # not a bcrypt hash
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def hash_rounds(hashed):
+    """Cost factor of a ``$2b$12$...`` hash, or None if it is not bcrypt."""
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """
+    bcrypt behind a bounded process pool. ``workers=0`` hashes inline on the
+    calling thread, which is what the CLI and single-process tests want.
+    """
+
+    def __init__(self, log_rounds=DEFAULT_LOG_ROUNDS, workers=None, queue_size=None, acquire_timeout=2.0):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = os.getpid()
+        self.configure(log_rounds, workers, queue_size, acquire_timeout)
+        self.reset_stats()
+
+    def init_app(self, app):
+        self.configure(
+            log_rounds=int(app.config.get('BCRYPT_LOG_ROUNDS', self.log_rounds)),
+            workers=app.config.get('PASSWORD_HASH_WORKERS'),
+            queue_size=app.config.get('PASSWORD_HASH_QUEUE_SIZE'),
+            acquire_timeout=float(app.config.get('PASSWORD_HASH_TIMEOUT', self.acquire_timeout)),
+        )
+
+    def configure(self, log_rounds=DEFAULT_LOG_ROUNDS, workers=None, queue_size=None, acquire_timeout=2.0):
+        """Apply new settings; raises RuntimeError while the pool is live (call ``shutdown`` first)."""
+        workers = min(DEFAULT_WORKERS, os.cpu_count() or 1) if workers is None else int(workers)
+        queue_size = max(workers, 1) * 4 if queue_size is None else int(queue_size)
+        settings = (log_rounds, workers, queue_size, acquire_timeout)
+        with self._lock:
+            if settings == getattr(self, '_settings', None):
+                return
+            if self._pid != os.getpid():
+                self._executor = None
+                self._pid = os.getpid()
+            if self._executor is not None or getattr(self, '_in_flight', 0):
+                raise RuntimeError('Cannot reconfigure the password hasher while its pool is running')
+            self._settings = settings
+            self.log_rounds = log_rounds
+            self.workers = workers
+            self.queue_size = queue_size
+            self.acquire_timeout = acquire_timeout
+            self._slots = threading.BoundedSemaphore(queue_size)
+            self._in_flight = 0
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    # --- Public API ---
+
+    def generate_password_hash(self, password):
+        hashed, _ = self._run(_hash, password.encode('utf-8'), self.log_rounds, kind='hash')
+        return hashed
+
+    def check_password_hash(self, hashed, password):
+        ok, _ = self._run(_check, hashed.encode('utf-8'), password.encode('utf-8'), kind='check')
+        return ok
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.log_rounds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(in_flight=self._in_flight, queue_size=self.queue_size, workers=self.workers)
+            return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                'hashes': 0, 'checks': 0, 'rejected': 0,
+                'cpu_seconds_total': 0.0, 'cpu_seconds_max': 0.0,
+                'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0,
+            }
+
+    # --- Internals ---
+
+    def _run(self, func, *args, kind):
+        queued = time.perf_counter()
+        slots = self._slots
+        if not slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashingBusy(retry_after=max(1, round(self.acquire_timeout)))
+        try:
+            with self._lock:
+                self._in_flight += 1
+            if self.workers:
+                result, cpu = self._pool().submit(func, *args).result()
+            else:
+                result, cpu = func(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            slots.release()
+        wait = time.perf_counter() - queued - cpu
+        with self._lock:
+            stats = self._stats
+            stats['hashes' if kind == 'hash' else 'checks'] += 1
+            stats['cpu_seconds_total'] += cpu
+            stats['cpu_seconds_max'] = max(stats['cpu_seconds_max'], cpu)
+            stats['wait_seconds_total'] += wait
+            stats['wait_seconds_max'] = max(stats['wait_seconds_max'], wait)
+        return result, cpu
+
+    def _pool(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked web worker must not share its parent's pool
+                self._executor = None
+                self._pid = os.getpid()
+            if self._executor is None:
+                # spawn rather than fork, which can deadlock in a threaded parent. Each
+                # child imports the app package to unpickle _hash: a one-off cost per process
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,134 @@
+import os
+import threading
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from .db import db
+
+DEFAULT_BLOCK_SIZE = 50
+
+
+class HumanIdAllocator:
+    """
+    Hands out human_ids from blocks reserved in the human_id_sequence table.
+
+    Each process reserves a range of ``block_size`` ids with a single short
+    UPDATE committed on its own connection, then serves inserts from memory
+    until the range runs out. The sequence row is only locked for the
+    duration of that UPDATE, never for the lifetime of the caller's
+    transaction.
+
+    Reservations go through a one-connection engine the allocator keeps per
+    database, not the caller's pool: they happen mid-flush, while the
+    caller already holds a pooled connection, and must not wait on (or
+    take) a second one from a pool that busy requests may have exhausted.
+
+    Semantics are gap tolerant: ids reserved by a process that exits, or used
+    by a transaction that rolls back, are never reissued. human_ids stay
+    unique but are not dense and, across processes, not in creation order.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}  # model_name -> [next_value, limit)
+        self._engines = {}  # database URL -> engine used only for reservations
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def init_app(self, app):
+        self.block_size = int(app.config.get('HUMAN_ID_BLOCK_SIZE', self.block_size))
+
+    def reset(self):
+        """Forget every reserved block; the unused ids become gaps."""
+        with self._lock:
+            self._blocks.clear()
+            self._dispose_engines(close=True)
+            self._pid = os.getpid()
+
+    def next_id(self, engine, model_name):
+        return self.allocate(engine, model_name, 1)[0]
+
+    def allocate(self, engine, model_name, count):
+        """Return a list of ``count`` unused human_ids for ``model_name``."""
+        if count <= 0:
+            return []
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child must never serve ids from its parent's blocks,
+                # nor share the parent's reservation connection
+                self._blocks.clear()
+                self._dispose_engines(close=False)
+                self._pid = os.getpid()
+
+            ids = []
+            block = self._blocks.get(model_name)
+            if block is not None:
+                take = min(count, block[1] - block[0])
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+
+            missing = count - len(ids)
+            if missing:
+                # Reserve enough for the request in one round trip, keeping
+                # whatever is left over for the next inserts.
+                size = max(self.block_size, missing)
+                start, limit = self._reserve(engine, model_name, size)
+                ids.extend(range(start, start + missing))
+                self._blocks[model_name] = [start + missing, limit]
+            return ids
+
+    def _reservation_engine(self, engine):
+        url = engine.url.render_as_string(hide_password=False)
+        if url not in self._engines:
+            # Reservations are serialised by self._lock, so one connection is enough
+            self._engines[url] = create_engine(engine.url, pool_size=1, max_overflow=0, pool_pre_ping=True)
+        return self._engines[url]
+
+    def _dispose_engines(self, close):
+        for engine in self._engines.values():
+            engine.dispose(close=close)
+        self._engines.clear()
+
+    def _reserve(self, engine, model_name, size):
+        from .models import HumanIdSequence
+
+        engine = self._reservation_engine(engine)
+
+        bump = (
+            update(HumanIdSequence)
+            .where(HumanIdSequence.model_name == model_name)
+            .values(next_value=HumanIdSequence.next_value + size)
+            .returning(HumanIdSequence.next_value)
+        )
+        for _ in range(2):
+            with engine.begin() as conn:
+                limit = conn.execute(bump).scalar()
+            if limit is not None:
+                return limit - size, limit
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        insert(HumanIdSequence).values(model_name=model_name, next_value=size + 1)
+                    )
+                return 1, size + 1
+            except IntegrityError:
+                # Another process created the row first; bump it instead
+                continue
+        raise RuntimeError(f"Could not reserve human_ids for {model_name}")
+
+
+allocator = HumanIdAllocator()
+
+
+def assign_human_ids(model_class, rows, connection=None):
+    """
+    Fill in ``human_id`` for a list of row dicts destined for a Core
+    ``insert(model_class)`` executemany, using a single reservation.
+    """
+    pending = [row for row in rows if row.get('human_id') is None]
+    engine = connection.engine if connection is not None else db.engine
+    ids = allocator.allocate(engine, model_class.__name__, len(pending))
+    for row, human_id in zip(pending, ids):
+        row['human_id'] = human_id
+    return rows
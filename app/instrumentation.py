@@ -0,0 +1,392 @@
+"""
+Per-request latency and SQL instrumentation, exposed as Prometheus text.
+
+For every request the hooks registered by ``instrumentation.init_app``
+record, per endpoint (the URL rule, so /api/shifts/<id> is one series):
+
+* the request latency, into a histogram;
+* how many SQL statements it ran and how long they took, timed by the
+  ``before_cursor_execute`` / ``after_cursor_execute`` engine events;
+* N+1 suspects: a statement shape (the SQL text with its parameters
+  folded to ``?``) executed N1_THRESHOLD or more times in one request,
+  which is what a lazy load inside a loop looks like. Each suspect is
+  counted and logged once per request.
+
+``GET /metrics`` serves the counters and histograms in the Prometheus text
+format, together with the connection pool metrics from db_pool.py. With
+SERVER_TIMING enabled, responses also carry a ``Server-Timing`` header
+with the request's DB time and statement count, which browser dev tools
+show next to each request.
+
+The per-statement cost is two ``perf_counter`` calls and a dict lookup
+(shapes are normalised once per distinct SQL string), so it is meant to
+stay on in production.
+
+The numbers are collected per process, and a scrape is answered by
+whichever gunicorn worker accepts it. With METRICS_DIR set (the gunicorn
+config sets it), each process writes its totals to ``metrics-<pid>.json``
+there, at most every METRICS_FLUSH_INTERVAL seconds and on every scrape,
+and /metrics serves the sum of all the files. This is the same idea as
+prometheus_client's multiprocess mode. When a worker exits, the master
+folds its file into ``metrics-exited.json``, so recycled workers do not
+make the counters go down. The directory is emptied when gunicorn starts.
+Without METRICS_DIR, /metrics reports only the process that served it.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .db_pool import WAIT_BUCKETS, pool_metrics
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+DEFAULT_N1_THRESHOLD = 5
+# Distinct SQL strings whose normalised shape is remembered
+SHAPE_CACHE_SIZE = 4096
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Snapshot of the workers that have exited, kept in METRICS_DIR with the live ones
+EXITED_SNAPSHOT = 'metrics-exited.json'
+POOL_COUNTERS = ('checkouts', 'timeouts', 'connects', 'invalidations', 'wait_seconds_total')
+
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense, without locking of its own."""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def state(self):
+        return [list(self.counts), self.total, self.count]
+
+    def merge(self, state):
+        counts, total, count = state
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.total += total
+        self.count += count
+
+
+class RequestMetrics:
+    """Per-endpoint counters and histograms for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()  # (endpoint, method, status) -> count
+            self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # endpoint -> seconds
+            self.statements = defaultdict(lambda: Histogram(STATEMENT_BUCKETS))  # endpoint -> per request
+            self.db_seconds = Counter()  # endpoint -> total
+            self.n_plus_one = Counter()  # endpoint -> suspect requests
+
+    def record(self, endpoint, method, status, seconds, statements, db_seconds, suspects):
+        with self._lock:
+            self.requests[endpoint, method, status] += 1
+            self.latency[endpoint].observe(seconds)
+            self.statements[endpoint].observe(statements)
+            self.db_seconds[endpoint] += db_seconds
+            if suspects:
+                self.n_plus_one[endpoint] += 1
+
+    def snapshot(self):
+        """The metrics as plain data, for ``merge`` in another process."""
+        with self._lock:
+            return {
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                'latency': {endpoint: histogram.state() for endpoint, histogram in self.latency.items()},
+                'statements': {endpoint: histogram.state() for endpoint, histogram in self.statements.items()},
+                'db_seconds': dict(self.db_seconds),
+                'n_plus_one': dict(self.n_plus_one),
+            }
+
+    def merge(self, snapshot):
+        """Add a ``snapshot`` of another process's metrics to these."""
+        with self._lock:
+            for endpoint, method, status, count in snapshot['requests']:
+                self.requests[endpoint, method, status] += count
+            for endpoint, state in snapshot['latency'].items():
+                self.latency[endpoint].merge(state)
+            for endpoint, state in snapshot['statements'].items():
+                self.statements[endpoint].merge(state)
+            self.db_seconds.update(snapshot['db_seconds'])
+            self.n_plus_one.update(snapshot['n_plus_one'])
+
+    def render(self, pool=None):
+        """
+        The metrics in the Prometheus text exposition format, with ``pool``
+        (a ``pool_metrics.snapshot()``, this process's by default).
+        """
+        lines = []
+        with self._lock:
+            _family(lines, 'http_requests_total', 'counter', 'Requests handled.')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+            _family(lines, 'http_request_duration_seconds', 'histogram', 'Request latency.')
+            for endpoint, histogram in sorted(self.latency.items()):
+                _histogram(lines, 'http_request_duration_seconds', histogram, endpoint=endpoint)
+            _family(lines, 'http_request_sql_statements', 'histogram', 'SQL statements per request.')
+            for endpoint, histogram in sorted(self.statements.items()):
+                _histogram(lines, 'http_request_sql_statements', histogram, endpoint=endpoint)
+            _family(lines, 'http_request_sql_seconds_total', 'counter', 'Time spent in SQL statements.')
+            for endpoint, seconds in sorted(self.db_seconds.items()):
+                lines.append(f'http_request_sql_seconds_total{_labels(endpoint=endpoint)} {seconds:.6f}')
+            _family(lines, 'http_request_n_plus_one_total', 'counter',
+                    'Requests that repeated one statement shape at least the N+1 threshold.')
+            for endpoint, count in sorted(self.n_plus_one.items()):
+                lines.append(f'http_request_n_plus_one_total{_labels(endpoint=endpoint)} {count}')
+        _pool_lines(lines, pool_metrics.snapshot() if pool is None else pool)
+        return '\n'.join(lines) + '\n'
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _histogram(lines, name, histogram, **labels):
+    cumulative = 0
+    for bound, count in zip([*histogram.bounds, '+Inf'], histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.total:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def _pool_lines(lines, pool):
+    for name, key, help_text in (
+        ('db_pool_checkouts_total', 'checkouts', 'Connections checked out of the pool.'),
+        ('db_pool_timeouts_total', 'timeouts', 'Checkouts that gave up waiting for a connection.'),
+        ('db_pool_connects_total', 'connects', 'New database connections opened.'),
+        ('db_pool_invalidations_total', 'invalidations', 'Connections discarded as broken or stale.'),
+    ):
+        _family(lines, name, 'counter', help_text)
+        lines.append(f'{name} {pool[key]}')
+    wait = Histogram(WAIT_BUCKETS)
+    wait.counts = list(pool['wait_buckets'].values())
+    wait.total, wait.count = pool['wait_seconds_total'], pool['checkouts']
+    _family(lines, 'db_pool_wait_seconds', 'histogram', 'Time to get a connection from the pool.')
+    _histogram(lines, 'db_pool_wait_seconds', wait)
+
+
+# --- Snapshots shared through METRICS_DIR ---
+
+def _add_pool(total, pool):
+    for key in POOL_COUNTERS:
+        total[key] = total.get(key, 0) + pool[key]
+    buckets = total.setdefault('wait_buckets', {})
+    for bound, count in pool['wait_buckets'].items():
+        buckets[bound] = buckets.get(bound, 0) + count
+    return total
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _write(path, data):
+    # Write-then-rename, so readers never see half a file
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix='.metrics-', suffix='.tmp')
+    with os.fdopen(fd, 'w') as stream:
+        json.dump(data, stream)
+    os.replace(temporary, path)
+
+
+def snapshot_path(directory, pid=None):
+    return Path(directory) / f'metrics-{os.getpid() if pid is None else pid}.json'
+
+
+def collect(directory):
+    """Sum the snapshots in ``directory``: returns (RequestMetrics, pool snapshot)."""
+    metrics, pool = RequestMetrics(), {}
+    exited = _read(Path(directory) / EXITED_SNAPSHOT)
+    folded = set()
+    if exited is not None:
+        metrics.merge(exited['requests'])
+        _add_pool(pool, exited['pool'])
+        folded = {f'metrics-{pid}.json' for pid in exited['pids']}
+    for path in sorted(Path(directory).glob('metrics-*.json')):
+        # An exited worker's file is counted in the exited snapshot until the master deletes it
+        if path.name == EXITED_SNAPSHOT or path.name in folded:
+            continue
+        data = _read(path)
+        if data is not None:
+            metrics.merge(data['requests'])
+            _add_pool(pool, data['pool'])
+    if not pool:
+        _add_pool(pool, pool_metrics.snapshot())
+    return metrics, pool
+
+
+def retire_process(directory, pid):
+    """Fold the snapshot of exited process ``pid`` into the exited snapshot; call it from the master."""
+    path = snapshot_path(directory, pid)
+    data = _read(path)
+    if data is None:
+        return
+    exited_path = Path(directory) / EXITED_SNAPSHOT
+    exited = _read(exited_path) or {'requests': RequestMetrics().snapshot(), 'pool': {}, 'pids': []}
+    metrics, pool = RequestMetrics(), _add_pool({}, data['pool'])
+    metrics.merge(exited['requests'])
+    metrics.merge(data['requests'])
+    if exited['pool']:
+        _add_pool(pool, exited['pool'])
+    _write(exited_path, {
+        'requests': metrics.snapshot(),
+        'pool': pool,
+        # Only files not yet deleted need to be skipped by collect()
+        'pids': [other for other in exited['pids'] if snapshot_path(directory, other).exists()] + [pid],
+    })
+    path.unlink()
+
+
+def clear_directory(directory):
+    """Create ``directory`` or delete the snapshots left in it by a previous run."""
+    os.makedirs(directory, exist_ok=True)
+    for pattern in ('metrics-*.json', '.metrics-*.tmp'):
+        for path in Path(directory).glob(pattern):
+            path.unlink(missing_ok=True)
+
+
+class Instrumentation:
+    """Request hooks, SQL timing and the /metrics view."""
+
+    def __init__(self, n1_threshold=DEFAULT_N1_THRESHOLD, server_timing=False, directory=None,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.enabled = False
+        self.n1_threshold = n1_threshold
+        self.server_timing = server_timing
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = RequestMetrics()
+        self._shapes = {}
+        self._flushed_at = 0.0
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get('INSTRUMENTATION_ENABLED', True))
+        self.n1_threshold = int(app.config.get('N1_THRESHOLD', self.n1_threshold))
+        self.server_timing = bool(app.config.get('SERVER_TIMING', self.server_timing))
+        self.directory = app.config.get('METRICS_DIR') or None
+        self.flush_interval = float(app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval))
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        if self.enabled:
+            app.before_request(self._start)
+            app.after_request(self._finish)
+
+    def metrics_view(self):
+        if self.directory:
+            self.flush()
+            metrics, pool = collect(self.directory)
+            body = metrics.render(pool)
+        else:
+            body = self.metrics.render()
+        return Response(body, mimetype='text/plain; version=0.0.4')
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR."""
+        self._flushed_at = time.monotonic()
+        _write(snapshot_path(self.directory), {'requests': self.metrics.snapshot(), 'pool': pool_metrics.snapshot()})
+
+    def shape(self, statement):
+        shape = self._shapes.get(statement)
+        if shape is None:
+            shape = _PLACEHOLDER_LIST.sub('?', _PLACEHOLDER.sub('?', ' '.join(statement.split())))
+            if len(self._shapes) >= SHAPE_CACHE_SIZE:
+                self._shapes.clear()
+            self._shapes[statement] = shape
+        return shape
+
+    # --- Request hooks ---
+
+    def _start(self):
+        g.instrumentation = {'started': time.perf_counter(), 'statements': Counter(), 'db_seconds': 0.0}
+
+    def _finish(self, response):
+        state = g.pop('instrumentation', None)
+        if state is None or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - state['started']
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        statements = sum(state['statements'].values())
+        suspects = [(shape, count) for shape, count in state['statements'].items() if count >= self.n1_threshold]
+        for shape, count in suspects:
+            logger.warning('Possible N+1 in %s %s: %d executions of %s', request.method, rule, count, shape[:300])
+        self.metrics.record(rule, request.method, response.status_code, elapsed, statements,
+                            state['db_seconds'], suspects)
+        if self.directory and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        if self.server_timing:
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={state["db_seconds"] * 1000:.1f};desc="{statements} queries", app;dur={elapsed * 1000:.1f}',
+            )
+        return response
+
+    # --- SQL timing ---
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'instrumentation' in g:
+            conn.info['instrumentation_started'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # A statement that raised never gets here; the next one overwrites its start time
+        started = conn.info.pop('instrumentation_started', None)
+        if started is None or not has_request_context():
+            return
+        state = g.get('instrumentation')
+        elapsed = time.perf_counter() - started
+        if state is not None:
+            state['db_seconds'] += elapsed
+            state['statements'][self.shape(statement)] += 1
+
+
+instrumentation = Instrumentation()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(*args):
+    if instrumentation.enabled:
+        instrumentation.before_cursor_execute(*args)
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(*args):
+    if instrumentation.enabled:
+        instrumentation.after_cursor_execute(*args)
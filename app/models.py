@@ -5,6 +5,7 @@ from datetime import datetime
 from sqlalchemy import event, inspect
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.associationproxy import association_proxy
+from .human_ids import allocator as human_ids
 
 # Model to track the next human-readable ID for each table
 class HumanIdSequence(db.Model):
@@ -12,6 +13,12 @@ class HumanIdSequence(db.Model):
     model_name = db.Column(db.String(100), primary_key=True)
     next_value = db.Column(db.Integer, nullable=False, default=1)
 
+# Version of each response cache group, bumped by writes to its models (see app/response_cache.py)
+class ResponseCacheVersion(db.Model):
+    __tablename__ = 'response_cache_versions'
+    cache_group = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
 # Abstract base model providing common fields
 class BaseModel(db.Model):
     __abstract__ = True
@@ -27,32 +34,12 @@ class BaseModel(db.Model):
 def generate_human_id(mapper, connection, target):
     """
     Listen for the 'before_insert' event and generate a human_id.
-    This replicates the logic from the Django example using SQLAlchemy events.
+    Ids come from a block reserved per process (see app/human_ids.py), so
+    the sequence row is not locked for the rest of the inserting transaction.
+    Rows that already carry a human_id (e.g. from assign_human_ids) keep it.
     """
-    model_class = target.__class__
-    model_name = model_class.__name__
-
-    # Lock the sequence row for this model to prevent race conditions
-    sequence_row = connection.execute(
-        db.select(HumanIdSequence).filter_by(model_name=model_name).with_for_update()
-    ).first()
-
-    if sequence_row:
-        next_id = sequence_row.next_value
-        # Increment the sequence for the next insert
-        connection.execute(
-            db.update(HumanIdSequence)
-            .where(HumanIdSequence.model_name == model_name)
-            .values(next_value=next_id + 1)
-        )
-    else:
-        # If no sequence exists for this model, create one
-        next_id = 1
-        connection.execute(
-            db.insert(HumanIdSequence).values(model_name=model_name, next_value=2)
-        )
-
-    target.human_id = next_id
+    if target.human_id is None:
+        target.human_id = human_ids.next_id(connection.engine, target.__class__.__name__)
 
 # --- Application Models ---
 
@@ -146,3 +133,120 @@ class User(BaseModel):
 
     def __repr__(self):
         return f"<User {self.email}>"
+
+class Shift(BaseModel):
+    __tablename__ = 'shifts'
+    __table_args__ = (
+        db.Index('ix_shifts_user_id_start_time', 'user_id', 'start_time'),
+        db.Index('ix_shifts_start_time_id', 'start_time', 'id'),  # keyset pagination order
+        db.CheckConstraint('end_time > start_time', name='ck_shifts_end_after_start'),
+    )
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    team_id = db.Column(UUID(as_uuid=True), db.ForeignKey('teams.id', ondelete='SET NULL'), nullable=True, index=True)
+    role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    break_minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    user = db.relationship('User', foreign_keys=[user_id])
+    team = db.relationship('Team')
+    role = db.relationship('Role')
+
+    def __repr__(self):
+        return f"<Shift {self.user_id} {self.start_time}-{self.end_time}>"
+
+class ClockEvent(BaseModel):
+    """A clock-in or clock-out punch, written in batches by app/clock_ingest.py."""
+    __tablename__ = 'clock_events'
+    __table_args__ = (
+        db.Index('ix_clock_events_user_id_occurred_at', 'user_id', 'occurred_at'),
+        db.CheckConstraint("kind IN ('in', 'out')", name='ck_clock_events_kind'),
+    )
+    # Client-generated id, so a retried punch is stored once
+    event_id = db.Column(db.String(64), nullable=False, unique=True)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(3), nullable=False)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False)
+
+    user = db.relationship('User', foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f"<ClockEvent {self.user_id} {self.kind} {self.occurred_at}>"
+
+# Pre-aggregated hours per employee, maintained by app/rollups.py
+class DailyHours(db.Model):
+    __tablename__ = 'hours_daily'
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC calendar day
+    scheduled_seconds = db.Column(db.Integer, nullable=False, default=0)  # rostered, net of breaks
+    worked_seconds = db.Column(db.Integer, nullable=False, default=0)  # clocked in to clocked out
+
+class WeeklyHours(db.Model):
+    __tablename__ = 'hours_weekly'
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)  # Monday of the ISO week
+    scheduled_seconds = db.Column(db.Integer, nullable=False, default=0)
+    worked_seconds = db.Column(db.Integer, nullable=False, default=0)
+
+# --- 48-hour average alerts, written by the scanner in app/alerts.py ---
+
+class HoursAlert(BaseModel):
+    """A change in an employee's 17-week average hours state (ok, warning or breach)."""
+    __tablename__ = 'hours_alerts'
+    __table_args__ = (
+        db.Index('ix_hours_alerts_user_id_created_at', 'user_id', 'created_at'),
+    )
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    team_id = db.Column(UUID(as_uuid=True), db.ForeignKey('teams.id', ondelete='SET NULL'), nullable=True, index=True)
+    previous_state = db.Column(db.String(10), nullable=False)
+    state = db.Column(db.String(10), nullable=False)
+    average_hours = db.Column(db.Float, nullable=False)
+    period_start = db.Column(db.Date, nullable=False)  # first week of the reference period
+    period_end = db.Column(db.Date, nullable=False)    # last week of the reference period
+
+class HoursAlertState(db.Model):
+    """Latest non-default state per employee (no row means ok), so the scanner only records transitions."""
+    __tablename__ = 'hours_alert_states'
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), primary_key=True)
+    state = db.Column(db.String(10), nullable=False)
+    average_hours = db.Column(db.Float, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class AlertScan(BaseModel):
+    """One pass of the scanner over every employee; unfinished scans are resumed."""
+    __tablename__ = 'alert_scans'
+    period_end = db.Column(db.Date, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    shards = db.relationship('AlertScanShard', back_populates='scan', cascade='all, delete-orphan')
+
+class AlertScanShard(db.Model):
+    """Checkpoint of one team's share of a scan: the last employee done, in id order."""
+    __tablename__ = 'alert_scan_shards'
+    scan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('alert_scans.id'), primary_key=True)
+    shard = db.Column(db.String(36), primary_key=True)  # team id, or 'unassigned'
+    last_user_id = db.Column(UUID(as_uuid=True), nullable=True)
+    scanned = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    scan = db.relationship('AlertScan', back_populates='shards')
+
+class Availability(BaseModel):
+    """A period an employee has said they can (available=True) or cannot work."""
+    __tablename__ = 'availability'
+    __table_args__ = (
+        db.Index('ix_availability_user_id_start_time', 'user_id', 'start_time'),
+        db.CheckConstraint('end_time > start_time', name='ck_availability_end_after_start'),
+    )
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    available = db.Column(db.Boolean, nullable=False, default=False)
+    note = db.Column(db.String(255), nullable=True)
+
+    user = db.relationship('User', foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f"<Availability {self.user_id} {'can' if self.available else 'cannot'} {self.start_time}-{self.end_time}>"
@@ -0,0 +1,196 @@
+"""
+Double-booking detection: the same employee in two shifts at once.
+
+A user can belong to several teams, so clashes are found per user across
+every team. ``overlapping_pairs`` is a sweep over intervals sorted by
+(user, start): an interval clashes with an earlier one exactly when it
+starts before the latest end seen so far for that user, which one
+``np.maximum.accumulate`` gives for all users at once. Only the clashing
+intervals then walk back to name their partners, so the cost is
+O(n log n) plus the number of clashes rather than quadratic.
+
+The import and the shift endpoints reject overlaps before writing them.
+For a guarantee that also covers concurrent writers and direct SQL,
+``enable_exclusion_constraint`` adds a GiST exclusion constraint to the
+shifts table so Postgres itself refuses overlapping rows.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func, select, text
+
+from .compliance import to_datetimes, to_seconds
+from .db import db
+from .models import Shift, TeamMembership
+
+EXCLUSION_CONSTRAINT = 'ex_shifts_user_id_no_overlap'
+EXCLUSION_VIOLATION = '23P01'  # Postgres SQLSTATE exclusion_violation
+# Users are kept apart in the running maximum by an offset above any epoch second
+_USER_SHIFT = 34
+
+
+@dataclass(frozen=True)
+class Overlap:
+    user_id: object
+    first: object   # key of the shift that starts first
+    second: object
+    start: datetime  # the period both cover
+    end: datetime
+
+
+def overlapping_pairs(codes, starts, ends):
+    """
+    Index pairs (i, j) of intervals with the same code that overlap, i
+    starting first. Intervals are half-open, so back-to-back shifts do not
+    clash.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) < 2:
+        return []
+    order = np.lexsort((-ends, starts, codes))
+    offset = codes[order] << _USER_SHIFT
+    s, e = starts[order] + offset, ends[order] + offset
+    reach = np.maximum.accumulate(e)
+    pairs = []
+    for p in np.flatnonzero(s[1:] < reach[:-1]) + 1:
+        # The prefix maximum bounds the walk: once it is below s[p], nothing earlier reaches p
+        q = p - 1
+        while q >= 0 and reach[q] > s[p]:
+            if e[q] > s[p]:
+                pairs.append((int(order[q]), int(order[p])))
+            q -= 1
+    return pairs
+
+
+def find_overlaps(rows):
+    """
+    Overlaps among (key, user_id, start_time, end_time) rows, in order of
+    the later shift. Times may be datetimes or epoch seconds.
+    """
+    rows = list(rows)
+    if len(rows) < 2:
+        return []
+    # Column by column: zip(*rows) is slow with this many arguments
+    keys, users, start_col, end_col = ([row[k] for row in rows] for k in range(4))
+    positions = {}
+    codes = [positions.setdefault(user_id, len(positions)) for user_id in users]
+    starts, ends = to_seconds(start_col), to_seconds(end_col)
+    pairs = overlapping_pairs(codes, starts, ends)
+    if not pairs:
+        return []
+    first, second = (np.array(side) for side in zip(*pairs))
+    lo = to_datetimes(np.maximum(starts[first], starts[second]))
+    hi = to_datetimes(np.minimum(ends[first], ends[second]))
+    return [
+        Overlap(users[i], keys[i], keys[j], lo[k], hi[k])
+        for k, (i, j) in enumerate(pairs)
+    ]
+
+
+def load_overlaps(start=None, end=None, user_ids=None, team_id=None):
+    """
+    Overlapping shifts, keyed by shift id, for ``user_ids`` or the members
+    of ``team_id`` (their shifts in every team), within [start, end).
+    """
+    stmt = select(
+        Shift.id, Shift.user_id,
+        # Epoch seconds straight from Postgres avoid building datetime objects
+        cast(func.extract('epoch', Shift.start_time), BigInteger),
+        cast(func.extract('epoch', Shift.end_time), BigInteger),
+    )
+    if user_ids is not None:
+        stmt = stmt.where(Shift.user_id.in_(list(user_ids)))
+    if team_id is not None:
+        stmt = stmt.where(Shift.user_id.in_(select(TeamMembership.user_id).where(TeamMembership.team_id == team_id)))
+    if start is not None:
+        stmt = stmt.where(Shift.end_time > start)
+    if end is not None:
+        stmt = stmt.where(Shift.start_time < end)
+    return find_overlaps(db.session.execute(stmt).tuples())
+
+
+def batch_overlaps(rows):
+    """
+    Check new shift rows (dicts with user_id, start_time and end_time)
+    against each other and the shifts already stored. Returns
+    {row index: message} for the rows to reject: every row that overlaps
+    a stored shift, and the later of two new rows that overlap.
+    """
+    if not rows:
+        return {}
+    stored = db.session.execute(
+        select(Shift.human_id, Shift.user_id, Shift.start_time, Shift.end_time).where(
+            Shift.user_id.in_({row['user_id'] for row in rows}),
+            Shift.end_time > min(row['start_time'] for row in rows),
+            Shift.start_time < max(row['end_time'] for row in rows),
+        )
+    ).tuples()
+    candidates = [(('stored', human_id), user_id, start, end) for human_id, user_id, start, end in stored]
+    candidates += [(('new', i), row['user_id'], row['start_time'], row['end_time']) for i, row in enumerate(rows)]
+    rejected = {}
+    # In order of the later shift, so a row is rejected or kept before it can block another
+    for overlap in find_overlaps(candidates):
+        (first_kind, first), (second_kind, second) = overlap.first, overlap.second
+        if first_kind == 'new' and first in rejected:
+            continue
+        if first_kind == 'stored':
+            if second_kind == 'new':
+                rejected.setdefault(second, f'Overlaps shift {first} of the same employee')
+        elif second_kind == 'stored':
+            rejected.setdefault(first, f'Overlaps shift {second} of the same employee')
+        else:
+            rejected.setdefault(second, 'Overlaps an earlier shift in the upload for the same employee')
+    return rejected
+
+
+def overlapping_shift(user_id, start, end, exclude_id=None):
+    """The first stored shift of ``user_id`` overlapping [start, end), if any."""
+    stmt = (
+        select(Shift)
+        .where(Shift.user_id == user_id, Shift.start_time < end, Shift.end_time > start)
+        .order_by(Shift.start_time)
+        .limit(1)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(Shift.id != exclude_id)
+    return db.session.execute(stmt).scalar()
+
+
+def is_exclusion_violation(exc):
+    """True if a DBAPI error wrapped by SQLAlchemy came from the exclusion constraint."""
+    return getattr(getattr(exc, 'orig', None), 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+# --- Postgres exclusion constraint ---
+
+def exclusion_constraint_enabled():
+    return db.session.execute(
+        text('SELECT 1 FROM pg_constraint WHERE conname = :name'), {'name': EXCLUSION_CONSTRAINT}
+    ).scalar() is not None
+
+
+def enable_exclusion_constraint():
+    """
+    Make Postgres reject overlapping shifts for the same user. Fails, and
+    changes nothing, while overlaps exist; returns those overlaps so they
+    can be fixed first, or [] once the constraint is in place.
+    """
+    found = load_overlaps()
+    if found or exclusion_constraint_enabled():
+        return found
+    # Shift times are naive UTC timestamps, hence tsrange rather than tstzrange
+    db.session.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+    db.session.execute(text(
+        f'ALTER TABLE shifts ADD CONSTRAINT {EXCLUSION_CONSTRAINT} '
+        "EXCLUDE USING gist (user_id WITH =, tsrange(start_time, end_time, '[)') WITH &&)"
+    ))
+    db.session.commit()
+    return []
+
+
+def disable_exclusion_constraint():
+    db.session.execute(text(f'ALTER TABLE shifts DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT}'))
+    db.session.commit()
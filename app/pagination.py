@@ -0,0 +1,135 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is fetched with ``WHERE key > last_key ORDER BY key LIMIT n``, so
+the cost of a page depends on its size and not on how deep it is. The key
+is an indexed column or tuple of columns ending in a unique one. The
+cursor handed to clients is the key of the last row, JSON-encoded and
+base64ed so it stays opaque.
+
+List bodies are unchanged; the cursor for the next page is returned in the
+``X-Next-Cursor`` header and as a ``Link: <...>; rel="next"`` header, and
+is absent on the last page.
+
+Lists that returned every row before they were paged (roles, teams,
+shifts) still do when the client sends neither ``limit`` nor ``cursor``;
+they pass ``default_limit=None``. Lists that were paged from the start
+default to DEFAULT_PAGE_SIZE rows.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import request
+from flask_restx import abort, reqparse
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def page_size(value):
+    value = int(value)
+    if not 1 <= value <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return value
+
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument('limit', type=page_size, location='args',
+                               help=f'Page size (1-{MAX_PAGE_SIZE}, default {DEFAULT_PAGE_SIZE}; '
+                                    'roles, teams and shifts return every row without limit or cursor)')
+pagination_parser.add_argument('cursor', location='args',
+                               help='Opaque cursor from the X-Next-Cursor header of the previous page')
+
+
+def document_pagination(ns):
+    """Decorator documenting the pagination arguments and headers on a list endpoint."""
+    def decorator(func):
+        func = ns.header(NEXT_CURSOR_HEADER, 'Cursor for the next page; absent on the last page')(func)
+        return ns.expect(pagination_parser)(func)
+    return decorator
+
+
+def encode_cursor(values):
+    raw = json.dumps([_to_json(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decode ``cursor`` into Python values for ``columns``; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Malformed cursor')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Malformed cursor')
+    return [_from_json(column, value) for column, value in zip(columns, values)]
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _from_json(column, value):
+    python_type = column.type.python_type
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is uuid.UUID:
+            return uuid.UUID(value)
+        return python_type(value)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError('Malformed cursor')
+
+
+def paginate(query, *keys, args=None, default_limit=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(items, headers)`` for one page of ``query`` ordered by ``keys``.
+
+    ``keys`` are mapped columns whose combination is unique, e.g.
+    ``Role.human_id`` or ``(Shift.start_time, Shift.id)``; ``args`` defaults
+    to the parsed pagination arguments of the current request.
+    ``default_limit`` is the page size when the client sends neither limit
+    nor cursor; None returns every row.
+    """
+    if args is None:
+        args = pagination_parser.parse_args()
+    limit = args.get('limit') or (DEFAULT_PAGE_SIZE if args.get('cursor') else default_limit)
+    if limit is None:
+        return query.order_by(*keys).all(), {}
+    if args.get('cursor'):
+        try:
+            after = decode_cursor(args['cursor'], keys)
+        except ValueError as exc:
+            abort(400, str(exc))
+        if len(keys) == 1:
+            query = query.filter(keys[0] > after[0])
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*after))
+    rows = query.order_by(*keys).limit(limit + 1).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        cursor = encode_cursor([getattr(last, key.key) for key in keys])
+        headers[NEXT_CURSOR_HEADER] = cursor
+        headers['Link'] = f'<{next_page_url(cursor, limit)}>; rel="next"'
+    return rows, headers
+
+
+def next_page_url(cursor, limit):
+    params = request.args.to_dict()
+    params.update(cursor=cursor, limit=limit)
+    return f'{request.base_url}?{urlencode(sorted(params.items()))}'
@@ -0,0 +1,83 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields, inputs
+from sqlalchemy import select
+from datetime import date, timedelta
+from .models import DailyHours, WeeklyHours, TeamMembership
+from .compliance import REFERENCE_WEEKS
+from .rollups import week_start
+from .serialization import serialize_list_with
+from . import db
+import uuid
+
+ns = Namespace('reports', description='Hours worked per day and per week, from the rollup tables')
+api.add_namespace(ns)
+
+hours_fields = {
+    'user_id': fields.String(description='Employee'),
+    'scheduled_hours': fields.Float(description='Rostered hours, net of breaks'),
+    'worked_hours': fields.Float(description='Hours between clock-in and clock-out'),
+}
+
+daily_hours_model = ns.model('DailyHours', {
+    'day': fields.Date(description='UTC calendar day'),
+    **hours_fields,
+})
+
+weekly_hours_model = ns.model('WeeklyHours', {
+    'week_start': fields.Date(description='Monday of the ISO week'),
+    **hours_fields,
+})
+
+report_parser = ns.parser()
+report_parser.add_argument('team_id', type=uuid.UUID, location='args', help='Report on the members of this team')
+report_parser.add_argument('user_id', type=uuid.UUID, location='args', help='Report on one employee')
+report_parser.add_argument('start', type=inputs.date_from_iso8601, location='args', help='First day (YYYY-MM-DD)')
+report_parser.add_argument('end', type=inputs.date_from_iso8601, location='args', help='Last day (YYYY-MM-DD)')
+
+
+def hours_report(model, period, default_start):
+    """Rows of ``model`` for the requested employees, ordered by employee then period."""
+    args = report_parser.parse_args()
+    if (args['team_id'] is None) == (args['user_id'] is None):
+        ns.abort(400, 'Pass exactly one of team_id or user_id')
+    end = args['end'] or date.today()
+    start = args['start'] or default_start(end)
+    if start > end:
+        ns.abort(400, 'start must not be after end')
+    if args['team_id'] is not None:
+        members = select(TeamMembership.user_id).where(TeamMembership.team_id == args['team_id'])
+        who = model.user_id.in_(members)
+    else:
+        who = model.user_id == args['user_id']
+    # One range scan of the (user_id, period) primary key per employee
+    query = (
+        select(
+            model.user_id, period,
+            (model.scheduled_seconds / 3600.0).label('scheduled_hours'),
+            (model.worked_seconds / 3600.0).label('worked_hours'),
+        )
+        .where(who, period.between(start, end))
+        .order_by(model.user_id, period)
+    )
+    return db.session.execute(query).all()
+
+
+@ns.route('/daily')
+class DailyReport(Resource):
+    @ns.expect(report_parser)
+    @serialize_list_with(ns, daily_hours_model)
+    def get(self):
+        """Hours per employee per day (defaults to the current week)"""
+        return hours_report(DailyHours, DailyHours.day, week_start)
+
+
+@ns.route('/weekly')
+class WeeklyReport(Resource):
+    @ns.expect(report_parser)
+    @serialize_list_with(ns, weekly_hours_model)
+    def get(self):
+        """Hours per employee per ISO week (defaults to the last 17 weeks)"""
+        return hours_report(
+            WeeklyHours, WeeklyHours.week_start,
+            lambda end: week_start(end) - timedelta(weeks=REFERENCE_WEEKS - 1),
+        )
@@ -0,0 +1,235 @@
+"""
+Conditional-GET response cache for read-mostly endpoints.
+
+``cached(group)`` stores the serialized JSON response of a GET handler,
+keyed by path and query string, and tags it with an ETag derived from the
+group's version. A hit skips the list query, marshalling and JSON encoding;
+a request whose If-None-Match carries the current ETag gets a bodiless 304
+without even a cache lookup.
+
+A group's version is a row in response_cache_versions, so every process
+reads the same one. ``track(group, *models)`` names the models a group is
+built from, and any commit that writes one of them, through the ORM or an
+ORM-enabled statement such as ``session.execute(insert(Model))``, bumps the
+version in the same transaction. Every worker sees the new ETag the moment
+the write commits, and copies cached under the old version are never
+served again. A conditional GET costs one primary-key lookup; writers of a
+group queue on its version row until they commit. Writes that bypass the
+session (raw connections, other programs) must call ``invalidate``.
+
+Entries live in an in-process LRU and expire after RESPONSE_CACHE_TTL to
+bound memory. Setting RESPONSE_CACHE_URL to a redis:// URL shares them
+between processes instead. Either way, each gunicorn worker opens its own
+backend after the fork (``open_backend``). ETags depend only on the shared
+versions, so they match across workers.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import Response, request
+from flask_restx.representations import output_json
+from flask_restx.utils import unpack
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from .db import db
+from .models import ResponseCacheVersion
+
+DEFAULT_CACHE_SIZE = 512
+DEFAULT_CACHE_TTL = 60
+
+
+class LocalBackend:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Entries shared through Redis (requires the ``redis`` package)."""
+
+    def __init__(self, url, prefix='rotaguard:response-cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_URL is set but the redis package is not installed')
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        # Entries carry their group's version in the key; old ones simply expire
+        self._client.set(self._prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+def bump_versions(session, groups):
+    """Increment the versions of ``groups`` in ``session``'s transaction."""
+    groups = sorted(set(groups))
+    bumped = set(session.execute(
+        update(ResponseCacheVersion)
+        .where(ResponseCacheVersion.cache_group.in_(groups))
+        .values(version=ResponseCacheVersion.version + 1)
+        .returning(ResponseCacheVersion.cache_group)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    missing = [group for group in groups if group not in bumped]
+    if missing:
+        session.execute(insert(ResponseCacheVersion), [{'cache_group': group, 'version': 1} for group in missing])
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=DEFAULT_CACHE_TTL):
+        self.backend = backend or LocalBackend()
+        self.ttl = ttl
+        self.enabled = True
+        self._groups = {}  # table name -> groups built from it
+
+    def init_app(self, app):
+        self.ttl = float(app.config.get('RESPONSE_CACHE_TTL', self.ttl))
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.open_backend(app)
+
+    def open_backend(self, app):
+        """Create a new backend from ``app``'s config; a forked worker must not use its parent's."""
+        url = app.config.get('RESPONSE_CACHE_URL')
+        if url:
+            self.backend = RedisBackend(url)
+        else:
+            self.backend = LocalBackend(int(app.config.get('RESPONSE_CACHE_SIZE', DEFAULT_CACHE_SIZE)))
+
+    def track(self, group, *models):
+        """Bump ``group`` whenever a commit writes to one of ``models``."""
+        for model in models:
+            self._groups.setdefault(model.__table__.name, set()).add(group)
+
+    def groups_for(self, table_name):
+        return self._groups.get(table_name, ())
+
+    def version(self, group):
+        return db.session.execute(
+            select(ResponseCacheVersion.version).where(ResponseCacheVersion.cache_group == group)
+        ).scalar() or 0
+
+    def etag(self, group, version, key):
+        return hashlib.sha1(f'{group}:{version}:{key}'.encode()).hexdigest()[:20]
+
+    def cached(self, group):
+        """Cache successful JSON responses of a GET handler under ``group``."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                key = request.path + '?' + '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+                version = self.version(group)
+                etag = self.etag(group, version, key)
+                if request.if_none_match.contains(etag):
+                    return self._not_modified(etag)
+
+                entry_key = f'{group}:{version}:{key}'
+                entry = self.backend.get(entry_key)
+                if entry is None:
+                    result = func(*args, **kwargs)
+                    if isinstance(result, Response):
+                        response = result
+                    else:
+                        response = output_json(*unpack(result))
+                    if response.status_code != 200:
+                        return response
+                    entry = (response.get_data(), [
+                        (name, value) for name, value in response.headers.items()
+                        if name not in ('Content-Length', 'Content-Type')
+                    ])
+                    self.backend.set(entry_key, entry, self.ttl)
+                body, headers = entry
+                response = Response(body, 200, headers, mimetype='application/json')
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *groups, session=None):
+        """Bump ``groups`` in ``session``'s transaction (db.session by default); the caller commits."""
+        bump_versions(session or db.session, groups)
+
+    def _not_modified(self, etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+response_cache = ResponseCache()
+
+
+# --- Bumping versions for ORM writes ---
+
+def _pending_groups(session):
+    return session.info.setdefault('response_cache_groups', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_groups(session, flush_context):
+    groups = _pending_groups(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        groups.update(response_cache.groups_for(obj.__table__.name))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statement_groups(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        groups = response_cache.groups_for(orm_execute_state.statement.table.name)
+        if groups:
+            _pending_groups(orm_execute_state.session).update(groups)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions_before_commit(session):
+    # The commit's own flush runs after this hook, so flush first to collect its changes
+    session.flush()
+    groups = session.info.pop('response_cache_groups', None)
+    if groups:
+        bump_versions(session, groups)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_groups(session):
+    session.info.pop('response_cache_groups', None)
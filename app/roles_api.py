@@ -2,12 +2,16 @@ from .api import api
 from flask_restx import Namespace, Resource, fields
 from .models import Role, User
 from . import db
+from .pagination import paginate, document_pagination
+from .response_cache import response_cache
+from .serialization import serialize_list_with
 from flask import request
 import uuid
 from http import HTTPStatus
 
 ns = Namespace('roles', description='Role management operations')
 api.add_namespace(ns)
+response_cache.track('roles', Role)
 
 role_model = ns.model('Role', {
     'role_id': fields.String(readonly=True, description='The role unique identifier'),
@@ -17,18 +21,16 @@ role_model = ns.model('Role', {
 
 @ns.route('/')
 class RoleList(Resource):
-    @ns.marshal_list_with(role_model)
+    @response_cache.cached('roles')
+    @document_pagination(ns)
+    @serialize_list_with(ns, role_model)
     def get(self):
-        """List all roles"""
-        roles = Role.query.all()
-        return [
-            {
-                'role_id': str(role.id),
-                'role_human_id': role.human_id,
-                'role_name': role.name
-            }
-            for role in roles
-        ]
+        """List all roles, or one page of them with limit or cursor"""
+        query = db.session.query(
+            Role.human_id, Role.id.label('role_id'), Role.human_id.label('role_human_id'), Role.name.label('role_name'),
+        )
+        roles, headers = paginate(query, Role.human_id, default_limit=None)
+        return roles, 200, headers
 
     @ns.expect(role_model)
     @ns.marshal_with(role_model)
@@ -49,6 +51,7 @@ class RoleList(Resource):
 @ns.response(404, 'Role not found')
 @ns.param('id', 'The role identifier')
 class RoleResource(Resource):
+    @response_cache.cached('roles')
     @ns.marshal_with(role_model)
     def get(self, id):
         """Fetch a role given its identifier"""
@@ -0,0 +1,272 @@
+"""
+Per-employee hours rolled up by UTC day and by ISO week.
+
+``hours_daily`` and ``hours_weekly`` hold rostered hours (shifts, net of
+breaks) and worked hours (paired clock-in/clock-out punches) per employee,
+so reports read one indexed range per employee instead of re-summing raw
+rows. A shift or punch spanning midnight is split between the days it
+covers, and breaks are spread evenly over the shift.
+
+The tables are kept current by recomputing only the ISO weeks a change
+touches, for the employees it touches, inside the writing transaction:
+
+* ORM writes to Shift and ClockEvent are collected by session listeners
+  and refreshed just before the commit;
+* bulk Core inserts (rota import, clock ingestion) call refresh_rollups
+  with the spans they wrote.
+
+Two transactions refreshing the same employee would each recompute from
+their own snapshot, and the later commit would overwrite the rows with
+totals that miss the other's write. On PostgreSQL a refresh therefore
+takes a transaction-level advisory lock per employee first, and reads the
+source rows only once it holds it, by which time any earlier holder has
+committed.
+
+Recomputing whole weeks from source rows, rather than adding deltas, keeps
+every refresh idempotent, so ``flask rebuild-rollups`` can backfill or
+repair any range simply by running the same code over it.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import chain
+
+from sqlalchemy import delete, event, func, inspect, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .db import db
+from .models import ClockEvent, DailyHours, Shift, User, WeeklyHours
+
+ONE_DAY = timedelta(days=1)
+# First key of the per-employee PostgreSQL advisory locks; the second is derived from the user id
+ROLLUP_LOCK_NAMESPACE = 0x48A1E58
+# Punches further apart than this are not paired into a worked interval
+MAX_PUNCH_GAP = timedelta(hours=24)
+
+
+def week_start(day):
+    """Monday of ``day``'s ISO week."""
+    return day - timedelta(days=day.weekday())
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min)
+
+
+def _add_by_day(buckets, user_id, start, end, weight, first, last):
+    """Add ``weight`` x the seconds of [start, end) to each UTC day it covers."""
+    while start < end:
+        day = start.date()
+        stop = min(end, _midnight(day + ONE_DAY))
+        if first <= day <= last:
+            buckets[(user_id, day)] += (stop - start).total_seconds() * weight
+        start = stop
+
+
+def compute_daily_hours(user_ids, first, last, session=None):
+    """
+    Rostered and worked seconds per (user_id, day) for days in [first, last].
+    Returns ``{(user_id, day): (scheduled, worked)}`` without empty days.
+    """
+    session = session or db.session
+    user_ids = list(user_ids)
+    lo, hi = _midnight(first), _midnight(last + ONE_DAY)
+    scheduled = defaultdict(float)
+    worked = defaultdict(float)
+
+    shifts = session.execute(
+        select(Shift.user_id, Shift.start_time, Shift.end_time, Shift.break_minutes)
+        .where(Shift.user_id.in_(user_ids), Shift.start_time < hi, Shift.end_time > lo)
+    )
+    for user_id, start, end, break_minutes in shifts:
+        length = (end - start).total_seconds()
+        net = max(length - (break_minutes or 0) * 60, 0) / length if length > 0 else 0
+        _add_by_day(scheduled, user_id, start, end, net, first, last)
+
+    punches = session.execute(
+        select(ClockEvent.user_id, ClockEvent.kind, ClockEvent.occurred_at)
+        .where(
+            ClockEvent.user_id.in_(user_ids),
+            ClockEvent.occurred_at >= lo - MAX_PUNCH_GAP,
+            ClockEvent.occurred_at < hi + MAX_PUNCH_GAP,
+        )
+        .order_by(ClockEvent.user_id, ClockEvent.occurred_at, ClockEvent.human_id)
+    )
+    current_user, clocked_in = None, None
+    for user_id, kind, occurred_at in punches:
+        if user_id != current_user:
+            current_user, clocked_in = user_id, None
+        if kind == 'in':
+            # A repeated clock-in replaces the unmatched one before it
+            clocked_in = occurred_at
+        elif clocked_in is not None:
+            if occurred_at - clocked_in <= MAX_PUNCH_GAP:
+                _add_by_day(worked, user_id, clocked_in, occurred_at, 1, first, last)
+            clocked_in = None
+
+    return {
+        key: (round(scheduled.get(key, 0)), round(worked.get(key, 0)))
+        for key in scheduled.keys() | worked.keys()
+        if round(scheduled.get(key, 0)) or round(worked.get(key, 0))
+    }
+
+
+def _upsert(model, key, rows, session):
+    statement = pg_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', key],
+        set_={name: statement.excluded[name] for name in ('scheduled_seconds', 'worked_seconds')},
+    )
+    session.execute(statement, rows)
+
+
+def lock_employees(user_ids, session=None):
+    """
+    Take the rollup advisory lock of each of ``user_ids`` until the
+    transaction ends, in key order so concurrent writers cannot deadlock.
+    A no-op on other databases.
+    """
+    session = session or db.session
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    keys = sorted({int.from_bytes(uuid.UUID(str(user_id)).bytes[:4], 'big', signed=True) for user_id in user_ids})
+    session.execute(
+        text(
+            'SELECT pg_advisory_xact_lock(:namespace, key) '
+            'FROM (SELECT unnest(CAST(:keys AS integer[])) AS key ORDER BY key) AS ordered'
+        ),
+        {'namespace': ROLLUP_LOCK_NAMESPACE, 'keys': keys},
+    )
+
+
+def rewrite_rollups(user_ids, first, last, session=None, clear_all=False):
+    """
+    Recompute the rollups of ``user_ids`` for the whole ISO weeks covering
+    [first, last]. With ``clear_all`` every other row of those employees is
+    dropped too. Runs in the caller's transaction, holding the employees'
+    advisory locks from before the source rows are read until it ends.
+    """
+    session = session or db.session
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    lock_employees(user_ids, session=session)
+    first = week_start(first)
+    last = week_start(last) + timedelta(days=6)
+    daily = compute_daily_hours(user_ids, first, last, session=session)
+    weekly = defaultdict(lambda: [0, 0])
+    for (user_id, day), (scheduled, worked) in daily.items():
+        totals = weekly[(user_id, week_start(day))]
+        totals[0] += scheduled
+        totals[1] += worked
+
+    for model, column in ((DailyHours, DailyHours.day), (WeeklyHours, WeeklyHours.week_start)):
+        stale = delete(model).where(model.user_id.in_(user_ids))
+        if not clear_all:
+            stale = stale.where(column.between(first, last))
+        session.execute(stale)
+    if daily:
+        _upsert(DailyHours, 'day', [
+            {'user_id': user_id, 'day': day, 'scheduled_seconds': scheduled, 'worked_seconds': worked}
+            for (user_id, day), (scheduled, worked) in daily.items()
+        ], session)
+        _upsert(WeeklyHours, 'week_start', [
+            {'user_id': user_id, 'week_start': week, 'scheduled_seconds': scheduled, 'worked_seconds': worked}
+            for (user_id, week), (scheduled, worked) in weekly.items()
+        ], session)
+
+
+def refresh_rollups(spans, session=None):
+    """
+    Bring the rollups up to date after a write. ``spans`` maps user_id to
+    the (start, end) datetimes the write touched for that employee.
+    """
+    if not spans:
+        return
+    first = min(start for start, _ in spans.values()).date()
+    last = max(end for _, end in spans.values()).date()
+    rewrite_rollups(spans.keys(), first, last, session=session)
+
+
+def extend_span(spans, user_id, *times):
+    """Widen ``spans[user_id]`` to cover ``times`` (None values are ignored)."""
+    times = [value for value in times if value is not None]
+    if user_id is None or not times:
+        return
+    start, end = spans.get(user_id, (min(times), max(times)))
+    spans[user_id] = (min(start, *times), max(end, *times))
+
+
+def rebuild_rollups(user_ids=None, since=None, until=None, batch_size=500, progress=None):
+    """
+    Recompute the rollups from shifts and punches, ``batch_size`` employees
+    per transaction. Without ``since``/``until`` each employee's rows are
+    replaced entirely. Returns the number of employees processed.
+    """
+    if user_ids is None:
+        user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+    user_ids = list(user_ids)
+    done = 0
+    for offset in range(0, len(user_ids), batch_size):
+        batch = user_ids[offset:offset + batch_size]
+        first, last = since, until
+        if first is None or last is None:
+            bounds = db.session.execute(
+                select(func.min(Shift.start_time), func.max(Shift.end_time)).where(Shift.user_id.in_(batch))
+            ).one()
+            punch_bounds = db.session.execute(
+                select(func.min(ClockEvent.occurred_at), func.max(ClockEvent.occurred_at))
+                .where(ClockEvent.user_id.in_(batch))
+            ).one()
+            starts = [value for value in (bounds[0], punch_bounds[0]) if value is not None]
+            ends = [value for value in (bounds[1], punch_bounds[1]) if value is not None]
+            first = first or (min(starts) if starts else None)
+            last = last or (max(ends) if ends else None)
+        full = since is None and until is None
+        if first is None or last is None:
+            if full:
+                for model in (DailyHours, WeeklyHours):
+                    db.session.execute(delete(model).where(model.user_id.in_(batch)))
+        else:
+            rewrite_rollups(batch, first.date(), last.date(), clear_all=full)
+        db.session.commit()
+        done += len(batch)
+        if progress is not None:
+            progress(done, len(user_ids))
+    return done
+
+
+# --- Keeping the rollups current for ORM writes ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_rollup_changes(session, flush_context):
+    spans = session.info.setdefault('rollup_spans', {})
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Shift):
+            state = inspect(obj)
+            times = [obj.start_time, obj.end_time]
+            times += list(state.attrs.start_time.history.deleted) + list(state.attrs.end_time.history.deleted)
+            for user_id in [obj.user_id] + list(state.attrs.user_id.history.deleted):
+                extend_span(spans, user_id, *times)
+        elif isinstance(obj, ClockEvent):
+            state = inspect(obj)
+            # A punch can change which punches pair up on either side of it
+            times = [obj.occurred_at] + list(state.attrs.occurred_at.history.deleted)
+            times = [value + offset for value in times if value is not None for offset in (-MAX_PUNCH_GAP, MAX_PUNCH_GAP)]
+            for user_id in [obj.user_id] + list(state.attrs.user_id.history.deleted):
+                extend_span(spans, user_id, *times)
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_rollups_before_commit(session):
+    # The commit's own flush runs after this hook, so flush first to collect its changes
+    session.flush()
+    spans = session.info.pop('rollup_spans', None)
+    if spans:
+        refresh_rollups(spans, session=session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rollup_changes(session):
+    session.info.pop('rollup_spans', None)
@@ -0,0 +1,76 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from flask import current_app, request
+from .rota_solver import parse_open_shifts, propose_rota
+
+ns = Namespace('rota', description='Automatic rota generation')
+api.add_namespace(ns)
+
+open_shift_model = ns.model('OpenShift', {
+    'start_time': fields.DateTime(required=True, dt_format='iso8601', description='Shift start (UTC)'),
+    'end_time': fields.DateTime(required=True, dt_format='iso8601', description='Shift end (UTC)'),
+    'break_minutes': fields.Integer(description='Unpaid rest break the shift includes'),
+    'role': fields.String(description='Role name the employee must hold'),
+    'role_id': fields.String(description='Role id, instead of role'),
+    'team_id': fields.String(description='Team to staff it from; defaults to the request team_id'),
+})
+
+solve_request_model = ns.model('RotaSolveRequest', {
+    'team_id': fields.String(description='Default team for shifts without one'),
+    'shifts': fields.List(fields.Nested(open_shift_model), required=True),
+    'time_budget': fields.Float(description='Seconds to search for (capped by ROTA_SOLVER_MAX_BUDGET)'),
+    'seed': fields.Integer(description='Random seed, for reproducible proposals'),
+})
+
+assignment_model = ns.model('RotaAssignment', {
+    'index': fields.Integer(description='Position of the shift in the request'),
+    'user_id': fields.String,
+    'team_id': fields.String,
+    'role_id': fields.String,
+    'start_time': fields.DateTime(dt_format='iso8601'),
+    'end_time': fields.DateTime(dt_format='iso8601'),
+    'break_minutes': fields.Integer,
+})
+
+unfilled_model = ns.model('RotaUnfilled', {
+    'index': fields.Integer,
+    'reason': fields.String,
+})
+
+solve_stats_model = ns.model('RotaSolveStats', {
+    'shifts': fields.Integer,
+    'filled': fields.Integer,
+    'candidates': fields.Integer(description='Team members considered'),
+    'seed': fields.Integer(description='Seed of the winning restart'),
+    'iterations': fields.Integer(description='Local search moves tried by the winning restart'),
+    'elapsed_seconds': fields.Float,
+})
+
+proposal_model = ns.model('RotaProposal', {
+    'assignments': fields.List(fields.Nested(assignment_model)),
+    'unfilled': fields.List(fields.Nested(unfilled_model)),
+    'stats': fields.Nested(solve_stats_model),
+})
+
+
+@ns.route('/solve')
+class RotaSolve(Resource):
+    @ns.expect(solve_request_model)
+    @ns.marshal_with(proposal_model)
+    @ns.response(400, 'Invalid shifts')
+    def post(self):
+        """
+        Propose who should work a set of open shifts.
+        Nothing is saved; create the accepted shifts through /api/shifts/.
+        """
+        data = request.get_json() or {}
+        specs, errors = parse_open_shifts(data)
+        if errors:
+            ns.abort(400, 'Invalid shifts', errors=errors)
+        max_budget = current_app.config['ROTA_SOLVER_MAX_BUDGET']
+        try:
+            budget = min(float(data.get('time_budget') or current_app.config['ROTA_SOLVER_BUDGET']), max_budget)
+            seed = int(data.get('seed') or 0)
+        except (TypeError, ValueError):
+            ns.abort(400, 'time_budget and seed must be numbers')
+        return propose_rota(specs, time_budget=budget, workers=current_app.config['ROTA_SOLVER_WORKERS'], seed=seed)
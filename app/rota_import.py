@@ -0,0 +1,326 @@
+"""
+Streaming rota import.
+
+Rows are read one at a time from a CSV or JSON upload, validated against
+ROW_SCHEMA, and written in batches: each batch resolves its employee emails
+and role names with one query apiece, rejects rows that would double-book
+an employee (see overlaps.py), and inserts its shifts with a single
+executemany. Memory stays proportional to the batch size, not the file:
+a JSON array element or NDJSON line longer than MAX_RECORD_CHARS is
+rejected rather than buffered.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from jsonschema import Draft7Validator
+from sqlalchemy import insert, select
+
+from .availability import availability_index
+from .compliance_state import compliance_cache
+from .db import db
+from .human_ids import assign_human_ids
+from .models import Role, Shift, User
+from .overlaps import batch_overlaps
+from .rollups import extend_span, refresh_rollups
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+MAX_SHIFT_HOURS = 24
+MAX_RECORD_CHARS = 64 * 1024
+
+ROW_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'email': {'type': 'string', 'minLength': 3},
+        'role': {'type': ['string', 'null']},
+        'start': {'type': 'string', 'minLength': 10},
+        'end': {'type': 'string', 'minLength': 10},
+        'break_minutes': {'type': 'integer', 'minimum': 0},
+    },
+    'required': ['email', 'start', 'end'],
+}
+
+row_validator = Draft7Validator(ROW_SCHEMA)
+
+
+class RotaImportError(ValueError):
+    """Raised when the upload itself cannot be parsed any further."""
+
+
+class MalformedRecord:
+    """Stands in for an NDJSON line that could not be decoded, so it is reported as its own row."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def iter_csv_records(stream):
+    """Yield one dict per CSV row; blank cells are dropped."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        row = {k.strip(): v.strip() for k, v in record.items() if k and v and v.strip()}
+        if 'break_minutes' in row:
+            try:
+                row['break_minutes'] = int(row['break_minutes'])
+            except ValueError:
+                pass  # left as a string so validation reports it
+        yield row
+
+
+def iter_json_records(stream, chunk_size=64 * 1024, max_record_chars=MAX_RECORD_CHARS):
+    """
+    Yield the objects of a top-level JSON array, or of newline-delimited
+    JSON, reading ``chunk_size`` characters at a time.
+
+    NDJSON lines are independent, so a line that does not decode is
+    yielded as a MalformedRecord and reading carries on. A malformed array
+    cannot be resynchronised and raises RotaImportError.
+    """
+    decoder = json.JSONDecoder()
+    buf = stream.read(chunk_size)
+    eof = not buf
+    pos = _skip_whitespace(buf, 0)
+    while pos == len(buf) and not eof:
+        buf = stream.read(chunk_size)  # the previous chunk was all whitespace
+        eof = not buf
+        pos = _skip_whitespace(buf, 0)
+
+    if pos == len(buf):
+        return
+    if buf[pos] != '[':
+        yield from _iter_ndjson(buf[pos:], stream, chunk_size, max_record_chars)
+        return
+
+    pos += 1
+    while True:
+        pos = _skip_whitespace(buf, pos, ',')
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            # Only accept a value once something follows it, so a number
+            # split across two chunks is not read as two values.
+            obj, end = decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof:
+                raise ValueError
+        except ValueError:
+            if eof:
+                raise RotaImportError('Malformed JSON array')
+            if len(buf) - pos > max_record_chars:
+                raise RotaImportError(f'Malformed JSON array: element longer than {max_record_chars} characters')
+            more = stream.read(chunk_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield obj
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def _iter_ndjson(buf, stream, chunk_size=64 * 1024, max_record_chars=MAX_RECORD_CHARS):
+    skipping = False  # inside a line already reported as too long
+    while True:
+        lines = buf.split('\n')
+        buf = lines.pop()  # possibly incomplete; completed by the next chunk
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif line.strip():
+                yield _loads_ndjson_line(line)
+        if len(buf) > max_record_chars:
+            if not skipping:
+                yield MalformedRecord(f'Line longer than {max_record_chars} characters')
+            skipping, buf = True, ''
+        more = stream.read(chunk_size)
+        if not more:
+            break
+        buf += more
+    if buf.strip() and not skipping:
+        yield _loads_ndjson_line(buf)
+
+
+def _loads_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return MalformedRecord(f'Malformed JSON line: {exc}')
+
+
+def _skip_whitespace(buf, pos, extra=''):
+    while pos < len(buf) and (buf[pos].isspace() or buf[pos] in extra):
+        pos += 1
+    return pos
+
+
+def detect_format(filename=None, content_type=None):
+    name = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    return 'json'
+
+
+def iter_records(stream, fmt):
+    """Wrap a binary stream and yield raw records for ``fmt`` ('csv' or 'json')."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        return iter_csv_records(text)
+    return iter_json_records(text)
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetimes the models store."""
+    value = value.replace('Z', '+00:00')
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class RotaImporter:
+    """Validates and writes shift records in fixed-size batches."""
+
+    def __init__(self, team_id=None, batch_size=DEFAULT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+        self.team_id = team_id
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.touched_user_ids = set()
+        # email -> user id and role name -> role id; bounded by headcount
+        self._users = {}
+        self._roles = {}
+
+    def run(self, records):
+        batch = []
+        row_number = 0
+        try:
+            for row_number, record in enumerate(records, start=1):
+                batch.append((row_number, record))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+        except RotaImportError as exc:
+            self._error(row_number + 1, [str(exc)])
+        if batch:
+            self._flush(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def _error(self, row_number, messages):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'errors': messages})
+
+    def _flush(self, batch):
+        valid = []
+        for row_number, record in batch:
+            problems = self._validate(record)
+            if problems:
+                self._error(row_number, problems)
+            else:
+                valid.append((row_number, record))
+
+        self._resolve_users({record['email'] for _, record in valid})
+        self._resolve_roles({record['role'] for _, record in valid if record.get('role')})
+
+        rows, row_numbers = [], []
+        for row_number, record in valid:
+            user_id = self._users.get(record['email'])
+            role_name = record.get('role')
+            role_id = self._roles.get(role_name) if role_name else None
+            problems = []
+            if user_id is None:
+                problems.append(f"Unknown employee email '{record['email']}'")
+            if role_name and role_id is None:
+                problems.append(f"Unknown role '{role_name}'")
+            if problems:
+                self._error(row_number, problems)
+                continue
+            rows.append({
+                'user_id': user_id,
+                'team_id': self.team_id,
+                'role_id': role_id,
+                'start_time': record['start_time'],
+                'end_time': record['end_time'],
+                'break_minutes': record.get('break_minutes', 0),
+            })
+            row_numbers.append(row_number)
+
+        # Double bookings, against stored shifts and within the batch
+        clashes = batch_overlaps(rows)
+        if clashes:
+            for i in sorted(clashes):
+                self._error(row_numbers[i], [clashes[i]])
+            rows = [row for i, row in enumerate(rows) if i not in clashes]
+            row_numbers = [row_number for i, row_number in enumerate(row_numbers) if i not in clashes]
+
+        if not rows:
+            return
+        try:
+            assign_human_ids(Shift, rows)
+            db.session.execute(insert(Shift), rows)
+            spans = {}
+            for row in rows:
+                extend_span(spans, row['user_id'], row['start_time'], row['end_time'])
+            refresh_rollups(spans)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            for row_number in row_numbers:
+                self._error(row_number, [f'Database error: {exc.__class__.__name__}'])
+            return
+        self.imported += len(rows)
+        self.touched_user_ids.update(row['user_id'] for row in rows)
+
+    def _validate(self, record):
+        if isinstance(record, MalformedRecord):
+            return [record.message]
+        if not isinstance(record, dict):
+            return ['Row must be an object']
+        problems = [error.message for error in row_validator.iter_errors(record)]
+        if problems:
+            return problems
+        try:
+            record['start_time'] = parse_timestamp(record['start'])
+            record['end_time'] = parse_timestamp(record['end'])
+        except ValueError:
+            return ['start and end must be ISO 8601 timestamps']
+        length = record['end_time'] - record['start_time']
+        if length.total_seconds() <= 0:
+            return ['end must be after start']
+        if length.total_seconds() > MAX_SHIFT_HOURS * 3600:
+            return [f'Shift longer than {MAX_SHIFT_HOURS} hours']
+        return []
+
+    def _resolve_users(self, emails):
+        missing = [email for email in emails if email not in self._users]
+        if missing:
+            result = db.session.execute(select(User.email, User.id).where(User.email.in_(missing)))
+            self._users.update(result.all())
+
+    def _resolve_roles(self, names):
+        missing = [name for name in names if name not in self._roles]
+        if missing:
+            result = db.session.execute(select(Role.name, Role.id).where(Role.name.in_(missing)))
+            self._roles.update(result.all())
+
+
+def import_rota(stream, fmt, team_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Import a rota from a binary stream and return the import report."""
+    importer = RotaImporter(team_id=team_id, batch_size=batch_size)
+    report = importer.run(iter_records(stream, fmt))
+    compliance_cache.invalidate(importer.touched_user_ids)
+    availability_index.invalidate(user_ids=importer.touched_user_ids)
+    return report
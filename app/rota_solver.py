@@ -0,0 +1,535 @@
+"""
+Automatic rota generation: assign open shifts to team members.
+
+A RotaProblem is plain data (epoch seconds and indices), built from the
+database by ``build_problem`` and picklable, so restarts can run in worker
+processes. For each open shift the candidates are the members of its team
+who hold its role. A candidate can take a shift only if:
+
+* they have not marked themselves unavailable at any point of it;
+* it neither overlaps nor comes within the 11-hour daily rest of any shift
+  they already work, in any team, or have been given in this rota;
+* their net hours in its ISO week stay within that week's allowance: 48
+  hours, less whatever would push the 17-week average over 48 given the
+  hours already rostered (from the hours_weekly rollups);
+* no stretch of work without a 24-hour break would span more than six
+  days, so every 7-day window keeps an uninterrupted 24-hour rest.
+
+The search builds a rota greedily (most constrained shifts first, each to
+the least loaded feasible candidate, favouring those who declared
+themselves available), then improves it by local search until the time
+budget runs out or it stops improving. Local search fills open shifts,
+by moving one conflicting shift to someone else if it has to, and
+rebalances hours between candidates. The objective is unfilled shifts
+first, then the sum of squared hours per employee, which spreads the work.
+
+Restarts with different seeds run in parallel in a process pool and the
+best rota wins. The pool lives for one solve, so ``flask solve-rota`` uses
+one by default while POST /api/rota/solve searches in the request (see
+ROTA_SOLVER_WORKERS) rather than spawning interpreters per request.
+Finally, ``enforce_compliance`` runs the full Working Time Regulations
+check over each employee's real shifts plus the proposal and drops any
+assignment that would add a violation, so a proposal never breaks the
+regulations even where the fast checks above are approximate.
+"""
+import bisect
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, time as clock_time, timedelta
+
+from sqlalchemy import select
+
+from .availability import EPOCH, to_epoch
+from .compliance import (
+    DAILY_REST_HOURS, HOUR, MAX_AVERAGE_WEEKLY_HOURS, REFERENCE_WEEKS, WEEK, WEEKLY_REST_HOURS,
+    ShiftColumns, check_compliance, week_floor,
+)
+from .compliance_state import violation_key
+from .db import db
+from .models import Availability, Role, Shift, Team, TeamMembership, UserRole, WeeklyHours
+from .rollups import week_start
+from .rota_import import parse_timestamp
+
+REST = DAILY_REST_HOURS * HOUR
+WEEKLY_REST = WEEKLY_REST_HOURS * HOUR
+WEEKLY_CAP = MAX_AVERAGE_WEEKLY_HOURS * HOUR
+# Objective weights, in squared hours
+UNFILLED_COST = 1e9
+PREFERRED_BONUS = 25.0
+
+NO_MEMBERS = 'the team has no members'
+NO_CANDIDATES = 'nobody in the team holds the role'
+NO_FEASIBLE_CANDIDATE = 'no candidate is available without breaking rest or hours limits'
+COMPLIANCE = 'every candidate would breach the Working Time Regulations'
+
+
+@dataclass
+class OpenShift:
+    start: int  # epoch seconds
+    end: int
+    break_minutes: int = 0
+    role_id: object = None
+    team_id: object = None
+
+    @property
+    def net(self):
+        return max(self.end - self.start - self.break_minutes * 60, 0)
+
+
+@dataclass
+class RotaProblem:
+    shifts: list       # OpenShift
+    employees: list    # user ids
+    candidates: list   # per shift, employee indices
+    busy: list         # per employee, (start, end) of shifts already rostered
+    unavailable: list  # per employee, (start, end) periods they cannot work
+    preferred: list    # per shift, set of employee indices who declared themselves available
+    week_caps: list    # per employee, {week start: net seconds allowed}; WEEKLY_CAP if absent
+
+
+@dataclass
+class Solution:
+    owner: list        # per shift, employee index or -1
+    objective: float
+    seed: int
+    iterations: int
+
+
+class Roster:
+    """A partial assignment with the incremental checks the search needs."""
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.owner = [-1] * len(problem.shifts)
+        # Per employee, sorted (start, end, shift index or -1 for a rostered shift)
+        self.timeline = [sorted((start, end, -1) for start, end in busy) for busy in problem.busy]
+        self.week_used = [defaultdict(int) for _ in problem.employees]
+        self.load = [0] * len(problem.employees)
+        lengths = [end - start for busy in problem.busy for start, end in busy]
+        lengths += [shift.end - shift.start for shift in problem.shifts]
+        self.max_length = max(lengths, default=0)
+
+    # --- Checks ---
+
+    def clashes(self, e, i):
+        """
+        Shift indices in ``e``'s rota that ``i`` overlaps or comes within
+        daily rest of, or None if it clashes with something that cannot
+        move (a rostered shift or unavailability).
+        """
+        shift = self.problem.shifts[i]
+        for start, end in self.problem.unavailable[e]:
+            if start < shift.end and end > shift.start:
+                return None
+        timeline = self.timeline[e]
+        lo = bisect.bisect_left(timeline, (shift.start - REST - self.max_length,))
+        hi = bisect.bisect_left(timeline, (shift.end + REST,))
+        found = []
+        for start, end, j in timeline[lo:hi]:
+            if j != i and start < shift.end + REST and end > shift.start - REST:
+                if j < 0:
+                    return None
+                found.append(j)
+        return found
+
+    def fits(self, e, i):
+        if self.clashes(e, i) != []:
+            return False
+        shift = self.problem.shifts[i]
+        week = week_floor(shift.start)
+        if self.week_used[e][week] + shift.net > self.problem.week_caps[e].get(week, WEEKLY_CAP):
+            return False
+        return self._keeps_weekly_rest(e, shift)
+
+    def _keeps_weekly_rest(self, e, shift):
+        """
+        Every 7-day window keeps a 24-hour rest exactly when no stretch of
+        work without one spans more than six days; measure the stretch
+        ``shift`` would join.
+        """
+        timeline = self.timeline[e]
+        k = bisect.bisect_left(timeline, (shift.start,))
+        first, last = shift.start, shift.end
+        for start, end, _ in reversed(timeline[:k]):
+            if end + WEEKLY_REST <= first:
+                break
+            first = min(first, start)
+        for start, end, _ in timeline[k:]:
+            if start >= last + WEEKLY_REST:
+                break
+            last = max(last, end)
+        return last - first <= WEEK - WEEKLY_REST
+
+    # --- Moves ---
+
+    def assign(self, e, i):
+        shift = self.problem.shifts[i]
+        bisect.insort(self.timeline[e], (shift.start, shift.end, i))
+        self.owner[i] = e
+        self.week_used[e][week_floor(shift.start)] += shift.net
+        self.load[e] += shift.net
+
+    def unassign(self, i):
+        e = self.owner[i]
+        shift = self.problem.shifts[i]
+        self.timeline[e].remove((shift.start, shift.end, i))
+        self.owner[i] = -1
+        self.week_used[e][week_floor(shift.start)] -= shift.net
+        self.load[e] -= shift.net
+        return e
+
+    def objective(self):
+        unfilled = self.owner.count(-1)
+        spread = sum((load / HOUR) ** 2 for load in self.load)
+        preferred = sum(1 for i, e in enumerate(self.owner) if e >= 0 and e in self.problem.preferred[i])
+        return UNFILLED_COST * unfilled + spread - PREFERRED_BONUS * preferred
+
+    def _move_gain(self, i, e, f):
+        """Objective decrease from moving shift ``i`` from ``e`` to ``f``."""
+        net = self.problem.shifts[i].net
+        le, lf = self.load[e], self.load[f]
+        spread = ((le ** 2 + lf ** 2) - ((le - net) ** 2 + (lf + net) ** 2)) / HOUR ** 2
+        preferred = self.problem.preferred[i]
+        return spread + PREFERRED_BONUS * ((f in preferred) - (e in preferred))
+
+
+def construct(roster, rng):
+    """Greedy pass: most constrained shifts first, each to the least loaded candidate."""
+    problem = roster.problem
+    order = sorted(
+        range(len(problem.shifts)),
+        key=lambda i: (len(problem.candidates[i]), problem.shifts[i].start, rng.random()),
+    )
+    for i in order:
+        preferred = problem.preferred[i]
+        best, best_key = -1, None
+        for e in problem.candidates[i]:
+            key = roster.load[e] - (PREFERRED_BONUS * HOUR if e in preferred else 0) + rng.random() * HOUR
+            if (best_key is None or key < best_key) and roster.fits(e, i):
+                best, best_key = e, key
+        if best >= 0:
+            roster.assign(best, i)
+
+
+def try_fill(roster, i, rng):
+    """Fill open shift ``i``, moving at most one clashing shift to another candidate."""
+    candidates = list(roster.problem.candidates[i])
+    rng.shuffle(candidates)
+    for e in candidates:
+        if roster.fits(e, i):
+            roster.assign(e, i)
+            return True
+    for e in candidates:
+        clashes = roster.clashes(e, i)
+        if not clashes or len(clashes) > 1:
+            continue
+        j = clashes[0]
+        roster.unassign(j)
+        if roster.fits(e, i):
+            roster.assign(e, i)
+            others = [f for f in roster.problem.candidates[j] if f != e]
+            rng.shuffle(others)
+            for f in others:
+                if roster.fits(f, j):
+                    roster.assign(f, j)
+                    return True
+            roster.unassign(i)
+        roster.assign(e, j)
+    return False
+
+
+def try_rebalance(roster, i, rng, tries=4):
+    """Move assigned shift ``i`` to a candidate for whom it improves the objective."""
+    e = roster.owner[i]
+    candidates = roster.problem.candidates[i]
+    for f in rng.sample(candidates, min(tries, len(candidates))):
+        if f != e and roster._move_gain(i, e, f) > 0 and roster.fits(f, i):
+            roster.unassign(i)
+            roster.assign(f, i)
+            return True
+    return False
+
+
+def solve_once(problem, seed, time_budget):
+    """One greedy construction plus local search; returns a Solution."""
+    deadline = time.monotonic() + time_budget
+    rng = random.Random(seed)
+    roster = Roster(problem)
+    construct(roster, rng)
+    n = len(problem.shifts)
+    open_shifts = [i for i, e in enumerate(roster.owner) if e < 0 and problem.candidates[i]]
+    iterations = stale = 0
+    # Stop once several sweeps' worth of moves in a row have found nothing
+    while n and stale < 4 * n:
+        if iterations % 256 == 0 and time.monotonic() >= deadline:
+            break
+        iterations += 1
+        if open_shifts and rng.random() < 0.5:
+            i = rng.choice(open_shifts)
+            improved = try_fill(roster, i, rng)
+            if improved:
+                open_shifts.remove(i)
+        else:
+            i = rng.randrange(n)
+            improved = roster.owner[i] >= 0 and try_rebalance(roster, i, rng)
+        stale = 0 if improved else stale + 1
+    return Solution(owner=roster.owner, objective=roster.objective(), seed=seed, iterations=iterations)
+
+
+def solve(problem, time_budget=10.0, workers=None, restarts=None, seed=0):
+    """
+    Best of ``restarts`` independent searches, run ``workers`` at a time in
+    a process pool (``workers=0`` runs them one after another in-process).
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    restarts = max(workers, 1) if restarts is None else restarts
+    seeds = [seed + k for k in range(restarts)]
+    if workers <= 1 or restarts == 1:
+        budget = time_budget / restarts
+        solutions = [solve_once(problem, s, budget) for s in seeds]
+    else:
+        # Leave headroom for starting the workers and shipping the problem
+        budget = time_budget * 0.8 * min(workers, restarts) / restarts
+        with ProcessPoolExecutor(max_workers=min(workers, restarts),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            solutions = list(pool.map(solve_once, [problem] * restarts, seeds, [budget] * restarts))
+    return min(solutions, key=lambda solution: (solution.objective, solution.seed))
+
+
+def unfilled_reason(problem, i):
+    if problem.candidates[i]:
+        return NO_FEASIBLE_CANDIDATE
+    return NO_CANDIDATES if problem.shifts[i].role_id is not None else NO_MEMBERS
+
+
+# --- Database side ---
+
+def build_problem(specs):
+    """
+    Build a RotaProblem from open shift specs: dicts with start_time and
+    end_time (naive UTC datetimes), team_id, and optional role_id and
+    break_minutes.
+    """
+    team_ids = {spec['team_id'] for spec in specs}
+    memberships = db.session.execute(
+        select(TeamMembership.team_id, TeamMembership.user_id)
+        .where(TeamMembership.team_id.in_(team_ids))
+        .order_by(TeamMembership.user_id)
+    ).all()
+    employees = sorted({user_id for _, user_id in memberships})
+    position = {user_id: e for e, user_id in enumerate(employees)}
+    members = defaultdict(set)
+    for team_id, user_id in memberships:
+        members[team_id].add(position[user_id])
+    holders = defaultdict(set)
+    for user_id, role_id in db.session.execute(
+        select(UserRole.user_id, UserRole.role_id).where(UserRole.user_id.in_(employees))
+    ):
+        holders[role_id].add(position[user_id])
+
+    shifts = [
+        OpenShift(to_epoch(spec['start_time']), to_epoch(spec['end_time']), spec.get('break_minutes') or 0,
+                  spec.get('role_id'), spec['team_id'])
+        for spec in specs
+    ]
+    lo = min(spec['start_time'] for spec in specs) - timedelta(days=8)
+    hi = max(spec['end_time'] for spec in specs) + timedelta(days=8)
+    busy = [[] for _ in employees]
+    for user_id, start, end in db.session.execute(
+        select(Shift.user_id, Shift.start_time, Shift.end_time)
+        .where(Shift.user_id.in_(employees), Shift.end_time > lo, Shift.start_time < hi)
+    ):
+        busy[position[user_id]].append((to_epoch(start), to_epoch(end)))
+    unavailable = [[] for _ in employees]
+    windows = [[] for _ in employees]
+    for user_id, start, end, available in db.session.execute(
+        select(Availability.user_id, Availability.start_time, Availability.end_time, Availability.available)
+        .where(Availability.user_id.in_(employees), Availability.end_time > lo, Availability.start_time < hi)
+    ):
+        (windows if available else unavailable)[position[user_id]].append((to_epoch(start), to_epoch(end)))
+
+    candidates, preferred = [], []
+    for shift in shifts:
+        eligible = members[shift.team_id]
+        if shift.role_id is not None:
+            eligible = eligible & holders[shift.role_id]
+        candidates.append(sorted(eligible))
+        preferred.append({
+            e for e in eligible
+            if any(start <= shift.start and end >= shift.end for start, end in windows[e])
+        })
+
+    # Weekly allowance: 48h, less what would lift the 17-week average over 48
+    first_week = week_start(lo.date()) - timedelta(weeks=REFERENCE_WEEKS - 1)
+    history = defaultdict(dict)
+    for user_id, week, seconds in db.session.execute(
+        select(WeeklyHours.user_id, WeeklyHours.week_start, WeeklyHours.scheduled_seconds)
+        .where(WeeklyHours.user_id.in_(employees), WeeklyHours.week_start.between(first_week, hi.date()))
+    ):
+        history[position[user_id]][to_epoch(datetime.combine(week, clock_time.min))] = seconds
+    week_caps = []
+    for e in range(len(employees)):
+        caps = {}
+        for week in {week_floor(shift.start) for shift in shifts}:
+            window = sum(history[e].get(week - k * WEEK, 0) for k in range(REFERENCE_WEEKS))
+            caps[week] = max(min(WEEKLY_CAP - history[e].get(week, 0), REFERENCE_WEEKS * WEEKLY_CAP - window), 0)
+        week_caps.append(caps)
+
+    return RotaProblem(shifts, employees, candidates, busy, unavailable, preferred, week_caps)
+
+
+def enforce_compliance(problem, owner):
+    """
+    Drop assignments that would add Working Time Regulations violations
+    to an employee's real shifts. Returns the indices of dropped shifts;
+    ``owner`` is updated in place.
+    """
+    assigned = defaultdict(list)
+    for i, e in enumerate(owner):
+        if e >= 0:
+            assigned[e].append(i)
+    if not assigned:
+        return []
+    starts = [problem.shifts[i].start for i in range(len(owner)) if owner[i] >= 0]
+    ends = [problem.shifts[i].end for i in range(len(owner)) if owner[i] >= 0]
+    lo = min(starts) - REFERENCE_WEEKS * WEEK
+    hi = max(ends) + 2 * WEEK
+    user_ids = [problem.employees[e] for e in assigned]
+    position = {problem.employees[e]: e for e in assigned}
+    existing = [
+        (user_id, to_epoch(start), to_epoch(end), break_minutes)
+        for user_id, start, end, break_minutes in db.session.execute(
+            select(Shift.user_id, Shift.start_time, Shift.end_time, Shift.break_minutes).where(
+                Shift.user_id.in_(user_ids),
+                Shift.end_time > EPOCH + timedelta(seconds=lo),
+                Shift.start_time < EPOCH + timedelta(seconds=hi),
+            )
+        )
+    ]
+    baseline = {
+        user_id: {violation_key(v) for v in violations}
+        for user_id, violations in check_compliance(ShiftColumns.from_rows(existing)).items()
+    }
+
+    dropped = []
+    while True:
+        proposed = [
+            (problem.employees[e], shift.start, shift.end, shift.break_minutes)
+            for e, indices in assigned.items() for shift in (problem.shifts[i] for i in indices)
+        ]
+        found = check_compliance(ShiftColumns.from_rows(existing + proposed))
+        removed = False
+        for user_id, violations in found.items():
+            e = position[user_id]
+            for violation in violations:
+                if violation_key(violation) in baseline.get(user_id, ()):
+                    continue
+                lo_v, hi_v = to_epoch(violation.start), to_epoch(violation.end)
+                culprits = [i for i in assigned[e] if problem.shifts[i].start <= hi_v and problem.shifts[i].end >= lo_v]
+                if culprits:
+                    # Drop the latest proposed shift in the offending period and check again
+                    i = max(culprits, key=lambda i: problem.shifts[i].start)
+                    assigned[e].remove(i)
+                    owner[i] = -1
+                    dropped.append(i)
+                    removed = True
+                    break
+        if not removed:
+            return dropped
+
+
+def propose_rota(specs, time_budget=10.0, workers=None, seed=0):
+    """Solve for ``specs`` (see build_problem) and return the proposal as plain data."""
+    started = time.monotonic()
+    problem = build_problem(specs)
+    solution = solve(problem, time_budget, workers=workers, seed=seed)
+    dropped = set(enforce_compliance(problem, solution.owner))
+    assignments, unfilled = [], []
+    for i, spec in enumerate(specs):
+        e = solution.owner[i]
+        if e < 0:
+            reason = COMPLIANCE if i in dropped else unfilled_reason(problem, i)
+            unfilled.append({'index': i, 'reason': reason})
+            continue
+        assignments.append({
+            'index': i,
+            'user_id': problem.employees[e],
+            'team_id': spec['team_id'],
+            'role_id': spec.get('role_id'),
+            'start_time': spec['start_time'],
+            'end_time': spec['end_time'],
+            'break_minutes': spec.get('break_minutes') or 0,
+        })
+    return {
+        'assignments': assignments,
+        'unfilled': unfilled,
+        'stats': {
+            'shifts': len(specs),
+            'filled': len(assignments),
+            'candidates': len(problem.employees),
+            'seed': solution.seed,
+            'iterations': solution.iterations,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+        },
+    }
+
+
+def parse_open_shifts(payload):
+    """
+    Validate a request body ``{"team_id": ..., "shifts": [...]}`` into
+    build_problem specs. Each shift has start_time, end_time, optional
+    break_minutes, a role (name) or role_id, and a team_id unless the body
+    gives a default. Returns (specs, errors); errors list {index, errors}.
+    """
+    default_team = payload.get('team_id')
+    raw = payload.get('shifts')
+    if not isinstance(raw, list) or not raw:
+        return [], [{'index': None, 'errors': ['shifts must be a non-empty list']}]
+    role_names = {item.get('role') for item in raw if isinstance(item, dict) and item.get('role')}
+    roles = dict(db.session.execute(select(Role.name, Role.id).where(Role.name.in_(role_names))).all())
+    specs, errors, team_ids = [], [], set()
+    for index, item in enumerate(raw):
+        problems = []
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': ['Shift must be an object']})
+            specs.append({})
+            continue
+        spec = {'break_minutes': item.get('break_minutes') or 0}
+        try:
+            spec['start_time'] = parse_timestamp(item['start_time'])
+            spec['end_time'] = parse_timestamp(item['end_time'])
+            if spec['end_time'] <= spec['start_time']:
+                problems.append('end_time must be after start_time')
+        except (KeyError, TypeError, ValueError):
+            problems.append('start_time and end_time must be ISO 8601 timestamps')
+        try:
+            spec['team_id'] = uuid.UUID(str(item.get('team_id') or default_team))
+            team_ids.add(spec['team_id'])
+        except ValueError:
+            problems.append('team_id must be a UUID, on the shift or the request')
+        if item.get('role_id'):
+            try:
+                spec['role_id'] = uuid.UUID(str(item['role_id']))
+            except ValueError:
+                problems.append('role_id must be a UUID')
+        elif item.get('role'):
+            spec['role_id'] = roles.get(item['role'])
+            if spec['role_id'] is None:
+                problems.append(f"Unknown role '{item['role']}'")
+        if not isinstance(spec['break_minutes'], int) or spec['break_minutes'] < 0:
+            problems.append('break_minutes must be a non-negative integer')
+        if problems:
+            errors.append({'index': index, 'errors': problems})
+        specs.append(spec)
+    known = set(db.session.execute(select(Team.id).where(Team.id.in_(team_ids))).scalars()) if team_ids else set()
+    for index, spec in enumerate(specs):
+        if spec.get('team_id') in team_ids - known:
+            errors.append({'index': index, 'errors': [f"Unknown team '{spec['team_id']}'"]})
+    errors.sort(key=lambda error: error['index'])
+    return specs, errors
@@ -0,0 +1,271 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from flask import request
+from werkzeug.datastructures import FileStorage
+from .models import Team, Shift, User, Role
+from . import db
+from .rota_import import import_rota, detect_format, parse_timestamp, MAX_SHIFT_HOURS
+from .compliance_api import violation_model
+from .compliance_state import compliance_cache
+from .overlaps import is_exclusion_violation, load_overlaps, overlapping_shift
+from .pagination import paginate, document_pagination
+from .serialization import serialize_list_with
+from sqlalchemy.exc import IntegrityError
+import uuid
+
+ns = Namespace('shifts', description='Shift management operations')
+api.add_namespace(ns)
+ns.add_model(violation_model.name, violation_model)
+
+shift_model = ns.model('Shift', {
+    'id': fields.String(readonly=True, description='The shift unique identifier'),
+    'human_id': fields.Integer(readonly=True, description='The shift human-readable unique identifier'),
+    'user_id': fields.String(required=True, description='Employee working the shift'),
+    'team_id': fields.String(description='Team the shift belongs to'),
+    'role_id': fields.String(description='Role worked on the shift'),
+    'start_time': fields.DateTime(required=True, dt_format='iso8601', description='Shift start (UTC)'),
+    'end_time': fields.DateTime(required=True, dt_format='iso8601', description='Shift end (UTC)'),
+    'break_minutes': fields.Integer(description='Unpaid rest break taken during the shift'),
+})
+
+compliance_change_model = ns.model('ComplianceChange', {
+    'new_violations': fields.List(fields.Nested(violation_model), description='Violations caused by this change'),
+    'resolved_violations': fields.List(fields.Nested(violation_model), description='Violations this change cleared'),
+})
+
+shift_change_model = ns.inherit('ShiftChange', shift_model, {
+    'compliance': fields.Nested(compliance_change_model),
+})
+
+shift_list_parser = ns.parser()
+shift_list_parser.add_argument('user_id', type=uuid.UUID, location='args')
+shift_list_parser.add_argument('team_id', type=uuid.UUID, location='args')
+shift_list_parser.add_argument('start', type=parse_timestamp, location='args', help='Shifts ending after this time')
+shift_list_parser.add_argument('end', type=parse_timestamp, location='args', help='Shifts starting before this time')
+
+overlap_parser = ns.parser()
+overlap_parser.add_argument('user_id', type=uuid.UUID, location='args')
+overlap_parser.add_argument('team_id', type=uuid.UUID, location='args', help="Members' shifts in every team")
+overlap_parser.add_argument('start', type=parse_timestamp, location='args', required=True, help='Range start (ISO 8601)')
+overlap_parser.add_argument('end', type=parse_timestamp, location='args', required=True, help='Range end (ISO 8601)')
+
+overlap_model = ns.model('ShiftOverlap', {
+    'user_id': fields.String(description='Employee booked twice'),
+    'first': fields.String(description='Shift that starts first'),
+    'second': fields.String(description='Shift that overlaps it'),
+    'start': fields.DateTime(dt_format='iso8601', description='Start of the double-booked period'),
+    'end': fields.DateTime(dt_format='iso8601', description='End of the double-booked period'),
+})
+
+import_parser = ns.parser()
+import_parser.add_argument('file', location='files', type=FileStorage, help='CSV or JSON rota file (or send the file as the raw request body)')
+import_parser.add_argument('team_id', location='args', help='Team the imported shifts belong to')
+import_parser.add_argument('format', location='args', choices=('csv', 'json'), help='Defaults to the file extension or Content-Type')
+
+import_row_error_model = ns.model('ImportRowError', {
+    'row': fields.Integer(description='1-based row number in the upload'),
+    'errors': fields.List(fields.String, description='Why the row was rejected'),
+})
+
+import_report_model = ns.model('ImportReport', {
+    'imported': fields.Integer(description='Number of shifts written'),
+    'failed': fields.Integer(description='Number of rows rejected'),
+    'errors': fields.List(fields.Nested(import_row_error_model)),
+    'errors_truncated': fields.Boolean(description='True when more rows failed than are listed'),
+})
+
+
+def parse_team_id(team_id):
+    if not team_id:
+        return None
+    try:
+        team_uuid = uuid.UUID(team_id)
+    except ValueError:
+        ns.abort(400, f"Invalid team_id format: '{team_id}' is not a valid UUID.")
+    if db.session.get(Team, team_uuid) is None:
+        ns.abort(404, f"Team with id {team_id} not found")
+    return team_uuid
+
+
+@ns.route('/import')
+class ShiftImport(Resource):
+    @ns.expect(import_parser)
+    @ns.marshal_with(import_report_model)
+    def post(self):
+        """Import a rota from a CSV or JSON file, row by row"""
+        team_id = parse_team_id(request.args.get('team_id'))
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        if upload is not None:
+            stream = upload.stream
+            fmt = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+        else:
+            stream = request.stream
+            fmt = request.args.get('format') or detect_format(content_type=request.mimetype)
+        return import_rota(stream, fmt, team_id=team_id)
+
+
+def parse_uuid(value, name):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        ns.abort(400, f"Invalid {name} format: '{value}' is not a valid UUID.")
+
+
+def get_shift_or_404(id):
+    shift = db.session.get(Shift, parse_uuid(id, 'id'))
+    if shift is None:
+        ns.abort(404, f"Shift with id {id} not found")
+    return shift
+
+
+def apply_shift_payload(shift, data):
+    """Copy and validate the writable fields of ``data`` onto ``shift``."""
+    try:
+        if 'start_time' in data:
+            shift.start_time = parse_timestamp(data['start_time'])
+        if 'end_time' in data:
+            shift.end_time = parse_timestamp(data['end_time'])
+    except (TypeError, ValueError):
+        ns.abort(400, 'start_time and end_time must be ISO 8601 timestamps')
+    if 'user_id' in data:
+        shift.user_id = parse_uuid(data['user_id'], 'user_id')
+        if db.session.get(User, shift.user_id) is None:
+            ns.abort(404, f"User with id {data['user_id']} not found")
+    if 'team_id' in data:
+        shift.team_id = parse_uuid(data['team_id'], 'team_id') if data['team_id'] else None
+        if shift.team_id and db.session.get(Team, shift.team_id) is None:
+            ns.abort(404, f"Team with id {data['team_id']} not found")
+    if 'role_id' in data:
+        shift.role_id = parse_uuid(data['role_id'], 'role_id') if data['role_id'] else None
+        if shift.role_id and db.session.get(Role, shift.role_id) is None:
+            ns.abort(404, f"Role with id {data['role_id']} not found")
+    if 'break_minutes' in data:
+        if not isinstance(data['break_minutes'], int) or data['break_minutes'] < 0:
+            ns.abort(400, 'break_minutes must be a non-negative integer')
+        shift.break_minutes = data['break_minutes']
+    if shift.user_id is None or shift.start_time is None or shift.end_time is None:
+        ns.abort(400, 'user_id, start_time and end_time are required')
+    length = (shift.end_time - shift.start_time).total_seconds()
+    if length <= 0:
+        ns.abort(400, 'end_time must be after start_time')
+    if length > MAX_SHIFT_HOURS * 3600:
+        ns.abort(400, f'Shifts cannot be longer than {MAX_SHIFT_HOURS} hours')
+    clash = overlapping_shift(shift.user_id, shift.start_time, shift.end_time, exclude_id=shift.id)
+    if clash is not None:
+        ns.abort(409, f'The employee is already booked on shift {clash.human_id} '
+                      f'({clash.start_time.isoformat()} to {clash.end_time.isoformat()})')
+
+
+def commit_shift():
+    """Commit, turning a rejection by the no-overlap exclusion constraint into a 409."""
+    try:
+        db.session.commit()
+    except IntegrityError as exc:
+        db.session.rollback()
+        if is_exclusion_violation(exc):
+            ns.abort(409, 'The employee is already booked on an overlapping shift')
+        raise
+
+
+def compliance_change(*changes):
+    """Merge (new, resolved) pairs from ComplianceState updates into one payload."""
+    new, resolved = [], []
+    for added, cleared in changes:
+        new.extend(added)
+        resolved.extend(cleared)
+    return {'new_violations': new, 'resolved_violations': resolved}
+
+
+@ns.route('/')
+class ShiftList(Resource):
+    @ns.expect(shift_list_parser)
+    @document_pagination(ns)
+    @serialize_list_with(ns, shift_model)
+    def get(self):
+        """List shifts, or one page of them with limit or cursor"""
+        args = shift_list_parser.parse_args()
+        query = db.session.query(
+            Shift.id, Shift.human_id, Shift.user_id, Shift.team_id, Shift.role_id,
+            Shift.start_time, Shift.end_time, Shift.break_minutes,
+        )
+        if args['user_id']:
+            query = query.filter(Shift.user_id == args['user_id'])
+        if args['team_id']:
+            query = query.filter(Shift.team_id == args['team_id'])
+        if args['start']:
+            query = query.filter(Shift.end_time > args['start'])
+        if args['end']:
+            query = query.filter(Shift.start_time < args['end'])
+        shifts, headers = paginate(query, Shift.start_time, Shift.id, default_limit=None)
+        return shifts, 200, headers
+
+    @ns.expect(shift_model)
+    @ns.marshal_with(shift_change_model, code=201)
+    def post(self):
+        """Create a shift and report how it changes the employee's compliance"""
+        data = request.get_json() or {}
+        shift = Shift(break_minutes=0)
+        apply_shift_payload(shift, data)
+        # Load the cached state before the write so the change can be diffed
+        state = compliance_cache.get(shift.user_id)
+        db.session.add(shift)
+        commit_shift()
+        shift.compliance = compliance_change(
+            state.insert(shift.id, shift.start_time, shift.end_time, shift.break_minutes)
+        )
+        return shift, 201
+
+
+@ns.route('/overlaps')
+class ShiftOverlaps(Resource):
+    @ns.expect(overlap_parser)
+    @serialize_list_with(ns, overlap_model)
+    def get(self):
+        """Find employees booked on overlapping shifts within a date range"""
+        args = overlap_parser.parse_args()
+        if args['end'] <= args['start']:
+            ns.abort(400, 'end must be after start')
+        return load_overlaps(
+            args['start'], args['end'], team_id=args['team_id'],
+            user_ids=[args['user_id']] if args['user_id'] else None,
+        )
+
+
+@ns.route('/<string:id>')
+@ns.response(404, 'Shift not found')
+@ns.param('id', 'The shift identifier')
+class ShiftResource(Resource):
+    @ns.marshal_with(shift_model)
+    def get(self, id):
+        """Fetch a shift by ID"""
+        return get_shift_or_404(id)
+
+    @ns.expect(shift_model)
+    @ns.marshal_with(shift_change_model)
+    def put(self, id):
+        """Update a shift and report how it changes compliance"""
+        shift = get_shift_or_404(id)
+        old_state = compliance_cache.get(shift.user_id)
+        # Keep the edit out of the database until the states are loaded
+        with db.session.no_autoflush:
+            apply_shift_payload(shift, request.get_json() or {})
+            new_state = compliance_cache.get(shift.user_id)
+        commit_shift()
+        if new_state is old_state:
+            changes = [old_state.update(shift.id, shift.start_time, shift.end_time, shift.break_minutes)]
+        else:
+            changes = [
+                old_state.delete(shift.id),
+                new_state.insert(shift.id, shift.start_time, shift.end_time, shift.break_minutes),
+            ]
+        shift.compliance = compliance_change(*changes)
+        return shift
+
+    @ns.marshal_with(compliance_change_model)
+    def delete(self, id):
+        """Delete a shift and report how it changes compliance"""
+        shift = get_shift_or_404(id)
+        state = compliance_cache.get(shift.user_id)
+        db.session.delete(shift)
+        db.session.commit()
+        return compliance_change(state.delete(shift.id))
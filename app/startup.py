@@ -0,0 +1,120 @@
+"""
+Process start-up for production serving: building and warming the app
+before it takes traffic, and resetting per-process state after a fork.
+
+With ``preload_app`` (see gunicorn.conf.py) the master imports wsgi.py,
+which calls ``build_app``, and then forks the workers, so everything done
+here is paid once rather than by the first requests of every worker:
+
+* the app is created, which imports every API module and compiles the
+  list serializers;
+* the SQLAlchemy mappers are configured, which otherwise happens on the
+  first query;
+* the flask-restx swagger schema is built (it is cached on the Api) and a
+  few read-only requests run through the whole stack: routing, request
+  hooks, the ORM's statement caches and the JSON encoder. A database that
+  cannot be reached is logged, not fatal;
+* the pool is disposed, so no connection opened in the master is shared
+  with the workers.
+
+``after_fork`` runs in each worker. The pool it inherits is dropped without
+closing the master's sockets, the response cache gets a backend of its own
+(a fresh LRU, or a new Redis client rather than the master's sockets), and
+metrics copied from the master are cleared. Singletons that hold threads,
+process pools or id blocks (hashing, clock ingest, human_ids) already
+notice the pid change themselves.
+
+``startup_timings`` keeps the seconds each phase took for this process;
+the ready log line, ``GET /api/system/startup`` and
+``benchmarks/cold_start.py`` report them so start-up regressions show up.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.orm import configure_mappers
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+# Read-only requests run once in the master; ?limit=1 keeps them cheap on a full database
+WARM_REQUESTS = ('/api/swagger.json', '/api/roles/', '/api/teams/?limit=1', '/api/shifts/?limit=1')
+
+startup_timings = {'pid': os.getpid(), 'preloaded_by': None, 'phases': {}, 'total': 0.0}
+
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings['phases'][name] = time.perf_counter() - started
+
+
+def build_app(started=None):
+    """
+    Create and warm the app, recording each phase. ``started`` is the
+    ``perf_counter`` reading taken before the app package was imported, so
+    the import time is counted too.
+    """
+    from . import create_app
+
+    if started is not None:
+        startup_timings['phases']['imports'] = time.perf_counter() - started
+    total_started = started if started is not None else time.perf_counter()
+    with phase('create_app'):
+        app = create_app()
+    warm_up(app)
+    startup_timings['total'] = time.perf_counter() - total_started
+    logger.info('App ready in %.0f ms (%s)', startup_timings['total'] * 1000, ', '.join(
+        f'{name} {seconds * 1000:.0f} ms' for name, seconds in startup_timings['phases'].items()
+    ))
+    return app
+
+
+def warm_up(app, paths=WARM_REQUESTS):
+    """Pay the first-request costs now; see the module docstring."""
+    from .api import api
+    from .response_cache import LocalBackend, response_cache
+    from .instrumentation import instrumentation
+
+    with phase('mappers'):
+        configure_mappers()
+    with phase('schema'), app.test_request_context():
+        api.__schema__
+    with phase('requests'):
+        client = app.test_client()
+        for path in paths:
+            try:
+                status = client.get(path).status_code
+            except Exception:
+                logger.warning('Warm-up request %s failed', path, exc_info=True)
+                continue
+            if status >= 500:
+                logger.warning('Warm-up request %s returned %d; is the database reachable?', path, status)
+    with phase('dispose'), app.app_context():
+        db.engine.dispose()
+    # Workers would otherwise start with the master's cache entries and warm-up request counts
+    if isinstance(response_cache.backend, LocalBackend):
+        response_cache.backend.clear()
+    instrumentation.metrics.reset()
+
+
+def after_fork(app):
+    """Per-worker reset after forking from a preloaded master."""
+    from .db_pool import pool_metrics
+    from .instrumentation import instrumentation
+    from .response_cache import response_cache
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: the sockets belong to the master; just forget them
+            engine.dispose(close=False)
+    response_cache.open_backend(app)
+    pool_metrics.reset()
+    instrumentation.metrics.reset()
+    startup_timings['preloaded_by'] = startup_timings['pid']
+    startup_timings['pid'] = os.getpid()
@@ -0,0 +1,61 @@
+from .api import api
+from flask_restx import Namespace, Resource, fields
+from flask import current_app
+from .db_pool import connections_per_process, pool_status
+from .startup import startup_timings
+from . import db
+
+ns = Namespace('system', description='Process start-up and database connection health')
+api.add_namespace(ns)
+
+pool_status_model = ns.model('PoolStatus', {
+    'pid': fields.Integer(description='Process the numbers are for; each worker has its own pool'),
+    'pool': fields.String(description='Pool class'),
+    'size': fields.Integer(description='Connections kept open'),
+    'checked_out': fields.Integer(description='Connections in use'),
+    'checked_in': fields.Integer(description='Idle connections in the pool'),
+    'overflow': fields.Integer(description='Connections open beyond size'),
+    'max_overflow': fields.Integer,
+    'max_connections': fields.Integer(description='Most connections this process can open'),
+    'timeout': fields.Float(description='Seconds a request waits for a connection before failing'),
+    'checkouts': fields.Integer,
+    'timeouts': fields.Integer(description='Checkouts that gave up waiting'),
+    'connects': fields.Integer(description='New connections opened'),
+    'invalidations': fields.Integer(description='Connections discarded as broken or stale'),
+    'wait_seconds_total': fields.Float(description='Time spent getting connections'),
+    'wait_seconds_max': fields.Float,
+    'wait_seconds_avg': fields.Float,
+    'wait_buckets': fields.Raw(description='Checkouts by wait time, keyed by upper bound in seconds'),
+    'statement_timeout_ms': fields.Integer(description='Default statement timeout (0 = none)'),
+})
+
+startup_model = ns.model('StartupTimings', {
+    'pid': fields.Integer(description='Process the numbers are for'),
+    'preloaded_by': fields.Integer(description='Master the worker was forked from, if the app was preloaded'),
+    'phases_ms': fields.Raw(description='Milliseconds per start-up phase, in order'),
+    'total_ms': fields.Float(description='Import to ready, in milliseconds; 0 unless started through wsgi.py'),
+})
+
+
+@ns.route('/pool')
+class PoolStatus(Resource):
+    @ns.marshal_with(pool_status_model)
+    def get(self):
+        """Connection pool usage and checkout wait times for this worker process"""
+        status = pool_status(db.engine)
+        status['max_connections'] = connections_per_process(current_app.config)
+        status['statement_timeout_ms'] = current_app.config['DB_STATEMENT_TIMEOUT']
+        return status
+
+
+@ns.route('/startup')
+class StartupTimings(Resource):
+    @ns.marshal_with(startup_model)
+    def get(self):
+        """How long this process took to import, build and warm the app"""
+        return {
+            'pid': startup_timings['pid'],
+            'preloaded_by': startup_timings['preloaded_by'],
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in startup_timings['phases'].items()},
+            'total_ms': round(startup_timings['total'] * 1000, 1),
+        }
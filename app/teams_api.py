@@ -3,10 +3,16 @@ from flask_restx import Namespace, Resource, fields
 from flask import request
 from .models import Team, TeamMembership, User
 from . import db
+from sqlalchemy.orm import selectinload
+from .pagination import paginate, document_pagination
+from .response_cache import response_cache
+from .serialization import serialize_list_with
+from types import SimpleNamespace
 import uuid
 
 ns = Namespace('teams', description='Team management operations')
 api.add_namespace(ns)
+response_cache.track('teams', Team, TeamMembership)
 
 team_member_model = ns.model('TeamMember', {
     'user_id': fields.String(required=True, description='User ID'),
@@ -17,15 +23,91 @@ team_model = ns.model('Team', {
     'id': fields.String(readonly=True, description='The team unique identifier'),
     'name': fields.String(required=True, description='The team name'),
     'manager_id': fields.String(description='Manager user ID'),
-    'members': fields.List(fields.Nested(team_member_model)),
+    'members': fields.List(fields.Nested(team_member_model), attribute='user_associations'),
 })
 
+
+member_changes_model = ns.model('TeamMemberChanges', {
+    'add': fields.List(fields.Nested(team_member_model), description='Members to add, or whose summary to change'),
+    'remove': fields.List(fields.String, description='User IDs to remove from the team'),
+})
+
+
+def teams_with_members():
+    """Team query that loads every team's memberships in one extra statement."""
+    return Team.query.options(selectinload(Team.user_associations))
+
+
+def attach_members(rows):
+    """Give projected team rows their membership rows, loaded with one query."""
+    by_team = {row.id: [] for row in rows}
+    if by_team:
+        memberships = db.session.execute(
+            db.select(TeamMembership.team_id, TeamMembership.user_id, TeamMembership.summary)
+            .where(TeamMembership.team_id.in_(by_team))
+        )
+        for membership in memberships:
+            by_team[membership.team_id].append(membership)
+    return [
+        SimpleNamespace(id=row.id, name=row.name, manager_id=row.manager_id, user_associations=by_team[row.id])
+        for row in rows
+    ]
+
+
+def parse_members(members):
+    """Map user id -> summary for ``members``, dropping ids that are malformed or unknown."""
+    wanted = {}
+    for member in members or []:
+        try:
+            wanted[uuid.UUID(str(member.get('user_id')))] = member.get('summary')
+        except ValueError:
+            continue
+    if not wanted:
+        return {}
+    known = set(db.session.execute(db.select(User.id).where(User.id.in_(wanted))).scalars())
+    return {user_id: summary for user_id, summary in wanted.items() if user_id in known}
+
+
+def sync_members(team, members, remove=(), replace=False):
+    """
+    Apply membership changes as a diff: add new members, update summaries
+    that changed, and delete members in ``remove`` (or, with ``replace``,
+    everyone not in ``members``). Untouched rows are left alone. A user in
+    both ``members`` and ``remove`` is a 400.
+    """
+    wanted = parse_members(members)
+    current = {membership.user_id: membership for membership in team.user_associations}
+    if replace:
+        removed = set(current) - set(wanted)
+    else:
+        removed = set()
+        for user_id in remove:
+            try:
+                removed.add(uuid.UUID(str(user_id)))
+            except ValueError:
+                continue
+        conflicting = removed & set(wanted)
+        if conflicting:
+            ns.abort(400, f"Users both added and removed: {', '.join(sorted(map(str, conflicting)))}")
+    for user_id in removed & set(current):
+        team.user_associations.remove(current[user_id])
+    for user_id, summary in wanted.items():
+        membership = current.get(user_id)
+        if membership is None:
+            team.user_associations.append(TeamMembership(user_id=user_id, summary=summary))
+        elif membership.summary != summary:
+            membership.summary = summary
+
 @ns.route('/')
 class TeamList(Resource):
-    @ns.marshal_list_with(team_model)
+    @response_cache.cached('teams')
+    @document_pagination(ns)
+    @serialize_list_with(ns, team_model)
     def get(self):
-        """List all teams"""
-        return Team.query.all()
+        """List all teams, or one page of them with limit or cursor"""
+        query = db.session.query(Team.human_id, Team.id, Team.name, Team.manager_id)
+        teams, headers = paginate(query, Team.human_id, default_limit=None)
+        return attach_members(teams), 200, headers
 
     @ns.expect(team_model)
     @ns.marshal_with(team_model)
@@ -40,17 +122,7 @@ class TeamList(Resource):
         team.name = name
         team.manager_id = manager_id
         db.session.add(team)
-        db.session.commit()
-        # Add members if provided
-        members = data.get('members') or []
-        for member in members:
-            user = User.query.get(member.get('user_id'))
-            if user:
-                tm = TeamMembership()
-                tm.user_id = user.id
-                tm.team_id = team.id
-                tm.summary = member.get('summary')
-                db.session.add(tm)
+        sync_members(team, data.get('members'))
         db.session.commit()
         return team
 
@@ -58,34 +130,26 @@ class TeamList(Resource):
 @ns.response(404, 'Team not found')
 @ns.param('id', 'The team identifier')
 class TeamResource(Resource):
+    @response_cache.cached('teams')
     @ns.marshal_with(team_model)
     def get(self, id):
         """Fetch a team by ID"""
-        team = Team.query.get_or_404(id)
+        team = teams_with_members().get_or_404(id)
         return team
 
     @ns.expect(team_model)
     @ns.marshal_with(team_model)
     def put(self, id):
         """Update a team"""
-        team = Team.query.get_or_404(id)
+        team = teams_with_members().get_or_404(id)
         data = request.get_json() or {}
         if 'name' in data:
             team.name = data['name']
         if 'manager_id' in data:
             team.manager_id = data['manager_id']
-        # Update members
+        # Replace the roster, touching only the rows that differ
         if data.get('members') is not None:
-                TeamMembership.query.filter_by(team_id=team.id).delete(synchronize_session=False)
-                db.session.expire_all()  # Clear session to avoid identity map conflicts
-                for member in data['members']:
-                    user = User.query.get(member.get('user_id'))
-                    if user:
-                        tm = TeamMembership()
-                        tm.user_id = user.id
-                        tm.team_id = team.id
-                        tm.summary = member.get('summary')
-                        db.session.add(tm)
+            sync_members(team, data['members'], replace=True)
         db.session.commit()
         return team
 
@@ -96,3 +160,17 @@ class TeamResource(Resource):
         db.session.delete(team)
         db.session.commit()
         return {'message': 'Team deleted'}
+
+@ns.route('/<string:id>/members')
+@ns.response(404, 'Team not found')
+@ns.param('id', 'The team identifier')
+class TeamMembersResource(Resource):
+    @ns.expect(member_changes_model)
+    @ns.marshal_with(team_model)
+    def patch(self, id):
+        """Add, update or remove individual team members"""
+        team = teams_with_members().get_or_404(id)
+        data = request.get_json() or {}
+        sync_members(team, data.get('add'), remove=data.get('remove') or ())
+        db.session.commit()
+        return team
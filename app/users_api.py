@@ -1,7 +1,14 @@
 from flask_restx import Namespace, Resource, fields
 from flask import request
+from sqlalchemy import delete, insert, select, tuple_
 from app.db import db
-from app.models import User, Role
+from app.models import User, Role, UserRole
+from app.auth import principal_cache
+from app.availability import availability_index
+from app.human_ids import assign_human_ids
+from app.pagination import paginate, document_pagination
+from app.serialization import serialize_list_with
+import uuid
 
 api = Namespace('users', description='User management')
 
@@ -14,6 +21,37 @@ role_model = api.model('Role', {
     'name': fields.String(required=True, description='The role name')
 })
 
+bulk_assign_roles_model = api.model('BulkAssignRoles', {
+    'assignments': fields.Raw(required=True, description='Map of user ID to the complete list of role names that user should hold',
+                              example={'3fa85f64-5717-4562-b3fc-2c963f66afa6': ['Cashier', 'Chef']}),
+})
+
+role_assignment_outcome_model = api.model('RoleAssignmentOutcome', {
+    'user_id': fields.String(description='User ID'),
+    'status': fields.String(description="'updated', 'unchanged' or 'error'"),
+    'added': fields.List(fields.String, description='Role names granted'),
+    'removed': fields.List(fields.String, description='Role names revoked'),
+    'errors': fields.List(fields.String, description='Why the user was skipped'),
+})
+
+user_model = api.model('User', {
+    'id': fields.String(readonly=True, description='The user unique identifier'),
+    'human_id': fields.Integer(readonly=True, description='The user human-readable unique identifier'),
+    'name': fields.String(description='Full name'),
+    'email': fields.String(description='Email address'),
+    'manager_id': fields.String(description='Manager user ID'),
+})
+
+@api.route('/')
+class UserList(Resource):
+    @document_pagination(api)
+    @serialize_list_with(api, user_model)
+    def get(self):
+        """List users"""
+        query = db.session.query(User.id, User.human_id, User.name, User.email, User.manager_id)
+        users, headers = paginate(query, User.human_id)
+        return users, 200, headers
+
 @api.route('/<string:user_id>/roles')
 class UserRoleAssignmentResource(Resource):
     @api.marshal_list_with(role_model)
@@ -33,7 +71,6 @@ class UserRoleAssignmentResource(Resource):
             return {'message': 'One or more roles not found'}, 400
         # Remove all current roles
         user.role_associations.clear()
-        from app.models import UserRole
         for role in roles:
             user_role = UserRole()
             user_role.user = user
@@ -41,3 +78,91 @@ class UserRoleAssignmentResource(Resource):
             db.session.add(user_role)
         db.session.commit()
         return {'message': 'Roles updated successfully'}
+
+
+def bulk_assign_roles(assignments):
+    """
+    Set each user's roles to exactly the names given, for many users at once.
+
+    Roles, users and current assignments are read with a handful of queries
+    however many users are involved, and the differences are applied with
+    one DELETE and one INSERT in a single transaction. Users that are
+    unknown, or that name an unknown role, are reported and left unchanged.
+    Returns one outcome per requested user.
+    """
+    outcomes = {}
+    wanted = {}
+    for raw_id, role_names in assignments.items():
+        outcome = outcomes[raw_id] = {'user_id': raw_id, 'status': 'unchanged', 'added': [], 'removed': [], 'errors': []}
+        try:
+            user_id = uuid.UUID(raw_id)
+        except ValueError:
+            outcome['errors'].append('Invalid user id')
+            continue
+        if not isinstance(role_names, list) or not all(isinstance(name, str) for name in role_names):
+            outcome['errors'].append('Role names must be a list of strings')
+            continue
+        wanted[user_id] = (raw_id, set(role_names))
+
+    all_names = set().union(*(names for _, names in wanted.values()))
+    roles = dict(db.session.execute(select(Role.name, Role.id).where(Role.name.in_(all_names))).all()) if all_names else {}
+    role_names_by_id = {role_id: name for name, role_id in roles.items()}
+    known_users = set(db.session.execute(select(User.id).where(User.id.in_(wanted))).scalars()) if wanted else set()
+    current = {}
+    if known_users:
+        for user_id, role_id in db.session.execute(
+            select(UserRole.user_id, UserRole.role_id).where(UserRole.user_id.in_(known_users))
+        ):
+            current.setdefault(user_id, set()).add(role_id)
+
+    # Names of roles about to be revoked that were not requested for anyone
+    revoked_ids = set().union(*current.values()) - set(role_names_by_id) if current else set()
+    if revoked_ids:
+        role_names_by_id.update(db.session.execute(select(Role.id, Role.name).where(Role.id.in_(revoked_ids))).all())
+
+    to_delete, to_insert = [], []
+    for user_id, (raw_id, names) in wanted.items():
+        outcome = outcomes[raw_id]
+        if user_id not in known_users:
+            outcome['errors'].append('User not found')
+            continue
+        unknown = sorted(names - set(roles))
+        if unknown:
+            outcome['errors'].append(f"Unknown role(s): {', '.join(unknown)}")
+            continue
+        target = {roles[name] for name in names}
+        held = current.get(user_id, set())
+        to_delete.extend((user_id, role_id) for role_id in held - target)
+        to_insert.extend({'user_id': user_id, 'role_id': role_id} for role_id in target - held)
+        outcome['added'] = sorted(role_names_by_id[role_id] for role_id in target - held)
+        outcome['removed'] = sorted(role_names_by_id[role_id] for role_id in held - target)
+
+    if to_delete:
+        db.session.execute(delete(UserRole).where(tuple_(UserRole.user_id, UserRole.role_id).in_(to_delete)))
+    if to_insert:
+        assign_human_ids(UserRole, to_insert)
+        db.session.execute(insert(UserRole), to_insert)
+    db.session.commit()
+
+    changed = {user_id for user_id, _ in to_delete} | {row['user_id'] for row in to_insert}
+    principal_cache.invalidate(changed)
+    availability_index.invalidate(user_ids=changed)
+    for outcome in outcomes.values():
+        if outcome['errors']:
+            outcome['status'] = 'error'
+        elif outcome['added'] or outcome['removed']:
+            outcome['status'] = 'updated'
+    return list(outcomes.values())
+
+
+@api.route('/roles')
+class BulkRoleAssignmentResource(Resource):
+    @api.expect(bulk_assign_roles_model)
+    @api.marshal_list_with(role_assignment_outcome_model)
+    def put(self):
+        """Replace the roles of many users in one transaction"""
+        data = request.get_json() or {}
+        assignments = data.get('assignments')
+        if not isinstance(assignments, dict):
+            api.abort(400, "'assignments' must map user ids to lists of role names.")
+        return bulk_assign_roles(assignments)
@@ -0,0 +1,422 @@
+"""
+API benchmark and load generator for a local Postgres.
+
+``bench`` wipes the database at --database-url, builds the schema with
+the migrations, seeds it with fixed data (same --seed, same rows) and times each scenario through the Flask test
+client, so the numbers are the app and Postgres without an HTTP server in
+the way: register, login, role listing, team list and detail at 10, 100
+and 1000 teams, PUT /api/users/<id>/roles, and concurrent human_id
+inserts (see human_id_contention.py). Every scenario runs --warmup
+untimed requests, then --iterations timed ones, and reports p50/p95/p99.
+The response cache is off unless --response-cache is given, so reads hit
+the database. --output writes the results as JSON, tagged with the git
+commit; ``compare`` diffs two such files.
+
+``load`` drives a running server over HTTP with 1, 2, 4, ... concurrent
+keep-alive clients and reports throughput and latency per step. The knee
+is the step after which throughput stops growing while p95 keeps rising:
+more concurrency than that only queues. ``seed`` loads the same fixed data
+for the server to run against.
+
+    python -m benchmarks.api bench --output before.json \\
+        --database-url postgresql://rotaguard:rotapassword@db:5432/rotaguard_bench
+    python -m benchmarks.api compare before.json after.json
+    python -m benchmarks.api load --url http://localhost:5000 --concurrency 1 2 4 8 16 32
+
+Everything in the target database is dropped, so ``bench`` and ``seed``
+only accept a database whose name ends in ``_bench``.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+from sqlalchemy import create_engine, make_url, text
+
+from app import create_app, db
+from app.hashing import password_hasher
+from app.models import Role, Team, TeamMembership, User
+from app.pagination import MAX_PAGE_SIZE
+from app.response_cache import response_cache
+
+from .human_id_contention import run as contention_run
+
+TEAM_SCALES = (10, 100, 1000)
+USERS = 2000
+MEMBERS_PER_TEAM = 5
+ROLE_NAMES = [
+    'Manager', 'Supervisor', 'Chef', 'Sous Chef', 'Line Cook', 'Kitchen Porter', 'Cashier', 'Barista',
+    'Bartender', 'Server', 'Host', 'Cleaner', 'Driver', 'Stock Clerk', 'Security', 'Receptionist',
+]
+PASSWORD = 'bench-password'
+PERCENTILES = (50, 95, 99)
+# A load step whose throughput grows less than this over the previous one is past the knee
+KNEE_GAIN = 0.10
+DEFAULT_LOAD_PATHS = ['/api/roles/', '/api/teams/', '/api/teams/{team}']
+# Seeding drops everything in the target database, so it must be named as a scratch one
+SCRATCH_SUFFIX = '_bench'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scratch_database_url(url):
+    """argparse type for --database-url: refuses anything but a scratch database."""
+    name = make_url(url).database or ''
+    if not name.endswith(SCRATCH_SUFFIX):
+        raise argparse.ArgumentTypeError(
+            f"refusing to wipe database '{name}'; the benchmarks only run against one named *{SCRATCH_SUFFIX}"
+        )
+    return url
+
+
+# --- Fixed seed data ---
+
+def rebuild_schema():
+    """Empty the current app's database and migrate it to head, as a deployment would."""
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP SCHEMA public CASCADE'))
+        conn.execute(text('CREATE SCHEMA public'))
+    db.engine.dispose()
+    url = db.engine.url.render_as_string(hide_password=False)
+    # A subprocess, because Alembic's env.py reconfigures logging for the whole process
+    subprocess.run(['flask', 'db', 'upgrade'], check=True, env=dict(os.environ, DATABASE_URL=url), cwd=ROOT)
+
+
+def seed(teams, seed_value):
+    """
+    Recreate the schema and load roles, USERS users and ``teams`` teams.
+    Rows are generated from ``seed_value`` alone, so two runs with the same
+    arguments benchmark the same data.
+    """
+    rng = random.Random(seed_value)
+    rebuild_schema()
+    db.session.add_all(Role(name=name) for name in ROLE_NAMES)
+    db.session.commit()
+    # One hash for every seeded user: seeding should not take USERS bcrypt rounds
+    password_hash = password_hasher.generate_password_hash(PASSWORD)
+    users = [User(email=f'user{i}@bench.example', password_hash=password_hash, name=f'User {i}') for i in range(USERS)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+    grow_teams(0, teams, user_ids, rng)
+    return user_ids, rng
+
+
+def grow_teams(current, target, user_ids, rng):
+    """Add teams ``current`` .. ``target - 1``, each with a manager and MEMBERS_PER_TEAM members."""
+    for i in range(current, target):
+        team = Team(name=f'Team {i}', manager_id=rng.choice(user_ids))
+        team.user_associations = [
+            TeamMembership(user_id=user_id, summary='Member')
+            for user_id in rng.sample(user_ids, MEMBERS_PER_TEAM)
+        ]
+        db.session.add(team)
+    db.session.commit()
+
+
+# --- Timing ---
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(seconds, errors=0):
+    ordered = sorted(seconds)
+    summary = {'n': len(ordered), 'errors': errors}
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(ordered, pct) * 1000, 3)
+    summary['mean_ms'] = round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0
+    summary['max_ms'] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    return summary
+
+
+def measure(client, warmup, iterations, make_request, expected):
+    """
+    Time ``iterations`` calls of ``make_request(client, i)`` after ``warmup``
+    untimed ones. Responses whose status is not ``expected`` count as errors.
+    """
+    for i in range(warmup):
+        make_request(client, i)
+    timings, errors = [], 0
+    for i in range(warmup, warmup + iterations):
+        started = time.perf_counter()
+        resp = make_request(client, i)
+        timings.append(time.perf_counter() - started)
+        if resp.status_code != expected:
+            errors += 1
+    return summarize(timings, errors)
+
+
+def scenarios(user_ids, rng):
+    """(name, request function, expected status) for everything but the team scales."""
+    run_id = rng.getrandbits(32)
+    role_sets = [rng.sample(ROLE_NAMES, rng.randint(1, 3)) for _ in range(64)]
+    return [
+        ('register', lambda client, i: client.post('/api/auth/register', json={
+            'email': f'new{run_id}-{i}@bench.example', 'password': PASSWORD,
+            'confirm_password': PASSWORD, 'name': f'New {i}',
+        }), 201),
+        ('login', lambda client, i: client.post('/api/auth/login', json={
+            'email': f'user{i % USERS}@bench.example', 'password': PASSWORD,
+        }), 200),
+        ('roles_list', lambda client, i: client.get('/api/roles/'), 200),
+        ('user_roles_put', lambda client, i: client.put(
+            f'/api/users/{user_ids[i % len(user_ids)]}/roles', json={'role_names': role_sets[i % len(role_sets)]},
+        ), 200),
+    ]
+
+
+def team_scenarios(team_ids, rng):
+    picks = [rng.choice(team_ids) for _ in range(256)]
+    size = len(team_ids)
+    return [
+        (f'team_list_{size}', lambda client, i: client.get(f'/api/teams/?limit={min(size, MAX_PAGE_SIZE)}'), 200),
+        (f'team_detail_{size}', lambda client, i: client.get(f'/api/teams/{picks[i % len(picks)]}'), 200),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench(args):
+    app = create_app(database_uri=args.database_url)
+    response_cache.enabled = args.response_cache
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'seed': args.seed,
+            'warmup': args.warmup,
+            'iterations': args.iterations,
+            'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'],
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'response_cache': args.response_cache,
+        },
+        'scenarios': {},
+        'contention': {},
+    }
+    with app.app_context():
+        user_ids, rng = seed(TEAM_SCALES[0], args.seed)
+        client = app.test_client()
+
+        def record(name, make_request, expected):
+            # Slow scenarios (bcrypt) get fewer iterations so a run stays in minutes
+            iterations = args.slow_iterations if name in ('register', 'login') else args.iterations
+            warmup = min(args.warmup, iterations)
+            summary = measure(client, warmup, iterations, make_request, expected)
+            results['scenarios'][name] = summary
+            print(f"{name:<20}{summary['n']:>6}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                  f"{summary['p99_ms']:>10.2f}{summary['errors']:>8}")
+
+        print(f"{'scenario':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, make_request, expected in scenarios(user_ids, rng):
+            record(name, make_request, expected)
+
+        teams = TEAM_SCALES[0]
+        for scale in TEAM_SCALES:
+            grow_teams(teams, scale, user_ids, rng)
+            teams = scale
+            team_ids = list(db.session.execute(db.select(Team.id).order_by(Team.name)).scalars())
+            for name, make_request, expected in team_scenarios(team_ids, rng):
+                record(name, make_request, expected)
+
+        if args.writers:
+            print(f"{'human_id writers':<20}" + ''.join(f"{n:>10}" for n in args.writers))
+            engine = create_engine(db.engine.url, pool_size=max(args.writers) * 2)
+            rates = {
+                str(n): round(contention_run(engine, n, args.contention_seconds, False,
+                                             app.config['HUMAN_ID_BLOCK_SIZE'], 1), 1)
+                for n in args.writers
+            }
+            engine.dispose()
+            results['contention'] = {'inserts_per_second': rates}
+            print(f"{'inserts/s':<20}" + ''.join(f"{rate:>10.0f}" for rate in rates.values()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+# --- Comparing runs ---
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}")
+    print(f"{'scenario':<20}{'base p50':>10}{'head p50':>10}{'base p95':>10}{'head p95':>10}{'p95':>9}")
+    for name, new in head['scenarios'].items():
+        old = base['scenarios'].get(name)
+        if old is None:
+            print(f"{name:<20}{'-':>10}{new['p50_ms']:>10.2f}{'-':>10}{new['p95_ms']:>10.2f}")
+            continue
+        change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+        flag = '  <-' if change > args.threshold else ''
+        print(f"{name:<20}{old['p50_ms']:>10.2f}{new['p50_ms']:>10.2f}{old['p95_ms']:>10.2f}"
+              f"{new['p95_ms']:>10.2f}{change:>+8.1f}%{flag}")
+    old_rates = base.get('contention', {}).get('inserts_per_second', {})
+    for writers, rate in head.get('contention', {}).get('inserts_per_second', {}).items():
+        old = old_rates.get(writers)
+        change = f"{(rate - old) / old * 100:>+8.1f}%" if old else ''
+        print(f"{f'human_id x{writers}':<20}{old or '-':>10}{rate:>10}{change}")
+
+
+# --- Load generator ---
+
+def _load_client(base, paths, deadline, record_from, latencies, errors, index):
+    """One keep-alive client issuing GETs round-robin until ``deadline``."""
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+    mine, failed, i = [], 0, index
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+            ok = False
+        if started >= record_from:
+            mine.append(time.perf_counter() - started)
+            failed += not ok
+    conn.close()
+    latencies[index], errors[index] = mine, failed
+
+
+def load_step(base, paths, clients, warmup, seconds):
+    latencies, errors = [None] * clients, [0] * clients
+    record_from = time.perf_counter() + warmup
+    deadline = record_from + seconds
+    threads = [
+        threading.Thread(target=_load_client, args=(base, paths, deadline, record_from, latencies, errors, i))
+        for i in range(clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    timings = [latency for client in latencies for latency in client]
+    summary = summarize(timings, sum(errors))
+    summary['clients'] = clients
+    summary['rps'] = round(len(timings) / seconds, 1)
+    return summary
+
+
+def find_knee(steps):
+    """The concurrency after which throughput grew less than KNEE_GAIN, or None."""
+    for previous, step in zip(steps, steps[1:]):
+        if previous['rps'] and step['rps'] < previous['rps'] * (1 + KNEE_GAIN):
+            return previous['clients']
+    return None
+
+
+def load(args):
+    base = urlsplit(args.url)
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+    conn.request('GET', f'/api/teams/?limit={MAX_PAGE_SIZE}')
+    team_ids = [team['id'] for team in json.loads(conn.getresponse().read())]
+    conn.close()
+    if not team_ids and any('{team}' in path for path in args.paths):
+        raise SystemExit('No teams on the server; run "python -m benchmarks.api seed" against its database')
+    rng = random.Random(args.seed)
+    paths = []
+    for path in args.paths:
+        paths += [path.format(team=rng.choice(team_ids)) for _ in range(16)] if '{team}' in path else [path] * 16
+    rng.shuffle(paths)
+
+    print(f"{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    steps = []
+    for clients in args.concurrency:
+        step = load_step(base, paths, clients, args.warmup, args.seconds)
+        steps.append(step)
+        print(f"{clients:>8}{step['rps']:>10.1f}{step['p50_ms']:>10.2f}{step['p95_ms']:>10.2f}"
+              f"{step['p99_ms']:>10.2f}{step['errors']:>8}")
+    knee = find_knee(steps)
+    print(f"Throughput knee: {knee} clients" if knee else 'No knee found; try higher --concurrency')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'commit': git_commit(), 'url': args.url, 'paths': args.paths},
+                       'steps': steps, 'knee': knee}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+def seed_only(args):
+    app = create_app(database_uri=args.database_url)
+    with app.app_context():
+        seed(args.teams, args.seed)
+    print(f"Seeded {len(ROLE_NAMES)} roles, {USERS} users and {args.teams} teams")
+
+
+def add_database_url_argument(parser):
+    parser.add_argument('--database-url', required=True, type=scratch_database_url,
+                        help=f'Scratch database to wipe and seed; its name must end in {SCRATCH_SUFFIX}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('bench', help='Time each scenario in-process against a scratch database')
+    add_database_url_argument(p)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--warmup', type=int, default=20)
+    p.add_argument('--iterations', type=int, default=200)
+    p.add_argument('--slow-iterations', type=int, default=30, help='Iterations for register and login')
+    p.add_argument('--writers', type=int, nargs='*', default=[1, 4, 16], help='human_id contention writers')
+    p.add_argument('--contention-seconds', type=float, default=3.0)
+    p.add_argument('--response-cache', action='store_true', help='Leave the response cache on')
+    p.add_argument('--output', help='Write the results to this JSON file')
+    p.set_defaults(func=bench)
+
+    p = commands.add_parser('compare', help='Compare two bench result files')
+    p.add_argument('base')
+    p.add_argument('head')
+    p.add_argument('--threshold', type=float, default=10.0, help='Flag p95 regressions above this percent')
+    p.set_defaults(func=compare)
+
+    p = commands.add_parser('load', help='Step concurrency against a running server')
+    p.add_argument('--url', default='http://localhost:5000')
+    p.add_argument('--paths', nargs='+', default=DEFAULT_LOAD_PATHS, help='GET paths; {team} picks a team id')
+    p.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    p.add_argument('--seconds', type=float, default=10.0, help='Measured seconds per step')
+    p.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds per step')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--output', help='Write the steps to this JSON file')
+    p.set_defaults(func=load)
+
+    p = commands.add_parser('seed', help='Load the fixed seed data for a load test')
+    add_database_url_argument(p)
+    p.add_argument('--teams', type=int, default=TEAM_SCALES[-1])
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=seed_only)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark: how long a fresh process takes to be ready to serve.
+
+Starts a new interpreter RUNS times and imports wsgi.py, which builds and
+warms the app as the gunicorn master does (see app/startup.py), and
+reports the median and best time per phase plus the wall time including
+interpreter start-up. With --serve it instead starts gunicorn itself and
+times spawn to the first successful response. --output writes the
+results as JSON, tagged with the git commit, to compare between commits.
+
+    DATABASE_URL=postgresql://rotaguard:rotapassword@db:5432/rotaguard \\
+        python -m benchmarks.cold_start --runs 5 --output cold_start.json
+    python -m benchmarks.cold_start --serve --workers 4
+
+The warm-up runs read-only requests against the database; without one
+they fail and are logged, and the timings leave out the query costs.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from .api import git_commit
+
+ROOT = Path(__file__).resolve().parent.parent
+CHILD = "import json, wsgi; from app.startup import startup_timings; print(json.dumps(startup_timings))"
+
+
+def cold_start():
+    """One fresh interpreter: (seconds from spawn to ready, startup_timings)."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_start(workers, timeout=60.0):
+    """Seconds from spawning gunicorn to its first 200 response."""
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_ACCESS_LOG='')
+    started = time.perf_counter()
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/system/startup', timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f'gunicorn did not answer within {timeout:.0f}s')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--serve', action='store_true', help='Time gunicorn from spawn to first response')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers with --serve')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {'meta': {'commit': git_commit(), 'runs': args.runs, 'python': sys.version.split()[0]}}
+    if args.serve:
+        timings = [serve_start(args.workers) for _ in range(args.runs)]
+        results['meta']['workers'] = args.workers
+        results['serve_ms'] = {
+            'median': round(statistics.median(timings) * 1000, 1), 'best': round(min(timings) * 1000, 1),
+        }
+        print(f"gunicorn, {args.workers} workers: median {results['serve_ms']['median']:.0f} ms, "
+              f"best {results['serve_ms']['best']:.0f} ms to first response")
+    else:
+        runs = [cold_start() for _ in range(args.runs)]
+        phases = {name: [timings['phases'][name] for _, timings in runs] for name in runs[0][1]['phases']}
+        phases['total'] = [timings['total'] for _, timings in runs]
+        phases['process'] = [elapsed for elapsed, _ in runs]
+        results['phases_ms'] = {
+            name: {'median': round(statistics.median(values) * 1000, 1), 'best': round(min(values) * 1000, 1)}
+            for name, values in phases.items()
+        }
+        print(f"{'phase':<12}{'median ms':>12}{'best ms':>10}")
+        for name, summary in results['phases_ms'].items():
+            print(f"{name:<12}{summary['median']:>12.1f}{summary['best']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
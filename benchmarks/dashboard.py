@@ -0,0 +1,152 @@
+"""
+Dashboard benchmark: the async read path against the sync endpoints.
+
+Seeds the same fixed data as benchmarks/api.py (roles, users, teams) and
+gives every member four weeks of shifts and some availability. Then it
+loads a team's dashboard in two ways, with C threads each loading
+dashboards back to back for --seconds, for each C in --concurrency:
+
+* sync: the four sync endpoints a dashboard calls today, one after the
+  other: GET /api/teams/<id>, /api/roles/, /api/availability/ and
+  /api/compliance/?team_id=;
+* async: one GET /api/dashboard/teams/<id>, whose queries run
+  concurrently on the async engine (app/dashboard.py).
+
+It reports dashboards/second and p50/p95/p99 latency per dashboard, and
+the async/sync p95 ratio. Requests go through the Flask test client, so
+one process with its pools is measured without an HTTP server; the
+response cache is off. --output writes JSON as benchmarks/api.py does.
+
+    python -m benchmarks.dashboard --concurrency 1 4 16 32 --output dashboard.json \\
+        --database-url postgresql://rotaguard:rotapassword@db:5432/rotaguard_bench
+
+Like benchmarks/api.py it wipes the target database, which must therefore
+be named *_bench.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import Availability, Shift, Team, TeamMembership
+from app.response_cache import response_cache
+
+from .api import add_database_url_argument, git_commit, seed, summarize
+
+MONDAY = datetime(2026, 1, 5)
+WEEKS = 4
+
+
+def seed_dashboards(teams, seed_value):
+    """The api.py seed data plus shifts and availability for every member; returns the team ids."""
+    user_ids, rng = seed(teams, seed_value)
+    members = db.session.execute(
+        db.select(TeamMembership.team_id, TeamMembership.user_id).order_by(TeamMembership.team_id, TeamMembership.user_id)
+    ).all()
+    seen = set()
+    for team_id, user_id in members:
+        if user_id in seen:
+            continue
+        seen.add(user_id)
+        for day in range(WEEKS * 7):
+            if day % 7 < 5 and rng.random() < 0.9:
+                start = MONDAY + timedelta(days=day, hours=rng.choice([7, 9, 14]))
+                db.session.add(Shift(user_id=user_id, team_id=team_id, start_time=start,
+                                     end_time=start + timedelta(hours=rng.choice([6, 8, 10])), break_minutes=30))
+        for _ in range(2):
+            day = rng.randrange(WEEKS * 7)
+            db.session.add(Availability(user_id=user_id, start_time=MONDAY + timedelta(days=day),
+                                        end_time=MONDAY + timedelta(days=day + 1), available=rng.random() < 0.5))
+    db.session.commit()
+    return list(db.session.execute(db.select(Team.id).order_by(Team.name)).scalars())
+
+
+def sync_dashboard(client, team_id, period):
+    for path, query in (
+        (f'/api/teams/{team_id}', {}),
+        ('/api/roles/', {}),
+        ('/api/availability/', {**period, 'limit': 1000}),
+        ('/api/compliance/', {**period, 'team_id': team_id}),
+    ):
+        if client.get(path, query_string=query).status_code != 200:
+            return False
+    return True
+
+
+def async_dashboard(client, team_id, period):
+    return client.get(f'/api/dashboard/teams/{team_id}', query_string=period).status_code == 200
+
+
+def run(app, load, team_ids, threads, seconds, seed_value):
+    """``threads`` clients loading dashboards for ``seconds``; returns a summary."""
+    week = random.Random(seed_value).randrange(WEEKS)
+    period = {
+        'start': (MONDAY + timedelta(weeks=week)).isoformat(),
+        'end': (MONDAY + timedelta(weeks=week + 1)).isoformat(),
+    }
+    timings, errors = [[] for _ in range(threads)], [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client_loop(index):
+        client = app.test_client()
+        rng = random.Random(seed_value + index)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            ok = load(client, rng.choice(team_ids), period)
+            timings[index].append(time.perf_counter() - started)
+            errors[index] += not ok
+
+    workers = [threading.Thread(target=client_loop, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    flat = [t for client in timings for t in client]
+    summary = summarize(flat, sum(errors))
+    summary['dashboards_per_second'] = round(len(flat) / seconds, 1)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_database_url_argument(parser)
+    parser.add_argument('--teams', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each mode')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    app = create_app(database_uri=args.database_url)
+    response_cache.enabled = False
+    results = {'meta': {'commit': git_commit(), 'teams': args.teams, 'seconds': args.seconds, 'seed': args.seed,
+                        'pool_size': app.config['DB_POOL_SIZE'], 'async_pool_size': app.config['ASYNC_DB_POOL_SIZE']},
+               'sync': {}, 'async': {}}
+    with app.app_context():
+        team_ids = seed_dashboards(args.teams, args.seed)
+
+    print(f"{'mode':<8}{'threads':>8}{'dash/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, load in (('sync', sync_dashboard), ('async', async_dashboard)):
+        run(app, load, team_ids, max(args.concurrency), args.warmup, args.seed)
+        for threads in args.concurrency:
+            summary = run(app, load, team_ids, threads, args.seconds, args.seed)
+            results[mode][str(threads)] = summary
+            print(f"{mode:<8}{threads:>8}{summary['dashboards_per_second']:>10.1f}{summary['p50_ms']:>10.2f}"
+                  f"{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}{summary['errors']:>8}")
+    for threads in args.concurrency:
+        sync_p95, async_p95 = results['sync'][str(threads)]['p95_ms'], results['async'][str(threads)]['p95_ms']
+        if sync_p95:
+            print(f"{threads:>3} threads: async p95 is {async_p95 / sync_p95:.2f}x sync")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Concurrent-insert contention benchmark for human_id generation.
+
+Runs N writer threads, each inserting Role rows one transaction at a time,
+and reports inserts/second for the block allocator at a few block sizes and
+for the previous strategy (SELECT ... FOR UPDATE held until commit).
+
+    DATABASE_URL=postgresql://rotaguard:rotapassword@db:5432/rotaguard_bench \
+        python -m benchmarks.human_id_contention --writers 1 4 16 --seconds 5
+
+The target database is written to; point it at a scratch database.
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+from app import create_app, db
+from app.human_ids import allocator
+from app.models import HumanIdSequence, Role
+
+
+def _legacy_human_id(session):
+    """The old listener: lock the sequence row for the rest of the transaction."""
+    row = session.execute(
+        select(HumanIdSequence).filter_by(model_name='Role').with_for_update()
+    ).scalar_one()
+    next_id = row.next_value
+    session.execute(
+        update(HumanIdSequence)
+        .where(HumanIdSequence.model_name == 'Role')
+        .values(next_value=next_id + 1)
+    )
+    return next_id
+
+
+def _writer(engine, legacy, deadline, counts, index, rows_per_txn):
+    done = 0
+    while time.perf_counter() < deadline:
+        with Session(engine) as session:
+            for _ in range(rows_per_txn):
+                role = Role(name=f"bench-{uuid.uuid4()}")
+                if legacy:
+                    role.human_id = _legacy_human_id(session)
+                session.add(role)
+            session.commit()
+        done += rows_per_txn
+    counts[index] = done
+
+
+def run(engine, writers, seconds, legacy, block_size, rows_per_txn):
+    allocator.block_size = block_size
+    allocator.reset()
+    counts = [0] * writers
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=_writer, args=(engine, legacy, deadline, counts, i, rows_per_txn))
+        for i in range(writers)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rows-per-txn', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        # Leave room for every writer plus the allocator's own connections
+        engine = create_engine(db.engine.url, pool_size=max(args.writers) * 2)
+
+        strategies = [('legacy-for-update', True, 1)]
+        strategies += [(f'block-{size}', False, size) for size in args.block_sizes]
+
+        print(f"{'strategy':<20}" + ''.join(f"{f'{n} writers':>14}" for n in args.writers))
+        for label, legacy, block_size in strategies:
+            # Make sure the sequence row exists before the legacy writers lock it
+            allocator.next_id(engine, 'Role')
+            rates = [
+                run(engine, n, args.seconds, legacy, block_size, args.rows_per_txn)
+                for n in args.writers
+            ]
+            print(f"{label:<20}" + ''.join(f"{rate:>12.0f}/s" for rate in rates))
+
+        with engine.begin() as conn:
+            conn.execute(db.delete(Role).where(Role.name.like('bench-%')))
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
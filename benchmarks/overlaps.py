@@ -0,0 +1,86 @@
+"""
+Overlap detection benchmark: sweep line vs pairwise comparison.
+
+Generates SHIFTS synthetic shifts for USERS employees (each working
+across a few teams, so a handful are double-booked) and times the sweep
+in app/overlaps.py against the pairwise check it replaces, which compares
+every pair of shifts per employee. Times are epoch seconds, as
+load_overlaps reads them from Postgres. No database is needed.
+
+    python -m benchmarks.overlaps --shifts 100000 --users 2000
+"""
+import argparse
+import random
+import time
+import uuid
+from collections import defaultdict
+
+from app.overlaps import find_overlaps
+
+START = 1767571200  # 2026-01-05 00:00 UTC
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def make_rows(shifts, users, clash_rate, seed):
+    rng = random.Random(seed)
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    per_user = shifts // users
+    rows = []
+    for user_id in user_ids:
+        day = 0
+        for _ in range(per_user):
+            start = START + day * DAY + rng.choice([7, 9, 14, 17]) * HOUR
+            length = rng.choice([4, 6, 8]) * HOUR
+            if rows and rows[-1][1] == user_id and rng.random() < clash_rate:
+                # Booked by a second team while the first shift is still running
+                start = (rows[-1][2] + rows[-1][3]) // 2
+            else:
+                day += rng.choice([1, 1, 1, 2])
+            rows.append((len(rows), user_id, start, start + length))
+    return rows
+
+
+def pairwise(rows):
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row[1]].append(row)
+    found = 0
+    for shifts in by_user.values():
+        for i, a in enumerate(shifts):
+            for b in shifts[i + 1:]:
+                if a[2] < b[3] and b[2] < a[3]:
+                    found += 1
+    return found
+
+
+def best_of(repeat, func):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--shifts', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--clash-rate', type=float, default=0.005, help='Share of shifts double-booked')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.shifts, args.users, args.clash_rate, args.seed)
+    print(f"{len(rows)} shifts, {args.users} employees")
+    sweep, found = best_of(args.repeat, lambda: find_overlaps(rows))
+    baseline, expected = best_of(1, lambda: pairwise(rows))
+    assert len(found) == expected, (len(found), expected)
+    print(f"{'method':<10}{'overlaps':>10}{'ms':>10}")
+    print(f"{'pairwise':<10}{expected:>10}{baseline * 1000:>10.1f}")
+    print(f"{'sweep':<10}{len(found):>10}{sweep * 1000:>10.1f}   {baseline / sweep:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
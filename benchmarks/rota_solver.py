@@ -0,0 +1,105 @@
+"""
+Rota solver benchmark: staff a synthetic multi-week rota for a large team.
+
+Builds a RotaProblem directly (no database): EMPLOYEES people spread over
+a few roles, each day needing early, late and split shifts per role, some
+existing unavailability and declared availability, and a little history
+eating into the weekly allowance. Reports wall time, fill rate and how
+evenly hours were spread, then runs the full compliance check over the
+proposal and counts violations (which should be none).
+
+    python -m benchmarks.rota_solver --employees 200 --weeks 4 --budget 20
+"""
+import argparse
+import random
+import time
+import uuid
+from collections import defaultdict
+
+from app.compliance import DAY, HOUR, WEEK, ShiftColumns, check_compliance
+from app.rota_solver import WEEKLY_CAP, OpenShift, RotaProblem, solve
+
+ROLES = 5
+# (start hour, length in hours, break minutes) of each day's shift patterns
+PATTERNS = ((7, 8, 30), (11, 6, 20), (15, 8, 30))
+MONDAY = 1767571200  # 2026-01-05 00:00 UTC
+
+
+def make_problem(employees, weeks, seed):
+    rng = random.Random(seed)
+    roles = [uuid.uuid4() for _ in range(ROLES)]
+    team_id = uuid.uuid4()
+    user_ids = [uuid.uuid4() for _ in range(employees)]
+    held = [{rng.randrange(ROLES)} | ({rng.randrange(ROLES)} if rng.random() < 0.3 else set()) for _ in user_ids]
+    holders = [sorted(e for e in range(employees) if r in held[e]) for r in range(ROLES)]
+
+    shifts, candidates = [], []
+    for day in range(weeks * 7):
+        for r in range(ROLES):
+            # Roughly 30 net hours a week per holder of the role
+            per_pattern = max(1, round(len(holders[r]) * 30 / (7 * 7.5 * len(PATTERNS))))
+            for hour, length, break_minutes in PATTERNS:
+                start = MONDAY + day * DAY + hour * HOUR
+                for _ in range(per_pattern):
+                    shifts.append(OpenShift(start, start + length * HOUR, break_minutes, roles[r], team_id))
+                    candidates.append(holders[r])
+
+    unavailable = [[] for _ in user_ids]
+    windows = [[] for _ in user_ids]
+    for e in range(employees):
+        for _ in range(rng.randrange(3)):
+            start = MONDAY + rng.randrange(weeks * 7) * DAY
+            (unavailable if rng.random() < 0.6 else windows)[e].append((start, start + DAY * rng.randint(1, 3)))
+    preferred = [
+        {e for e in candidates[i] if any(s <= shift.start and end >= shift.end for s, end in windows[e])}
+        for i, shift in enumerate(shifts)
+    ]
+    week_caps = [
+        {MONDAY + w * WEEK: WEEKLY_CAP - (rng.randrange(0, 8) * HOUR if rng.random() < 0.2 else 0) for w in range(weeks)}
+        for _ in user_ids
+    ]
+    busy = [[] for _ in user_ids]
+    return RotaProblem(shifts, user_ids, candidates, busy, unavailable, preferred, week_caps)
+
+
+def count_violations(problem, owner):
+    rows = [
+        (problem.employees[e], shift.start, shift.end, shift.break_minutes)
+        for shift, e in zip(problem.shifts, owner) if e >= 0
+    ]
+    counts = defaultdict(int)
+    for violations in check_compliance(ShiftColumns.from_rows(rows)).values():
+        for violation in violations:
+            counts[violation.rule] += 1
+    return dict(counts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--budget', type=float, default=20.0, help='Search seconds')
+    parser.add_argument('--workers', type=int, default=None, help='Restart processes; defaults to the CPU count')
+    parser.add_argument('--restarts', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    problem = make_problem(args.employees, args.weeks, args.seed)
+    print(f"{args.employees} employees, {args.weeks} weeks, {len(problem.shifts)} open shifts")
+    started = time.perf_counter()
+    solution = solve(problem, args.budget, workers=args.workers, restarts=args.restarts, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    filled = sum(1 for e in solution.owner if e >= 0)
+    hours = [0.0] * len(problem.employees)
+    for shift, e in zip(problem.shifts, solution.owner):
+        if e >= 0:
+            hours[e] += shift.net / HOUR / args.weeks
+    print(f"solved in {elapsed:.2f}s (seed {solution.seed}, {solution.iterations} moves)")
+    print(f"filled {filled}/{len(problem.shifts)} ({filled / len(problem.shifts):.1%})")
+    print(f"weekly hours per employee: min {min(hours):.1f}, mean {sum(hours) / len(hours):.1f}, max {max(hours):.1f}")
+    print(f"compliance violations in the proposal: {count_violations(problem, solution.owner) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+List serialization benchmark: flask-restx ``marshal`` + json vs the
+precompiled serializers in app/serialization.py.
+
+Serializes N synthetic teams (each with a few members, like TeamList.get)
+and N shifts, and reports the best of several runs. No database is needed.
+
+    python -m benchmarks.serializer --rows 10000 --members 5
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from flask_restx import marshal
+
+from app.serialization import compile_model, dumps, orjson
+from app.shifts_api import shift_model
+from app.teams_api import team_model
+
+
+def make_teams(count, members):
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(), name=f'Team {i}', manager_id=uuid.uuid4(),
+            user_associations=[SimpleNamespace(user_id=uuid.uuid4(), summary='Member') for _ in range(members)],
+        )
+        for i in range(count)
+    ]
+
+
+def make_shifts(count):
+    start = datetime(2026, 1, 5, 9)
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(), human_id=i, user_id=uuid.uuid4(), team_id=uuid.uuid4(), role_id=None,
+            start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 8), break_minutes=30,
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--members', type=int, default=5, help='Members per team')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'model':<8}{'rows':>8}{'marshal ms':>14}{'compiled ms':>14}{'speed-up':>10}")
+    for name, model, objects in (
+        ('Team', team_model, make_teams(args.rows, args.members)),
+        ('Shift', shift_model, make_shifts(args.rows)),
+    ):
+        serialize = compile_model(model)
+        baseline = best_of(args.repeat, lambda: json.dumps(marshal(objects, model)))
+        compiled = best_of(args.repeat, lambda: dumps([serialize(obj) for obj in objects]))
+        print(f'{name:<8}{len(objects):>8}{baseline * 1000:>14.1f}{compiled * 1000:>14.1f}{baseline / compiled:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
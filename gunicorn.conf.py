@@ -0,0 +1,102 @@
+"""
+Gunicorn settings for production serving.
+
+    gunicorn -c gunicorn.conf.py
+
+The app is preloaded and warmed in the master and WEB_CONCURRENCY workers
+are forked from it (see app/startup.py). Every worker gets its own
+connection pools (DB_POOL_SIZE + DB_MAX_OVERFLOW, plus the dashboard's
+ASYNC_DB_* pool) and its own password hashing processes
+(PASSWORD_HASH_WORKERS). At the defaults that is 23 connections per worker.
+Postgres' default max_connections of 100 leaves room for 3 workers, not
+2 x CPUs + 1. So the default worker count is capped at what fits in
+DB_MAX_CONNECTIONS less DB_RESERVED_CONNECTIONS, and gunicorn refuses to
+start when an explicit WEB_CONCURRENCY does not fit. ``flask db-pool
+--workers N`` checks a count against the live server.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Workers share their /metrics numbers through files here (see app/instrumentation.py)
+METRICS_DIR = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'rotaguard-metrics'))
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# Capped by size_workers below to what the database connections allow
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# More than one thread runs each worker as gthread; the pool must cover threads per worker
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers after this many requests (0 = never), jittered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+# Empty turns the access log off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    from app.instrumentation import clear_directory
+
+    clear_directory(METRICS_DIR)
+    size_workers(server)
+
+
+def size_workers(server):
+    from app.db_pool import connections_per_process, processes_that_fit
+    from wsgi import application
+
+    config = application.config
+    fit = processes_that_fit(config)
+    if fit < 1 or ('WEB_CONCURRENCY' in os.environ and server.num_workers > fit):
+        raise RuntimeError(
+            f"{server.num_workers} worker(s) x {connections_per_process(config)} connection(s) do not fit in "
+            f"DB_MAX_CONNECTIONS {config['DB_MAX_CONNECTIONS']} less DB_RESERVED_CONNECTIONS "
+            f"{config['DB_RESERVED_CONNECTIONS']}; lower WEB_CONCURRENCY or the DB_* pool sizes"
+        )
+    if server.num_workers > fit:
+        server.log.info('Running %d workers rather than %d: %d connection(s) each fill the %d available',
+                        fit, server.num_workers, connections_per_process(config),
+                        config['DB_MAX_CONNECTIONS'] - config['DB_RESERVED_CONNECTIONS'])
+        server.num_workers = fit
+
+
+def on_reload(server):
+    # A reload reads `workers` from this file again
+    size_workers(server)
+
+
+def when_ready(server):
+    from app.startup import startup_timings
+
+    server.log.info(
+        'App built and warmed in %.0f ms (%s); forking %d workers', startup_timings['total'] * 1000,
+        ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in startup_timings['phases'].items()),
+        server.num_workers,
+    )
+
+
+def post_fork(server, worker):
+    from app.startup import after_fork
+    from wsgi import application
+
+    after_fork(application)
+
+
+def worker_exit(server, worker):
+    from app.instrumentation import instrumentation
+
+    # Also called in the master for a worker that is already gone
+    if worker.pid == os.getpid() and instrumentation.directory:
+        instrumentation.flush()
+
+
+def child_exit(server, worker):
+    from app.instrumentation import retire_process
+
+    retire_process(METRICS_DIR, worker.pid)
@@ -0,0 +1,28 @@
+"""Set hours_alerts.team_id to NULL when its team is deleted
+
+Revision ID: 0b5d7e9a2c41
+Revises: f6a2c8e47b19
+Create Date: 2026-10-18 23:12:47.905116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5d7e9a2c41'
+down_revision = 'f6a2c8e47b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('hours_alerts', schema=None) as batch_op:
+        batch_op.drop_constraint('hours_alerts_team_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('hours_alerts_team_id_fkey', 'teams', ['team_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('hours_alerts', schema=None) as batch_op:
+        batch_op.drop_constraint('hours_alerts_team_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('hours_alerts_team_id_fkey', 'teams', ['team_id'], ['id'])
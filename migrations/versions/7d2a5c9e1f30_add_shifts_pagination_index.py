@@ -0,0 +1,26 @@
+"""Add shifts (start_time, id) index for keyset pagination
+
+Revision ID: 7d2a5c9e1f30
+Revises: 4c1e8f2a9b7d
+Create Date: 2026-10-18 11:40:27.503112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2a5c9e1f30'
+down_revision = '4c1e8f2a9b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.create_index('ix_shifts_start_time_id', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.drop_index('ix_shifts_start_time_id')
@@ -0,0 +1,28 @@
+"""Set shifts.team_id to NULL when its team is deleted
+
+Revision ID: e3b8d1f05a6c
+Revises: d91b3f6a8c27
+Create Date: 2026-10-18 21:04:12.640318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b8d1f05a6c'
+down_revision = 'd91b3f6a8c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.drop_constraint('shifts_team_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('shifts_team_id_fkey', 'teams', ['team_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('shifts', schema=None) as batch_op:
+        batch_op.drop_constraint('shifts_team_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('shifts_team_id_fkey', 'teams', ['team_id'], ['id'])
@@ -0,0 +1,30 @@
+"""Add response_cache_versions table
+
+Revision ID: f6a2c8e47b19
+Revises: e3b8d1f05a6c
+Create Date: 2026-10-18 21:37:50.214977
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a2c8e47b19'
+down_revision = 'e3b8d1f05a6c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    versions = op.create_table('response_cache_versions',
+    sa.Column('cache_group', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('cache_group')
+    )
+    # The groups cached today; any other group gets its row on its first write
+    op.bulk_insert(versions, [{'cache_group': 'roles', 'version': 0}, {'cache_group': 'teams', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('response_cache_versions')
@@ -1,37 +1,207 @@
+"""
+Test database harness.
+
+The schema is built once into a template database (``flask db upgrade``,
+then ``create_all`` for anything the migrations do not cover yet) and
+labelled with a fingerprint of the migrations and models; later runs
+reuse it until one of those changes. Each pytest-xdist worker then clones
+its own database from the template with ``CREATE DATABASE ... TEMPLATE``,
+which copies files instead of replaying DDL:
+
+    pytest -n 4
+
+Every test runs inside a transaction on a single connection that is
+rolled back afterwards. The app's session joins that transaction through
+SAVEPOINTs, so code under test commits and rolls back as usual and nothing
+it writes outlives the test.
+
+Tests whose code writes from other threads or connections (the clock
+flusher, the alert scanner's pool) cannot see an uncommitted transaction;
+mark them ``@pytest.mark.committed`` to let them commit for real and have
+the tables truncated afterwards.
+"""
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+
 import pytest
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+
 from app import create_app, db
-from sqlalchemy import create_engine, text
+from app.human_ids import allocator
+from app.models import Role, Team, TeamMembership, User, UserRole
 
+ROOT = Path(__file__).resolve().parent.parent
 TEST_DB_NAME = "rotaguard_test"
-TEST_DB_URL = f"postgresql://rotaguard:rotapassword@db:5432/{TEST_DB_NAME}"
-ADMIN_DB_URL = "postgresql://rotaguard:rotapassword@db:5432/postgres"
+TEMPLATE_DB_NAME = f"{TEST_DB_NAME}_template"
+DB_SERVER_URL = "postgresql://rotaguard:rotapassword@db:5432"
+ADMIN_DB_URL = f"{DB_SERVER_URL}/postgres"
+
+
+def worker_db_name():
+    """One database per xdist worker (gw0, gw1, ...), or the plain name without xdist."""
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    return f"{TEST_DB_NAME}_{worker}" if worker else TEST_DB_NAME
+
+
+TEST_DB_URL = f"{DB_SERVER_URL}/{worker_db_name()}"
+
+
+def schema_fingerprint():
+    digest = hashlib.sha1()
+    for path in [ROOT / "app" / "models.py", *sorted((ROOT / "migrations" / "versions").glob("*.py"))]:
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def build_template():
+    """(Re)build the template database unless it already matches the schema fingerprint."""
+    fingerprint = schema_fingerprint()
+    admin = create_engine(ADMIN_DB_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        current = conn.scalar(
+            text("SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = :name"),
+            {"name": TEMPLATE_DB_NAME},
+        )
+        if current == fingerprint:
+            admin.dispose()
+            return
+        conn.execute(text(f"DROP DATABASE IF EXISTS {TEMPLATE_DB_NAME}"))
+        conn.execute(text(f"CREATE DATABASE {TEMPLATE_DB_NAME} OWNER rotaguard"))
+
+    template_url = f"{DB_SERVER_URL}/{TEMPLATE_DB_NAME}"
+    # A subprocess, because Alembic's env.py reconfigures logging for the whole process
+    env = dict(os.environ, DATABASE_URL=template_url)
+    subprocess.run(["flask", "db", "upgrade"], check=True, env=env, cwd=ROOT)
+    app = create_app(database_uri=template_url)
+    with app.app_context():
+        db.create_all()
+        db.session.remove()
+        # Cloning needs the template to have no open connections
+        db.engine.dispose()
+
+    with admin.connect() as conn:
+        conn.execute(text(f"COMMENT ON DATABASE {TEMPLATE_DB_NAME} IS '{fingerprint}'"))
+    admin.dispose()
+
+
+def clone_template(name):
+    admin = create_engine(ADMIN_DB_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"DROP DATABASE IF EXISTS {name}"))
+        conn.execute(text(f"CREATE DATABASE {name} TEMPLATE {TEMPLATE_DB_NAME} OWNER rotaguard"))
+    admin.dispose()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "committed: commit for real and truncate the tables afterwards")
+
+
+def pytest_sessionstart(session):
+    # The xdist controller (or a plain run) builds the template before any worker clones it
+    if not os.environ.get("PYTEST_XDIST_WORKER"):
+        build_template()
 
-import subprocess
-import os
-def reset_test_db():
-    engine = create_engine(ADMIN_DB_URL, isolation_level="AUTOCOMMIT")
-    with engine.connect() as conn:
-        conn.execute(text(f"DROP DATABASE IF EXISTS {TEST_DB_NAME}"))
-        conn.execute(text(f"CREATE DATABASE {TEST_DB_NAME} OWNER rotaguard"))
-    # Run migrations on the new test DB
-    env = os.environ.copy()
-    env["DATABASE_URL"] = TEST_DB_URL
-    subprocess.run(["flask", "db", "upgrade"], check=True, env=env)
 
 @pytest.fixture(scope="session", autouse=True)
 def _test_db():
-    reset_test_db()
+    clone_template(worker_db_name())
+
+
+class JoinedSession(Session):
+    """A Flask-SQLAlchemy session that stays on the connection it was bound to."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind if bind is not None else self.bind
+
+
+def truncate_all():
+    tables = ", ".join(table.name for table in db.metadata.sorted_tables)
+    db.session.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    db.session.commit()
+
 
 @pytest.fixture
-def client():
+def client(request):
     app = create_app(database_uri=TEST_DB_URL)
     app.config["TESTING"] = True
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     with app.app_context():
-        db.create_all()
-        with app.test_client() as client:
-            yield client
-        db.session.remove()
-        db.drop_all()
+        if request.node.get_closest_marker("committed"):
+            try:
+                with app.test_client() as client:
+                    yield client
+            finally:
+                db.session.remove()
+                truncate_all()
+                # human_id_sequence starts again at 1: blocks reserved before the truncate must not be handed out
+                allocator.reset()
+                db.session.remove()
+                db.engine.dispose()
+            return
+
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        app_session = db.session
+        db.session = db._make_scoped_session({
+            "class_": JoinedSession,
+            "bind": connection,
+            "join_transaction_mode": "create_savepoint",
+        })
+        try:
+            with app.test_client() as client:
+                yield client
+        finally:
+            db.session.remove()
+            db.session = app_session
+            transaction.rollback()
+            connection.close()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def count_statements(client):
+    """``count_statements(func)`` calls ``func`` and returns (SQL statements it ran, its result)."""
+    def count(func):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return len(statements), result
+
+    return count
+
+
+@pytest.fixture
+def kitchen(client):
+    """``kitchen(cooks, chefs)`` makes a Kitchen team of ``cooks`` members, the first ``chefs`` of them Chefs."""
+    def make(cooks=4, chefs=3):
+        chef = Role(name="Chef")
+        db.session.add(chef)
+        db.session.commit()
+        team = Team(name="Kitchen")
+        db.session.add(team)
+        db.session.commit()
+        members = []
+        for i in range(cooks):
+            cook = User(email=f"cook{i}@example.com", password_hash="pw", name=f"Cook {i}")
+            db.session.add(cook)
+            db.session.commit()
+            db.session.add(TeamMembership(user_id=cook.id, team_id=team.id))
+            if i < chefs:
+                db.session.add(UserRole(user_id=cook.id, role_id=chef.id))
+            db.session.commit()
+            members.append(cook)
+        return team, members
 
+    return make
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+import pytest
+from flask import current_app
+from app import db
+from app.models import User, Team, TeamMembership, WeeklyHours, HoursAlert, AlertScan, AlertScanShard
+from app.alerts import AlertScanner, UNASSIGNED
+from app.rollups import week_start
+
+TODAY = date(2026, 3, 4)
+
+# The scanner works through shards on a thread pool, each with its own connection
+pytestmark = pytest.mark.committed
+
+
+def make_user(email, weekly_hours=None, team=None):
+    user = User(email=email, password_hash='pw', name=email)
+    db.session.add(user)
+    db.session.commit()
+    if team is not None:
+        db.session.add(TeamMembership(user_id=user.id, team_id=team.id))
+    if weekly_hours is not None:
+        set_hours(user, weekly_hours)
+    db.session.commit()
+    return user
+
+def set_hours(user, hours):
+    WeeklyHours.query.filter_by(user_id=user.id).delete()
+    for weeks_ago in range(17):
+        db.session.add(WeeklyHours(user_id=user.id, week_start=week_start(TODAY) - timedelta(weeks=weeks_ago),
+                                   scheduled_seconds=int(hours * 3600), worked_seconds=0))
+    db.session.commit()
+
+def scanner():
+    return AlertScanner(current_app._get_current_object(), workers=2, batch_size=2)
+
+def test_scan_records_only_state_transitions(client):
+    team = Team(name='Ward 3')
+    db.session.add(team)
+    db.session.commit()
+    over = make_user('over@example.com', 52, team)
+    near = make_user('near@example.com', 45, team)
+    make_user('fine@example.com', 30, team)
+    make_user('nobody@example.com')
+
+    summary = scanner().run_once(TODAY)
+    assert summary['scanned'] == 4 and summary['alerts'] == 2
+    states = {alert.user_id: (alert.previous_state, alert.state) for alert in HoursAlert.query}
+    assert states == {over.id: ('ok', 'breach'), near.id: ('ok', 'warning')}
+
+    # Nothing changed: no new alerts
+    assert scanner().run_once(TODAY)['alerts'] == 0
+
+    set_hours(near, 49)
+    scanner().run_once(TODAY)
+    resp = client.get('/api/alerts/', query_string={'user_id': str(near.id)})
+    assert [(alert['previous_state'], alert['state']) for alert in resp.get_json()] == [('ok', 'warning'), ('warning', 'breach')]
+
+def test_unfinished_scan_resumes_from_checkpoint(client):
+    team = Team(name='Ward 4')
+    db.session.add(team)
+    db.session.commit()
+    make_user('a@example.com', 50, team)
+    make_user('b@example.com', 50)
+    # A previous run finished the team shard and then stopped
+    scan = AlertScan(period_end=week_start(TODAY))
+    scan.shards = [AlertScanShard(shard=str(team.id), done=True), AlertScanShard(shard=UNASSIGNED)]
+    db.session.add(scan)
+    db.session.commit()
+
+    summary = scanner().run_once(TODAY)
+    assert summary['scan_id'] == str(scan.id)
+    assert summary['shards'] == 1 and summary['scanned'] == 1
+    assert db.session.get(AlertScan, scan.id).finished_at is not None
+
+def test_resumed_scan_adds_shards_for_new_teams(client):
+    make_user('a@example.com', 50)
+    scan = AlertScan(period_end=week_start(TODAY))
+    scan.shards = [AlertScanShard(shard=UNASSIGNED, done=True)]
+    db.session.add(scan)
+    db.session.commit()
+    # The team was created after the scan opened
+    team = Team(name='Ward 5')
+    db.session.add(team)
+    db.session.commit()
+    make_user('b@example.com', 50, team)
+
+    summary = scanner().run_once(TODAY)
+    assert summary['scan_id'] == str(scan.id)
+    assert summary['shards'] == 1 and summary['scanned'] == 1
+
+def test_deleting_a_team_keeps_its_alerts(client):
+    team = Team(name='Ward 6')
+    db.session.add(team)
+    db.session.commit()
+    user = make_user('over@example.com', 52, team)
+    scanner().run_once(TODAY)
+    resp = client.delete(f'/api/teams/{team.id}')
+    assert resp.status_code == 200
+    db.session.expire_all()
+    assert [(alert.user_id, alert.team_id) for alert in HoursAlert.query] == [(user.id, None)]
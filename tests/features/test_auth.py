@@ -0,0 +1,41 @@
+from app import db
+from app.models import Team, User
+from app.auth import principal_cache
+
+
+def register_and_login(client, email):
+    client.post('/api/auth/register', json={
+        'email': email, 'password': 'pw', 'confirm_password': 'pw', 'name': email.split('@')[0],
+    })
+    resp = client.post('/api/auth/login', json={'email': email, 'password': 'pw'})
+    assert resp.status_code == 200
+    return {'Authorization': f"Bearer {resp.json['token']}"}
+
+def test_me_requires_valid_token(client):
+    assert client.get('/api/auth/me').status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': 'Bearer nonsense'}).status_code == 401
+
+def test_cached_principal_needs_no_queries(client, count_statements):
+    principal_cache.invalidate()
+    headers = register_and_login(client, 'cached@example.com')
+    resp = client.get('/api/auth/me', headers=headers)
+    assert resp.status_code == 200
+    assert resp.json['email'] == 'cached@example.com'
+    statements, resp = count_statements(lambda: client.get('/api/auth/me', headers=headers))
+    assert resp.status_code == 200
+    assert statements == 0
+
+def test_role_and_team_changes_invalidate_principal(client):
+    headers = register_and_login(client, 'promoted@example.com')
+    assert client.get('/api/auth/me', headers=headers).json['role_names'] == []
+    client.post('/api/roles/', json={'name': 'Manager'})
+    resp = client.put('/api/users/{}/roles'.format(
+        User.query.filter_by(email='promoted@example.com').one().id), json={'role_names': ['Manager']})
+    assert resp.status_code == 200
+    assert client.get('/api/auth/me', headers=headers).json['role_names'] == ['Manager']
+
+    user = User.query.filter_by(email='promoted@example.com').one()
+    team = Team(name='Night shift', manager_id=user.id)
+    db.session.add(team)
+    db.session.commit()
+    assert client.get('/api/auth/me', headers=headers).json['managed_team_ids'] == [str(team.id)]
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import Shift
+
+
+def saturday():
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today + timedelta(days=(5 - today.weekday()) % 7 or 7)
+
+def cover(client, team, day, **extra):
+    query = {'team_id': str(team.id), 'start': (day + timedelta(hours=18)).isoformat(),
+             'end': (day + timedelta(hours=23)).isoformat(), **extra}
+    resp = client.get('/api/availability/cover', query_string=query)
+    assert resp.status_code == 200
+    return [candidate['email'] for candidate in resp.get_json()]
+
+def test_cover_excludes_unavailable_and_rest_conflicts(client, kitchen):
+    team, cooks = kitchen()
+    day = saturday()
+    assert cover(client, team, day, role='Chef') == ['cook0@example.com', 'cook1@example.com', 'cook2@example.com']
+
+    client.post('/api/availability/', json={
+        'user_id': str(cooks[0].id), 'start_time': day.isoformat(), 'end_time': (day + timedelta(days=1)).isoformat(),
+        'available': False, 'note': 'Wedding',
+    })
+    # Finishing at 10:00 leaves less than 11 hours' rest before 18:00
+    db.session.add(Shift(user_id=cooks[1].id, start_time=day + timedelta(hours=2), end_time=day + timedelta(hours=10)))
+    db.session.commit()
+    assert cover(client, team, day, role='Chef') == ['cook2@example.com']
+    assert cover(client, team, day) == ['cook2@example.com', 'cook3@example.com']
+
+def test_declared_availability_ranks_first(client, kitchen):
+    team, cooks = kitchen()
+    day = saturday()
+    resp = client.post('/api/availability/', json={
+        'user_id': str(cooks[2].id), 'start_time': (day + timedelta(hours=12)).isoformat(),
+        'end_time': day.replace(hour=23, minute=30).isoformat(), 'available': True,
+    })
+    assert resp.status_code == 201
+    assert cover(client, team, day)[0] == 'cook2@example.com'
+    assert cover(client, team, day, require_available='true') == ['cook2@example.com']
+
+    client.delete(f"/api/availability/{resp.get_json()['id']}")
+    assert cover(client, team, day, require_available='true') == []
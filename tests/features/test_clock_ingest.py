@@ -0,0 +1,90 @@
+import uuid
+import pytest
+from app import db
+from app.clock_ingest import ingestor
+from app.models import ClockEvent, User
+
+# The background flusher writes on its own thread and connection
+pytestmark = pytest.mark.committed
+
+
+def make_user(email='punch@example.com'):
+    user = User(email=email, password_hash='pw', name='Puncher')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def punch(user, kind, minute, event_id=None):
+    return {
+        'event_id': event_id or uuid.uuid4().hex,
+        'user_id': str(user.id),
+        'kind': kind,
+        'occurred_at': f'2026-03-02T08:{minute:02d}:00Z',
+    }
+
+def test_batch_is_acknowledged_then_written_in_order(client):
+    user = make_user()
+    events = [punch(user, 'in', 0), punch(user, 'out', 30), punch(user, 'in', 45)]
+    resp = client.post('/api/clock/events', json={'events': events})
+    assert resp.status_code == 202
+    assert resp.get_json() == {'accepted': 3, 'duplicates': 0, 'errors': []}
+    ingestor.flush()
+    stored = ClockEvent.query.filter_by(user_id=user.id).order_by(ClockEvent.human_id).all()
+    assert [event.event_id for event in stored] == [event['event_id'] for event in events]
+    assert [event.kind for event in stored] == ['in', 'out', 'in']
+
+def test_retried_punch_is_stored_once(client):
+    user = make_user()
+    event = punch(user, 'in', 5, event_id='device-7:1001')
+    assert client.post('/api/clock/events', json=event).get_json()['accepted'] == 1
+    ingestor.flush()
+    resp = client.post('/api/clock/events', json=[dict(event)])
+    assert resp.get_json()['duplicates'] == 1
+    # Another worker (or a restart) does not know the id; the unique constraint absorbs it
+    ingestor._recent.clear()
+    client.post('/api/clock/events', json=[dict(event)])
+    ingestor.flush()
+    assert ClockEvent.query.filter_by(event_id='device-7:1001').count() == 1
+
+def test_invalid_events_are_reported_by_index(client):
+    user = make_user()
+    events = [punch(user, 'in', 0), {**punch(user, 'in', 1), 'kind': 'lunch'},
+              {**punch(user, 'out', 2), 'user_id': str(uuid.uuid4())}]
+    resp = client.post('/api/clock/events', json=events)
+    body = resp.get_json()
+    assert resp.status_code == 202
+    assert body['accepted'] == 1
+    assert [error['index'] for error in body['errors']] == [1, 2]
+    ingestor.flush()
+
+def failing_insert(monkeypatch, event_id, times):
+    insert, failures = ingestor._insert, []
+    def flaky(rows):
+        if len(failures) < times and any(row['event_id'] == event_id for row in rows):
+            failures.append(event_id)
+            raise RuntimeError('database went away')
+        return insert(rows)
+    monkeypatch.setattr(ingestor, '_insert', flaky)
+
+def test_failed_punch_is_retried_until_written(client, monkeypatch):
+    user = make_user()
+    event = punch(user, 'in', 10)
+    # Fails as part of the batch, alone, then once more after a backoff
+    failing_insert(monkeypatch, event['event_id'], times=3)
+    client.post('/api/clock/events', json=[event, punch(user, 'out', 40)])
+    ingestor.flush()
+    assert ClockEvent.query.filter_by(user_id=user.id).count() == 2
+    assert not ingestor._attempts
+
+def test_dropped_punch_can_be_resubmitted(client, monkeypatch):
+    user = make_user()
+    event = punch(user, 'in', 15)
+    failing_insert(monkeypatch, event['event_id'], times=ingestor.max_attempts)
+    client.post('/api/clock/events', json=[dict(event)])
+    ingestor.flush()
+    assert ClockEvent.query.filter_by(event_id=event['event_id']).count() == 0
+    monkeypatch.undo()
+    resp = client.post('/api/clock/events', json=[dict(event)])
+    assert resp.get_json()['accepted'] == 1
+    ingestor.flush()
+    assert ClockEvent.query.filter_by(event_id=event['event_id']).count() == 1
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Shift
+from app.compliance import (
+    ShiftColumns, check_compliance,
+    AVERAGE_WEEKLY_HOURS, DAILY_REST, WEEKLY_REST, REST_BREAK, NIGHT_WORK_AVERAGE,
+)
+
+MONDAY = datetime(2026, 1, 5)
+
+
+def shift(user, day, start_hour, hours, break_minutes=30):
+    start = MONDAY + timedelta(days=day, hours=start_hour)
+    return (user, start, start + timedelta(hours=hours), break_minutes)
+
+def rules(results, user):
+    return {violation.rule for violation in results.get(user, [])}
+
+def test_standard_week_is_compliant(client):
+    rows = [shift('alice', week * 7 + day, 9, 8) for week in range(20) for day in range(5)]
+    assert check_compliance(ShiftColumns.from_rows(rows)) == {}
+
+def test_missing_break_on_long_shift(client):
+    results = check_compliance(ShiftColumns.from_rows([shift('bob', 0, 9, 7, break_minutes=10)]))
+    assert rules(results, 'bob') == {REST_BREAK}
+
+def test_short_rest_between_close_and_open(client):
+    rows = [shift('carol', 0, 15, 8), shift('carol', 1, 7, 6)]
+    results = check_compliance(ShiftColumns.from_rows(rows))
+    assert rules(results, 'carol') == {DAILY_REST}
+    assert results['carol'][0].value == 8
+
+def test_no_day_off_for_a_fortnight(client):
+    rows = [shift('dave', day, 9, 8) for day in range(14)]
+    assert WEEKLY_REST in rules(check_compliance(ShiftColumns.from_rows(rows)), 'dave')
+
+def test_average_over_reference_period(client):
+    rows = [shift('erin', week * 7 + day, 8, 10) for week in range(20) for day in range(6)]
+    results = check_compliance(ShiftColumns.from_rows(rows))
+    assert AVERAGE_WEEKLY_HOURS in rules(results, 'erin')
+    assert WEEKLY_REST not in rules(results, 'erin')
+
+def test_night_worker_average(client):
+    rows = [shift('frank', week * 7 + day, 22, 10) for week in range(20) for day in range(6)]
+    assert NIGHT_WORK_AVERAGE in rules(check_compliance(ShiftColumns.from_rows(rows)), 'frank')
+
+def test_users_are_checked_independently(client):
+    # Two users whose shifts would break the rest rules if they were one person
+    rows = [shift('gina', 0, 6, 8), shift('hank', 0, 16, 8)]
+    assert check_compliance(ShiftColumns.from_rows(rows)) == {}
+
+def test_compliance_endpoint(client):
+    user = User(email='ivan@example.com', password_hash='pw', name='Ivan')
+    db.session.add(user)
+    db.session.commit()
+    for _, start, end, break_minutes in [shift(None, 0, 15, 8), shift(None, 1, 7, 6)]:
+        db.session.add(Shift(user_id=user.id, start_time=start, end_time=end, break_minutes=break_minutes))
+    db.session.commit()
+    resp = client.get(f'/api/compliance/users/{user.id}')
+    assert resp.status_code == 200
+    assert [v['rule'] for v in resp.get_json()['violations']] == [DAILY_REST]
+    resp = client.get('/api/compliance/')
+    assert resp.get_json()[0]['user_id'] == str(user.id)
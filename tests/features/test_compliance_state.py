@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Shift
+from app.compliance import DAILY_REST
+from app.compliance_state import ComplianceState, replay_check, compliance_cache
+
+MONDAY = datetime(2026, 1, 5)
+
+
+def at(day, hour):
+    return MONDAY + timedelta(days=day, hours=hour)
+
+def test_incremental_matches_full_recompute(client):
+    rng = random.Random(7)
+    rows = []
+    for i in range(150):
+        start = at(rng.randrange(120), rng.choice([6, 7, 9, 14, 15, 22]))
+        rows.append((i, start, start + timedelta(hours=rng.choice([6, 8, 10, 12])), rng.choice([0, 10, 30])))
+    for seed in range(5):
+        assert replay_check('alice', rows, seed=seed) == []
+
+def test_insert_and_delete_report_the_change(client):
+    state = ComplianceState('bob')
+    assert state.insert(1, at(0, 15), at(0, 23), 30) == ([], [])
+    new, resolved = state.insert(2, at(1, 7), at(1, 13), 0)
+    assert [v.rule for v in new] == [DAILY_REST] and resolved == []
+    new, resolved = state.delete(2)
+    assert new == [] and [v.rule for v in resolved] == [DAILY_REST]
+    assert state.verify() == []
+
+def test_shift_endpoints_return_compliance_diff(client):
+    user = User(email='carol@example.com', password_hash='pw', name='Carol')
+    db.session.add(user)
+    db.session.commit()
+    compliance_cache.invalidate()
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'start_time': at(0, 15).isoformat(), 'end_time': at(0, 23).isoformat(),
+        'break_minutes': 30,
+    })
+    assert resp.status_code == 201
+    assert resp.json['compliance']['new_violations'] == []
+
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'start_time': at(1, 7).isoformat(), 'end_time': at(1, 13).isoformat(),
+    })
+    assert resp.status_code == 201
+    assert [v['rule'] for v in resp.json['compliance']['new_violations']] == [DAILY_REST]
+    early_id = resp.json['id']
+
+    resp = client.put(f'/api/shifts/{early_id}', json={'start_time': at(1, 9).isoformat()})
+    assert resp.status_code == 200
+    assert [v['rule'] for v in resp.json['compliance']['resolved_violations']] == [DAILY_REST]
+    assert compliance_cache.verify(user.id) == []
+
+    resp = client.delete(f'/api/shifts/{early_id}')
+    assert resp.status_code == 200
+    assert db.session.get(Shift, early_id) is None
+
+def test_shift_validation(client):
+    user = User(email='dave@example.com', password_hash='pw', name='Dave')
+    db.session.add(user)
+    db.session.commit()
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'start_time': at(0, 9).isoformat(), 'end_time': at(0, 8).isoformat(),
+    })
+    assert resp.status_code == 400
+    resp = client.get('/api/shifts/not-a-uuid')
+    assert resp.status_code == 400
@@ -0,0 +1,64 @@
+import concurrent.futures
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Team, TeamMembership, Role, UserRole, Shift, Availability
+from app.compliance import DAILY_REST
+
+MONDAY = datetime(2026, 1, 5)
+
+# The async engine reads on its own connections, so the test data has to be committed
+pytestmark = pytest.mark.committed
+
+
+def add(obj):
+    db.session.add(obj)
+    db.session.commit()
+    return obj
+
+def test_team_dashboard_in_one_request(client):
+    ann = add(User(email='ann@example.com', password_hash='pw', name='Ann'))
+    ben = add(User(email='ben@example.com', password_hash='pw', name='Ben'))
+    outsider = add(User(email='cat@example.com', password_hash='pw', name='Cat'))
+    team = add(Team(name='Ward 5', manager_id=ann.id))
+    add(TeamMembership(user_id=ann.id, team_id=team.id, summary='Sister'))
+    add(TeamMembership(user_id=ben.id, team_id=team.id, summary='Nurse'))
+    nurse = add(Role(name='Nurse'))
+    add(UserRole(user_id=ben.id, role_id=nurse.id))
+    # Ben closes at 23:00 and opens at 07:00: eight hours of daily rest
+    add(Shift(user_id=ben.id, team_id=team.id, start_time=MONDAY + timedelta(hours=15),
+              end_time=MONDAY + timedelta(hours=23), break_minutes=30))
+    add(Shift(user_id=ben.id, team_id=team.id, start_time=MONDAY + timedelta(days=1, hours=7),
+              end_time=MONDAY + timedelta(days=1, hours=13), break_minutes=0))
+    add(Availability(user_id=ann.id, start_time=MONDAY + timedelta(days=2), end_time=MONDAY + timedelta(days=3),
+                     available=False, note='Training'))
+    add(Availability(user_id=outsider.id, start_time=MONDAY, end_time=MONDAY + timedelta(days=1), available=False))
+    add(Availability(user_id=ann.id, start_time=MONDAY + timedelta(days=9), end_time=MONDAY + timedelta(days=10)))
+
+    resp = client.get(f'/api/dashboard/teams/{team.id}', query_string={
+        'start': MONDAY.isoformat(), 'end': (MONDAY + timedelta(days=7)).isoformat(),
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['name'] == 'Ward 5' and data['manager_id'] == str(ann.id)
+    assert [(m['name'], m['summary'], m['roles'], m['violations']) for m in data['members']] == [
+        ('Ann', 'Sister', [], 0), ('Ben', 'Nurse', ['Nurse'], 1),
+    ]
+    assert [(entry['user_id'], entry['note']) for entry in data['availability']] == [(str(ann.id), 'Training')]
+    assert [(row['user_id'], [v['rule'] for v in row['violations']]) for row in data['compliance']] == [
+        (str(ben.id), [DAILY_REST]),
+    ]
+
+def test_unknown_team(client):
+    assert client.get(f'/api/dashboard/teams/{uuid.uuid4()}').status_code == 404
+    assert client.get('/api/dashboard/teams/not-a-uuid').status_code == 400
+
+def test_slow_dashboard_is_a_503(client, monkeypatch):
+    def timed_out(*args):
+        raise concurrent.futures.TimeoutError()
+
+    monkeypatch.setattr('app.dashboard_api.team_dashboard', timed_out)
+    resp = client.get(f'/api/dashboard/teams/{uuid.uuid4()}')
+    assert resp.status_code == 503
+    assert 'retry' in resp.get_json()['message']
@@ -0,0 +1,57 @@
+import contextvars
+import click
+from click.testing import CliRunner
+from flask.cli import FlaskGroup, with_appcontext
+from sqlalchemy import text
+from app import create_app, db
+from app.db_pool import InstrumentedQueuePool, engine_options, load_pool_config, processes_that_fit
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT', '1500')
+    config = {'SQLALCHEMY_DATABASE_URI': 'postgresql://rotaguard:rotapassword@db:5432/rotaguard'}
+    load_pool_config(config)
+    options = engine_options(config)
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_size'] == 3 and options['max_overflow'] == 10
+    assert options['pool_pre_ping'] is False
+    assert options['connect_args']['options'] == '-c statement_timeout=1500'
+    assert engine_options({**config, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) == {}
+
+def test_default_pools_fit_three_processes_in_postgres_defaults():
+    config = {}
+    load_pool_config(config)
+    # 15 + 8 connections each, 90 of Postgres' 100 left for the app
+    assert processes_that_fit(config) == 3
+
+def test_pool_status_endpoint(client):
+    assert db.session.execute(text('SHOW statement_timeout')).scalar() == '30s'
+    data = client.get('/api/system/pool').get_json()
+    assert data['pool'] == 'InstrumentedQueuePool'
+    # 5 + 10 for the sync pool, 4 + 4 for the dashboard's async pool
+    assert data['size'] == 5 and data['max_connections'] == 23
+    assert data['checkouts'] >= 1
+    assert sum(data['wait_buckets'].values()) == data['checkouts']
+
+def test_cli_commands_are_not_cut_off_by_the_request_timeout(client, monkeypatch):
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT', '100')
+    uri = client.application.config['SQLALCHEMY_DATABASE_URI']
+    cli = FlaskGroup(create_app=lambda: create_app(database_uri=uri))
+
+    @cli.command('slow-query')
+    @with_appcontext
+    def slow_query():
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT pg_sleep(0.3)'))
+            click.echo(conn.execute(text('SHOW statement_timeout')).scalar())
+
+    # A fresh context has no current app, as in a `flask` process, so the CLI builds its own
+    result = contextvars.Context().run(CliRunner().invoke, cli, ['slow-query'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == '0'
+    # Outside the CLI the same settings still give connections the request timeout
+    config = {'SQLALCHEMY_DATABASE_URI': uri}
+    load_pool_config(config)
+    assert engine_options(config)['connect_args']['options'] == '-c statement_timeout=100'
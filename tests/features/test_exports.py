@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from app import db
+from app.models import User, Shift, Team, TeamMembership
+
+
+def seed():
+    user = User(email='exp@example.com', password_hash='pw', name='Exporter')
+    db.session.add(user)
+    db.session.commit()
+    team = Team(name='Bar')
+    db.session.add(team)
+    db.session.commit()
+    db.session.add(TeamMembership(user_id=user.id, team_id=team.id, summary='Bartender'))
+    start = datetime(2026, 2, 2, 18)
+    for day in range(3):
+        db.session.add(Shift(user_id=user.id, team_id=team.id, start_time=start + timedelta(days=day),
+                             end_time=start + timedelta(days=day, hours=6)))
+        db.session.commit()
+    return user, team
+
+def test_export_shifts_ndjson_with_filters(client):
+    user, team = seed()
+    resp = client.get('/api/exports/shifts', query_string={'since': '2026-02-03T00:00:00', 'until': '2026-02-04T00:00:00'})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in resp.data.decode().splitlines()]
+    assert len(rows) == 1
+    assert rows[0]['user_email'] == 'exp@example.com' and rows[0]['team_name'] == 'Bar'
+    assert rows[0]['start_time'] == '2026-02-03T18:00:00'
+
+def test_export_teams_csv(client):
+    user, team = seed()
+    resp = client.get('/api/exports/teams', query_string={'format': 'csv'})
+    assert resp.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(resp.data.decode())))
+    assert [(row['team_name'], row['user_email'], row['summary']) for row in rows] == [('Bar', 'exp@example.com', 'Bartender')]
+
+def test_unknown_dataset(client):
+    assert client.get('/api/exports/payslips').status_code == 404
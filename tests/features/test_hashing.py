@@ -0,0 +1,57 @@
+import pytest
+from app import db
+from app.models import User
+from app.hashing import PasswordHasher, HashingBusy, hash_rounds, password_hasher
+
+
+def test_hash_and_check_in_pool():
+    hasher = PasswordHasher(log_rounds=4, workers=1)
+    try:
+        hashed = hasher.generate_password_hash('s3cret')
+        assert hash_rounds(hashed) == 4
+        assert hasher.check_password_hash(hashed, 's3cret')
+        assert not hasher.check_password_hash(hashed, 'wrong')
+        assert hasher.stats()['hashes'] == 1 and hasher.stats()['checks'] == 2
+    finally:
+        hasher.shutdown()
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(log_rounds=4, workers=0, queue_size=1, acquire_timeout=0.01)
+    hasher._slots.acquire()  # someone else holds the only slot
+    try:
+        with pytest.raises(HashingBusy):
+            hasher.generate_password_hash('s3cret')
+    finally:
+        hasher._slots.release()
+    assert hasher.stats()['rejected'] == 1
+    assert hasher.check_password_hash(hasher.generate_password_hash('s3cret'), 's3cret')
+
+def test_live_pool_is_not_reconfigured():
+    hasher = PasswordHasher(log_rounds=4, workers=1)
+    try:
+        hasher.check_password_hash(hasher.generate_password_hash('s3cret'), 's3cret')
+        hasher.configure(log_rounds=4, workers=1)  # unchanged settings are a no-op
+        with pytest.raises(RuntimeError):
+            hasher.configure(log_rounds=4, workers=2)
+    finally:
+        hasher.shutdown()
+    hasher.configure(log_rounds=4, workers=2)
+    assert hasher.stats()['workers'] == 2
+
+def test_login_rehashes_when_cost_changes(client):
+    rounds = password_hasher.log_rounds
+    password_hasher.log_rounds = 4
+    try:
+        client.post('/api/auth/register', json={
+            'email': 'rehash@example.com', 'password': 'pw', 'confirm_password': 'pw', 'name': 'Rehash',
+        })
+        user = User.query.filter_by(email='rehash@example.com').one()
+        assert hash_rounds(user.password_hash) == 4
+
+        password_hasher.log_rounds = 5
+        resp = client.post('/api/auth/login', json={'email': 'rehash@example.com', 'password': 'pw'})
+        assert resp.status_code == 200
+        db.session.refresh(user)
+        assert hash_rounds(user.password_hash) == 5
+    finally:
+        password_hasher.log_rounds = rounds
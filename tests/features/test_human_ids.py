@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine, insert
+from app import db
+from app.human_ids import allocator, assign_human_ids
+from app.models import Role, HumanIdSequence
+
+
+def test_inserts_get_unique_human_ids(client):
+    for name in ['Chef', 'Waiter', 'Cleaner']:
+        db.session.add(Role(name=name))
+    db.session.commit()
+    human_ids = [role.human_id for role in Role.query.all()]
+    assert len(set(human_ids)) == 3
+    assert all(h is not None for h in human_ids)
+
+def test_block_is_reserved_once(client, monkeypatch):
+    allocator.reset()
+    monkeypatch.setattr(allocator, 'block_size', 10)
+    first = allocator.next_id(db.engine, 'BlockTest')
+    sequence = db.session.get(HumanIdSequence, 'BlockTest')
+    reserved_until = sequence.next_value
+    # The next nine ids are served from memory without touching the row
+    ids = [allocator.next_id(db.engine, 'BlockTest') for _ in range(9)]
+    db.session.refresh(sequence)
+    assert sequence.next_value == reserved_until
+    assert ids == list(range(first + 1, first + 10))
+
+def test_reset_leaves_gaps_but_never_reuses(client, monkeypatch):
+    monkeypatch.setattr(allocator, 'block_size', 10)
+    before = allocator.next_id(db.engine, 'GapTest')
+    allocator.reset()
+    after = allocator.next_id(db.engine, 'GapTest')
+    assert after > before
+
+def test_bulk_insert_assigns_human_ids(client):
+    rows = [{'name': f'Bulk {i}'} for i in range(25)]
+    assign_human_ids(Role, rows)
+    db.session.execute(insert(Role), rows)
+    db.session.commit()
+    human_ids = [role.human_id for role in Role.query.all()]
+    assert len(human_ids) == 25
+    assert len(set(human_ids)) == 25
+
+def test_reservation_does_not_need_a_connection_from_the_callers_pool(client):
+    allocator.reset()
+    engine = create_engine(db.engine.url, pool_size=1, max_overflow=0, pool_timeout=1)
+    try:
+        with engine.connect():
+            # Mid-flush the caller already holds its pool's only connection
+            assert allocator.next_id(engine, 'PoolTest') >= 1
+    finally:
+        engine.dispose()
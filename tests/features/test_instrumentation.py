@@ -0,0 +1,52 @@
+from app import db
+from app.models import User
+import json
+import pytest
+from app.instrumentation import RequestMetrics, instrumentation, retire_process, snapshot_path
+
+
+def test_metrics_count_requests_and_statements(client):
+    instrumentation.metrics.reset()
+    assert client.get('/api/roles/').status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="/api/roles/",method="GET",status="200"} 1' in text
+    assert 'http_request_sql_statements_count{endpoint="/api/roles/"} 1' in text
+    assert 'db_pool_wait_seconds_count' in text
+    assert 'endpoint="/metrics"' not in text
+
+# The joined test session's SAVEPOINT would count as one more statement
+@pytest.mark.committed
+def test_repeated_statement_shapes_are_flagged(client, monkeypatch):
+    app = client.application
+    monkeypatch.setattr(instrumentation, 'server_timing', True)
+
+    @app.route('/test-n-plus-one')
+    def n_plus_one():
+        for i in range(instrumentation.n1_threshold):
+            db.session.execute(db.select(User.id).where(User.email == f'user{i}@example.com')).all()
+        return 'done'
+
+    instrumentation.metrics.reset()
+    resp = client.get('/test-n-plus-one')
+    assert f'desc="{instrumentation.n1_threshold} queries"' in resp.headers['Server-Timing']
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_n_plus_one_total{endpoint="/test-n-plus-one"} 1' in text
+
+def test_metrics_are_summed_across_workers(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(instrumentation, 'directory', str(tmp_path))
+    instrumentation.metrics.reset()
+    # Another worker, pid 1, has served two requests to the same endpoint
+    other = RequestMetrics()
+    for _ in range(2):
+        other.record('/api/roles/', 'GET', 200, 0.01, 1, 0.001, [])
+    pool = {'checkouts': 3, 'timeouts': 0, 'connects': 1, 'invalidations': 0, 'wait_seconds_total': 0.0,
+            'wait_buckets': {'0.001': 3}}
+    snapshot_path(tmp_path, 1).write_text(json.dumps({'requests': other.snapshot(), 'pool': pool}))
+
+    assert client.get('/api/roles/').status_code == 200
+    expected = 'http_requests_total{endpoint="/api/roles/",method="GET",status="200"} 3'
+    assert expected in client.get('/metrics').get_data(as_text=True)
+    # The worker exits: its numbers stay in the total
+    retire_process(tmp_path, 1)
+    assert not snapshot_path(tmp_path, 1).exists()
+    assert expected in client.get('/metrics').get_data(as_text=True)
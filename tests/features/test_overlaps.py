@@ -0,0 +1,68 @@
+import io
+import random
+from app import db
+from app.models import User, Team, TeamMembership
+from app.overlaps import overlapping_pairs
+
+
+def test_sweep_matches_pairwise():
+    rng = random.Random(3)
+    for _ in range(200):
+        n = rng.randrange(1, 40)
+        codes = [rng.randrange(4) for _ in range(n)]
+        starts = [rng.randrange(200) for _ in range(n)]
+        ends = [start + rng.randrange(1, 40) for start in starts]
+        expected = {
+            (i, j) for i in range(n) for j in range(i + 1, n)
+            if codes[i] == codes[j] and starts[i] < ends[j] and starts[j] < ends[i]
+        }
+        assert {tuple(sorted(pair)) for pair in overlapping_pairs(codes, starts, ends)} == expected
+
+def test_double_booking_is_rejected_across_teams(client):
+    user = User(email='erin@example.com', password_hash='pw', name='Erin')
+    db.session.add(user)
+    db.session.commit()
+    teams = []
+    for name in ('Bar', 'Kitchen'):
+        team = Team(name=name)
+        db.session.add(team)
+        db.session.commit()
+        db.session.add(TeamMembership(user_id=user.id, team_id=team.id))
+        db.session.commit()
+        teams.append(team)
+    bar, kitchen = teams
+
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'team_id': str(bar.id),
+        'start_time': '2026-03-02T09:00:00', 'end_time': '2026-03-02T17:00:00',
+    })
+    assert resp.status_code == 201
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'team_id': str(kitchen.id),
+        'start_time': '2026-03-02T16:00:00', 'end_time': '2026-03-02T20:00:00',
+    })
+    assert resp.status_code == 409
+    # Back to back is fine
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'team_id': str(kitchen.id),
+        'start_time': '2026-03-02T17:00:00', 'end_time': '2026-03-02T20:00:00',
+    })
+    assert resp.status_code == 201
+
+    body = "email,role,start,end,break_minutes\n" + (
+        "erin@example.com,,2026-03-02T10:00,2026-03-02T12:00,\n"
+        "erin@example.com,,2026-03-03T09:00,2026-03-03T17:00,\n"
+        "erin@example.com,,2026-03-03T12:00,2026-03-03T18:00,\n"
+        "erin@example.com,,2026-03-03T17:00,2026-03-03T19:00,\n"
+    )
+    resp = client.post(f'/api/shifts/import?team_id={kitchen.id}', data={'file': (io.BytesIO(body.encode()), 'rota.csv')},
+                       content_type='multipart/form-data')
+    data = resp.get_json()
+    assert data['imported'] == 2
+    assert [error['row'] for error in data['errors']] == [1, 3]
+
+    resp = client.get('/api/shifts/overlaps', query_string={
+        'team_id': str(bar.id), 'start': '2026-03-01T00:00:00', 'end': '2026-03-08T00:00:00',
+    })
+    assert resp.status_code == 200
+    assert resp.get_json() == []
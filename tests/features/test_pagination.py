@@ -0,0 +1,49 @@
+from app import db
+from app.models import Role
+
+
+def fetch_all(client, url, limit):
+    pages, cursor = [], None
+    while True:
+        query = {'limit': limit}
+        if cursor:
+            query['cursor'] = cursor
+        resp = client.get(url, query_string=query)
+        assert resp.status_code == 200
+        pages.append(resp.json)
+        cursor = resp.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return pages
+        assert 'rel="next"' in resp.headers['Link']
+
+def test_roles_are_paged_by_cursor(client):
+    for i in range(7):
+        db.session.add(Role(name=f'Role {i}'))
+    db.session.commit()
+    pages = fetch_all(client, '/api/roles/', limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    names = [role['role_name'] for page in pages for role in page]
+    assert sorted(names) == [f'Role {i}' for i in range(7)]
+
+def test_last_page_has_no_cursor(client):
+    db.session.add(Role(name='Only'))
+    db.session.commit()
+    resp = client.get('/api/roles/', query_string={'limit': 1})
+    assert len(resp.json) == 1
+    assert 'X-Next-Cursor' not in resp.headers
+
+def test_lists_without_paging_arguments_return_every_row(client):
+    for i in range(105):
+        db.session.add(Role(name=f'Role {i}'))
+    db.session.commit()
+    resp = client.get('/api/roles/')
+    assert len(resp.json) == 105
+    assert 'X-Next-Cursor' not in resp.headers
+    first = client.get('/api/roles/', query_string={'limit': 2})
+    rest = client.get('/api/roles/', query_string={'cursor': first.headers['X-Next-Cursor']})
+    assert len(rest.json) == 100
+
+def test_invalid_pagination_arguments(client):
+    assert client.get('/api/roles/', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+    assert client.get('/api/roles/', query_string={'limit': 0}).status_code == 400
+    assert client.get('/api/teams/', query_string={'limit': 100000}).status_code == 400
@@ -0,0 +1,36 @@
+from app import db
+from app.models import Team
+
+
+def test_repeat_reads_only_look_up_the_version(client, count_statements):
+    client.post('/api/roles/', json={'name': 'Cashier'})
+    first = client.get('/api/roles/')
+    assert first.status_code == 200 and first.headers['ETag']
+    statements, second = count_statements(lambda: client.get('/api/roles/'))
+    assert statements == 1
+    assert second.get_json() == first.get_json()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+def test_if_none_match_returns_304(client):
+    etag = client.get('/api/teams/').headers['ETag']
+    resp = client.get('/api/teams/', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.data == b''
+
+def test_writes_invalidate(client):
+    etag = client.get('/api/teams/').headers['ETag']
+    client.post('/api/teams/', json={'name': 'Bar staff'})
+    resp = client.get('/api/teams/', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+    assert [team['name'] for team in resp.get_json()] == ['Bar staff']
+
+def test_writes_outside_the_handlers_invalidate(client):
+    # As a write made through another worker, or by code that is not a cached group's handler
+    etag = client.get('/api/teams/').headers['ETag']
+    db.session.add(Team(name='Kitchen'))
+    db.session.commit()
+    resp = client.get('/api/teams/', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+    assert [team['name'] for team in resp.get_json()] == ['Kitchen']
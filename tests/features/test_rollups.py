@@ -0,0 +1,111 @@
+import threading
+import time
+from datetime import date, datetime
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app import db
+from app.models import User, Team, TeamMembership, ClockEvent, DailyHours, WeeklyHours, Shift
+from app.rollups import rebuild_rollups, rewrite_rollups
+
+
+def seed():
+    user = User(email='rollup@example.com', password_hash='pw', name='Rolled Up')
+    db.session.add(user)
+    db.session.commit()
+    team = Team(name='Night desk')
+    db.session.add(team)
+    db.session.commit()
+    db.session.add(TeamMembership(user_id=user.id, team_id=team.id))
+    db.session.commit()
+    return user, team
+
+def daily_rows(user):
+    return [(row.day, row.scheduled_seconds, row.worked_seconds)
+            for row in DailyHours.query.filter_by(user_id=user.id).order_by(DailyHours.day)]
+
+def test_shift_changes_update_daily_and_weekly_rollups(client):
+    user, team = seed()
+    # Sunday night into Monday: split across two days and two ISO weeks
+    resp = client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'start_time': '2026-03-01T20:00:00', 'end_time': '2026-03-02T04:00:00',
+        'break_minutes': 60,
+    })
+    shift_id = resp.get_json()['id']
+    assert daily_rows(user) == [(date(2026, 3, 1), 12600, 0), (date(2026, 3, 2), 12600, 0)]
+    weeks = {row.week_start: row.scheduled_seconds for row in WeeklyHours.query.filter_by(user_id=user.id)}
+    assert weeks == {date(2026, 2, 23): 12600, date(2026, 3, 2): 12600}
+
+    # The edit keeps the 60-minute break: 8 hours less 1
+    client.put(f'/api/shifts/{shift_id}', json={
+        'user_id': str(user.id), 'start_time': '2026-03-03T09:00:00', 'end_time': '2026-03-03T17:00:00',
+    })
+    assert daily_rows(user) == [(date(2026, 3, 3), 25200, 0)]
+
+    client.delete(f'/api/shifts/{shift_id}')
+    assert daily_rows(user) == []
+    assert WeeklyHours.query.filter_by(user_id=user.id).count() == 0
+
+def test_punches_roll_up_as_worked_hours_and_team_report(client):
+    user, team = seed()
+    for event_id, kind, hour in (('p1', 'in', 9), ('p2', 'out', 13), ('p3', 'in', 14), ('p4', 'out', 17)):
+        db.session.add(ClockEvent(event_id=event_id, user_id=user.id, kind=kind,
+                                  occurred_at=datetime(2026, 3, 4, hour), received_at=datetime(2026, 3, 4, hour)))
+        db.session.commit()
+    assert daily_rows(user) == [(date(2026, 3, 4), 0, 7 * 3600)]
+
+    resp = client.get('/api/reports/weekly', query_string={'team_id': str(team.id), 'start': '2026-03-01', 'end': '2026-03-08'})
+    assert resp.status_code == 200
+    assert resp.get_json() == [{'week_start': '2026-03-02', 'user_id': str(user.id), 'scheduled_hours': 0.0, 'worked_hours': 7.0}]
+
+def test_rebuild_restores_rollups(client):
+    user, team = seed()
+    client.post('/api/shifts/', json={
+        'user_id': str(user.id), 'start_time': '2026-03-03T09:00:00', 'end_time': '2026-03-03T17:00:00',
+    })
+    expected = daily_rows(user)
+    db.session.execute(db.delete(DailyHours))
+    db.session.execute(db.delete(WeeklyHours))
+    db.session.commit()
+    assert rebuild_rollups() >= 1
+    assert daily_rows(user) == expected
+    assert client.get('/api/reports/daily').status_code == 400
+
+def waiting_advisory_locks():
+    return db.session.execute(
+        text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND NOT granted")
+    ).scalar()
+
+# Each writer needs its own committed transaction on its own connection
+@pytest.mark.committed
+def test_concurrent_refreshes_of_one_employee_serialize(client):
+    user, team = seed()
+    engine = db.engine
+    first = Session(engine)
+    first.add(Shift(user_id=user.id, start_time=datetime(2026, 3, 2, 9), end_time=datetime(2026, 3, 2, 17)))
+    first.flush()
+    # Holds the employee's rollup lock until it commits, as a slow writer would
+    rewrite_rollups([user.id], date(2026, 3, 2), date(2026, 3, 2), session=first)
+
+    def second_writer():
+        with Session(engine) as second:
+            second.add(Shift(user_id=user.id, start_time=datetime(2026, 3, 4, 9), end_time=datetime(2026, 3, 4, 13)))
+            second.commit()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not waiting_advisory_locks() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert waiting_advisory_locks() == 1
+        assert thread.is_alive()
+        first.commit()
+    finally:
+        first.close()
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+    # The second refresh read the first writer's shift, so neither total lost the other's hours
+    assert daily_rows(user) == [(date(2026, 3, 2), 8 * 3600, 0), (date(2026, 3, 4), 4 * 3600, 0)]
+    weekly = WeeklyHours.query.filter_by(user_id=user.id).one()
+    assert (weekly.week_start, weekly.scheduled_seconds) == (date(2026, 3, 2), 12 * 3600)
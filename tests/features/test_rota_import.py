@@ -0,0 +1,84 @@
+import io
+import json
+import pytest
+from app import db
+from app.models import User, Role, Shift
+from app.rota_import import MalformedRecord, RotaImportError, iter_json_records
+
+
+CSV_HEADER = "email,role,start,end,break_minutes\n"
+
+
+def create_user(email):
+    user = User(email=email, password_hash='pw', name=email.split('@')[0])
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def upload(client, body, filename='rota.csv', query=''):
+    return client.post(
+        f'/api/shifts/import{query}',
+        data={'file': (io.BytesIO(body.encode()), filename)},
+        content_type='multipart/form-data',
+    )
+
+def test_import_csv(client):
+    create_user('alice@example.com')
+    db.session.add(Role(name='Chef'))
+    db.session.commit()
+    body = CSV_HEADER + (
+        "alice@example.com,Chef,2026-01-05T09:00,2026-01-05T17:00,30\n"
+        "alice@example.com,,2026-01-06T09:00,2026-01-06T17:00,\n"
+    )
+    resp = upload(client, body)
+    assert resp.status_code == 200
+    assert resp.get_json()['imported'] == 2
+    assert Shift.query.count() == 2
+
+def test_import_reports_row_errors_without_aborting(client):
+    create_user('bob@example.com')
+    body = CSV_HEADER + (
+        "bob@example.com,,2026-01-05T09:00,2026-01-05T17:00,\n"
+        "nobody@example.com,,2026-01-05T09:00,2026-01-05T17:00,\n"
+        "bob@example.com,Astronaut,2026-01-06T09:00,2026-01-06T17:00,\n"
+        "bob@example.com,,2026-01-07T17:00,2026-01-07T09:00,\n"
+    )
+    data = upload(client, body).get_json()
+    assert data['imported'] == 1
+    assert data['failed'] == 3
+    assert [error['row'] for error in data['errors']] == [2, 3, 4]
+
+def test_import_json_array_body(client):
+    create_user('carol@example.com')
+    rows = [
+        {'email': 'carol@example.com', 'start': f'2026-02-{day:02d}T09:00:00Z', 'end': f'2026-02-{day:02d}T17:00:00Z'}
+        for day in range(1, 11)
+    ]
+    resp = client.post('/api/shifts/import', data=json.dumps(rows), content_type='application/json')
+    assert resp.status_code == 200
+    assert resp.get_json()['imported'] == 10
+
+def test_import_malformed_json_line_is_reported_and_skipped(client):
+    create_user('dave@example.com')
+    body = (
+        '{"email": "dave@example.com", "start": "2026-03-01T09:00", "end": "2026-03-01T17:00"}\n'
+        '{oops\n'
+        '{"email": "dave@example.com", "start": "2026-03-02T09:00", "end": "2026-03-02T17:00"}\n'
+    )
+    resp = client.post('/api/shifts/import', data=body, content_type='application/x-ndjson')
+    data = resp.get_json()
+    assert data['imported'] == 2
+    assert data['failed'] == 1
+    assert [error['row'] for error in data['errors']] == [2]
+
+def test_oversized_json_records_are_not_buffered():
+    long_line = '{"email": "' + 'x' * 100 + '"}'
+    records = list(iter_json_records(io.StringIO(long_line + '\n{"email": "a@b.c"}\n'), chunk_size=16, max_record_chars=64))
+    assert isinstance(records[0], MalformedRecord)
+    assert records[1] == {'email': 'a@b.c'}
+    with pytest.raises(RotaImportError):
+        list(iter_json_records(io.StringIO('[' + long_line), chunk_size=16, max_record_chars=64))
+
+def test_import_unknown_team(client):
+    resp = upload(client, CSV_HEADER, query='?team_id=00000000-0000-0000-0000-000000000000')
+    assert resp.status_code == 404
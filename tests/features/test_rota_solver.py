@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timedelta
+from app import db
+from app.compliance import DAY, HOUR, ShiftColumns, check_compliance
+from app.models import Availability
+from app.rota_solver import OpenShift, RotaProblem, solve
+
+MONDAY = datetime(2026, 11, 2)
+
+
+def day_shift(day, **extra):
+    start = MONDAY + timedelta(days=day, hours=9)
+    return {'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=8)).isoformat(),
+            'break_minutes': 30, **extra}
+
+def test_solver_spreads_work_and_keeps_rest():
+    # Two people, a fortnight of one 8-hour shift a day: each needs weekly rest, so both must work
+    start = 1793577600  # 2026-11-02 00:00 UTC
+    shifts = [OpenShift(start + d * DAY + 9 * HOUR, start + d * DAY + 17 * HOUR, 30) for d in range(14)]
+    problem = RotaProblem(
+        shifts=shifts, employees=['a', 'b'], candidates=[[0, 1]] * 14, busy=[[], []],
+        unavailable=[[], []], preferred=[set()] * 14, week_caps=[{}, {}],
+    )
+    solution = solve(problem, time_budget=1, workers=0, restarts=2)
+    assert -1 not in solution.owner
+    assert solution.owner.count(0) == solution.owner.count(1) == 7
+    rows = [(problem.employees[e], shift.start, shift.end, shift.break_minutes) for shift, e in zip(shifts, solution.owner)]
+    assert check_compliance(ShiftColumns.from_rows(rows)) == {}
+
+def test_solve_endpoint(client, kitchen):
+    team, cooks = kitchen(cooks=3, chefs=2)
+    db.session.add(Availability(user_id=cooks[0].id, start_time=MONDAY, end_time=MONDAY + timedelta(days=1)))
+    db.session.commit()
+    shifts = [day_shift(0, role='Chef'), day_shift(0, role='Chef'), day_shift(1, role='Chef'), day_shift(0)]
+    resp = client.post('/api/rota/solve', json={'team_id': str(team.id), 'shifts': shifts, 'time_budget': 1})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    owners = {a['index']: a['user_id'] for a in data['assignments']}
+    # Cook 0 is unavailable on Monday, so only one Monday chef shift can be filled
+    assert [u['index'] for u in data['unfilled']] in ([0], [1])
+    assert owners.get(0, owners.get(1)) == str(cooks[1].id)
+    assert owners[3] == str(cooks[2].id)
+    assert data['stats']['filled'] == 3
+
+def test_solve_rejects_invalid_shifts(client):
+    resp = client.post('/api/rota/solve', json={
+        'team_id': str(uuid.uuid4()), 'shifts': [day_shift(0, role='Sommelier'), {'start_time': 'soon'}],
+    })
+    assert resp.status_code == 400
+    errors = resp.get_json()['errors']
+    assert [error['index'] for error in errors] == [0, 0, 1, 1]
@@ -0,0 +1,34 @@
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from flask_restx import marshal
+from app.serialization import compile_model, dumps
+from app.teams_api import team_model
+from app.shifts_api import shift_model
+
+
+def test_compiled_team_matches_marshal():
+    teams = [
+        SimpleNamespace(id=uuid.uuid4(), name='Floor', manager_id=None, user_associations=[
+            SimpleNamespace(user_id=uuid.uuid4(), summary='Lead'),
+            SimpleNamespace(user_id=uuid.uuid4(), summary=None),
+        ]),
+        SimpleNamespace(id=uuid.uuid4(), name='Empty', manager_id=uuid.uuid4(), user_associations=[]),
+    ]
+    serialize = compile_model(team_model)
+    assert [serialize(team) for team in teams] == json.loads(json.dumps(marshal(teams, team_model)))
+
+def test_compiled_shift_matches_marshal():
+    shift = SimpleNamespace(
+        id=uuid.uuid4(), human_id=7, user_id=uuid.uuid4(), team_id=None, role_id=None,
+        start_time=datetime(2026, 3, 1, 9), end_time=datetime(2026, 3, 1, 17, 30), break_minutes=30,
+    )
+    compiled = compile_model(shift_model)(shift)
+    assert compiled == json.loads(json.dumps(marshal(shift, shift_model)))
+    assert json.loads(dumps(compiled)) == compiled
+
+def test_docs_describe_list_schema(client):
+    spec = client.get('/api/swagger.json').get_json()
+    schema = spec['paths']['/teams/']['get']['responses']['200']['schema']
+    assert schema == {'type': 'array', 'items': {'$ref': '#/definitions/Team'}}
@@ -0,0 +1,29 @@
+import os
+from app.db_pool import pool_metrics
+from app.instrumentation import instrumentation
+from app.response_cache import response_cache
+from app.startup import after_fork, startup_timings, warm_up
+
+
+def test_warm_up_records_phases_and_leaves_no_traces(client):
+    app = client.application
+    warm_up(app, paths=('/api/swagger.json', '/api/roles/'))
+    assert {'mappers', 'schema', 'requests', 'dispose'} <= set(startup_timings['phases'])
+    # Workers must not inherit the warm-up requests in their metrics
+    assert 'http_requests_total{' not in instrumentation.metrics.render()
+
+    data = client.get('/api/system/startup').get_json()
+    assert data['pid'] == os.getpid()
+    assert data['phases_ms']['schema'] >= 0
+
+def test_after_fork_resets_pool_metrics(client):
+    # What the master's warm-up requests leave behind
+    pool_metrics.record_checkout(0.002)
+    after_fork(client.application)
+    assert pool_metrics.snapshot()['checkouts'] == 0
+    assert startup_timings['pid'] == os.getpid()
+
+def test_after_fork_gives_the_response_cache_its_own_backend(client):
+    inherited = response_cache.backend
+    after_fork(client.application)
+    assert response_cache.backend is not inherited
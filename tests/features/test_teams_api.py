@@ -1,7 +1,8 @@
 import pytest
 from app import create_app, db
-from app.models import User, Team, TeamMembership
+from app.models import User, Team, TeamMembership, Shift
 import uuid
+from datetime import datetime
 
 
 
@@ -53,3 +54,91 @@ def test_team_crud(client):
     resp = client.delete(f'/api/teams/{team_id}')
     assert resp.status_code == 200
     assert resp.get_json()['message'] == 'Team deleted'
+
+def test_delete_team_keeps_its_shifts(client):
+    user = create_user('Erin', 'erin@example.com')
+    team = Team(name='Night Team')
+    db.session.add(team)
+    db.session.flush()
+    shift = Shift(user_id=user.id, team_id=team.id, start_time=datetime(2026, 1, 5, 22), end_time=datetime(2026, 1, 6, 6))
+    db.session.add(shift)
+    db.session.commit()
+    team_id, shift_id = team.id, shift.id
+    resp = client.delete(f'/api/teams/{team_id}')
+    assert resp.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Shift, shift_id).team_id is None
+
+
+def add_teams(count, members):
+    for i in range(count):
+        team = Team(name=f'Team {Team.query.count()}')
+        db.session.add(team)
+        db.session.flush()
+        for user in members:
+            db.session.add(TeamMembership(user_id=user.id, team_id=team.id, summary='Member'))
+    db.session.commit()
+
+def test_team_list_statement_count_is_constant(client, count_statements):
+    members = [create_user(f'User {i}', f'user{i}@example.com') for i in range(3)]
+    add_teams(2, members)
+    small, _ = count_statements(lambda: client.get('/api/teams/'))
+    add_teams(20, members)
+    db.session.expire_all()
+    large, resp = count_statements(lambda: client.get('/api/teams/'))
+    assert large == small
+    assert len(resp.get_json()) == 22
+    assert all(
+        {m['user_id'] for m in team['members']} == {str(u.id) for u in members}
+        for team in resp.get_json()
+    )
+
+def test_put_only_touches_changed_members(client):
+    u1 = create_user('Alice', 'alice@example.com')
+    u2 = create_user('Bob', 'bob@example.com')
+    u3 = create_user('Cara', 'cara@example.com')
+    resp = client.post('/api/teams/', json={
+        'name': 'Ops',
+        'members': [{'user_id': str(u1.id), 'summary': 'Lead'}, {'user_id': str(u2.id), 'summary': 'Dev'}],
+    })
+    team_id = resp.get_json()['id']
+    kept = TeamMembership.query.filter_by(team_id=team_id, user_id=u1.id).one()
+    kept_updated_at = kept.updated_at
+
+    resp = client.put(f'/api/teams/{team_id}', json={'members': [
+        {'user_id': str(u1.id), 'summary': 'Lead'},
+        {'user_id': str(u3.id), 'summary': 'QA'},
+        {'user_id': str(uuid.uuid4()), 'summary': 'Nobody'},
+    ]})
+    assert resp.status_code == 200
+    members = {m['user_id']: m['summary'] for m in resp.get_json()['members']}
+    assert members == {str(u1.id): 'Lead', str(u3.id): 'QA'}
+    db.session.expire_all()
+    assert TeamMembership.query.filter_by(team_id=team_id, user_id=u1.id).one().updated_at == kept_updated_at
+
+def test_patch_members(client):
+    u1 = create_user('Alice', 'alice@example.com')
+    u2 = create_user('Bob', 'bob@example.com')
+    resp = client.post('/api/teams/', json={'name': 'Kitchen', 'members': [{'user_id': str(u1.id), 'summary': 'Chef'}]})
+    team_id = resp.get_json()['id']
+
+    resp = client.patch(f'/api/teams/{team_id}/members', json={'add': [{'user_id': str(u2.id), 'summary': 'Porter'}]})
+    assert resp.status_code == 200
+    assert {m['user_id'] for m in resp.get_json()['members']} == {str(u1.id), str(u2.id)}
+
+    resp = client.patch(f'/api/teams/{team_id}/members', json={
+        'add': [{'user_id': str(u2.id), 'summary': 'Sous chef'}], 'remove': [str(u1.id)],
+    })
+    assert resp.status_code == 200
+    assert resp.get_json()['members'] == [{'user_id': str(u2.id), 'summary': 'Sous chef'}]
+
+def test_patch_rejects_adding_and_removing_the_same_user(client):
+    u1 = create_user('Alice', 'alice@example.com')
+    resp = client.post('/api/teams/', json={'name': 'Bar', 'members': [{'user_id': str(u1.id), 'summary': 'Barista'}]})
+    team_id = resp.get_json()['id']
+    resp = client.patch(f'/api/teams/{team_id}/members', json={
+        'add': [{'user_id': str(u1.id), 'summary': 'Manager'}], 'remove': [str(u1.id)],
+    })
+    assert resp.status_code == 400
+    db.session.expire_all()
+    assert TeamMembership.query.filter_by(team_id=team_id, user_id=u1.id).one().summary == 'Barista'
@@ -9,6 +9,7 @@ def api_create_user(client, email, name, password='pw'):
     resp = client.post('/api/auth/register', json={
         'email': email,
         'password': password,
+        'confirm_password': password,
         'name': name
     })
     assert resp.status_code == 201
@@ -64,3 +65,29 @@ def test_get_user_roles_empty(client):
     assert response.status_code == 200
     data = response.get_json()
     assert data == []
+
+def test_bulk_assign_roles(client):
+    alice = api_create_user(client, 'alice@example.com', 'Alice')
+    bob = api_create_user(client, 'bob@example.com', 'Bob')
+    for name in ('Cashier', 'Chef', 'Porter'):
+        db.session.add(Role(name=name))
+    db.session.commit()
+    client.put(f'/api/users/{bob}/roles', json={'role_names': ['Porter']})
+
+    response = client.put('/api/users/roles', json={'assignments': {
+        alice: ['Cashier', 'Chef'],
+        bob: ['Chef'],
+        'not-a-uuid': ['Chef'],
+    }})
+    assert response.status_code == 200
+    outcomes = {outcome['user_id']: outcome for outcome in response.get_json()}
+    assert outcomes[alice]['status'] == 'updated' and outcomes[alice]['added'] == ['Cashier', 'Chef']
+    assert outcomes[bob]['added'] == ['Chef'] and outcomes[bob]['removed'] == ['Porter']
+    assert outcomes['not-a-uuid']['status'] == 'error'
+    assert {role['name'] for role in client.get(f'/api/users/{bob}/roles').get_json()} == {'Chef'}
+
+    response = client.put('/api/users/roles', json={'assignments': {alice: ['Cashier', 'Chef'], bob: ['Nope']}})
+    outcomes = {outcome['user_id']: outcome for outcome in response.get_json()}
+    assert outcomes[alice]['status'] == 'unchanged'
+    assert outcomes[bob]['status'] == 'error'
+    assert {role['name'] for role in client.get(f'/api/users/{bob}/roles').get_json()} == {'Chef'}
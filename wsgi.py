@@ -0,0 +1,16 @@
+"""
+WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py loads ``wsgi:application`` in the master (preload_app),
+so the app is built and warmed once before the workers are forked; see
+app/startup.py.
+"""
+import time
+
+_started = time.perf_counter()
+
+from app.startup import build_app  # noqa: E402
+
+application = build_app(_started)